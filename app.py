@@ -3,11 +3,15 @@ import pandas as pd
 import numpy as np
 import io
 import validator
+import ingest
+import plan_cache
+import result_cache
 import kpi_engine
+import profiling
+import regions
 import os
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN
+from pipeline import build_plan, build_network, enrich_master, add_revenue_at_risk, add_excess_value, recommend_actions, read_params, run_montecarlo, run_optimizer
+from ppt_export import DeckCache
 from datetime import datetime
 
 # Page Config
@@ -41,101 +45,159 @@ st.markdown("""
 # ---------------------------------------------------------
 @st.cache_data
 def load_excel(file_bytes):
-    xls = pd.ExcelFile(io.BytesIO(file_bytes))
-    dfs = {}
-    for sh in xls.sheet_names:
-        dfs[sh] = pd.read_excel(xls, sheet_name=sh)
-    return dfs
-
-def enrich_master(df, dfs):
-    """Joins master data (unit_revenue, cogs, etc.)"""
-    if "Master_Data" not in dfs:
-        df["unit_revenue"] = 1.0
-        df["unit_cogs"] = 0.5
-        return df
-    
-    m = dfs["Master_Data"].copy()
-    if "location" in m.columns:
-        m = m.drop_duplicates(subset=["sku", "location"])
-        df = df.merge(m[["sku", "location", "unit_revenue", "unit_cogs"]], on=["sku", "location"], how="left")
+    """Streams only the sheets/columns the engine uses. Returns (dfs, per-sheet report)."""
+    return ingest.read_workbook(file_bytes)
+
+def show_load_details(ingest_report, issues):
+    """Load Stats and Data Warnings, the same on a fresh parse and a plan cache hit."""
+    with st.expander("📄 Load Stats"):
+        st.dataframe(pd.DataFrame(ingest_report), use_container_width=True)
+    if not issues.empty:
+        with st.expander(f"⚠️ Data Warnings ({issues.drop_duplicates(['sheet', 'column', 'rule'])['count'].sum():,} rows)"):
+            st.dataframe(issues, use_container_width=True)
+
+# Sidebar lever steps, precomputed as one batch sweep per (workbook, horizon)
+UPLIFT_STEPS = [u / 100.0 for u in range(0, 55, 5)]
+DELAY_STEPS = list(range(0, 9))
+# Above this many stacked detail rows, fall back to one scenario per rerun
+SWEEP_MAX_DETAIL_ROWS = 2_000_000
+
+@st.cache_resource
+def get_plan_cache():
+    """On-disk Arrow cache of validated workbooks, shared by all sessions."""
+    return plan_cache.PlanCache()
+
+@st.cache_resource
+def get_result_cache():
+    """Computed sweeps and scenario results shared by all sessions (see result_cache.py)."""
+    return result_cache.ResultCache()
+
+@st.cache_resource
+def get_deck_cache():
+    """Background PowerPoint builder shared by all sessions, keyed by (workbook, scenario)."""
+    return DeckCache()
+
+# Top Actions table paging and per-label cell styles
+ACTION_PAGE_SIZES = [25, 50, 100, 250]
+ACTION_STYLES = {
+    "🟥 EXPEDITE": "color: red; font-weight: bold",
+    "🟧 REPLENISH": "color: orange; font-weight: bold",
+}
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def prepare_plan(file_hash, _dfs):
+    """Parses/aggregates the plan once per uploaded workbook, keyed by content hash."""
+    return build_plan(_dfs)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def prepare_network(file_hash, _dfs):
+    """Lane tree for network mode, or None when the workbook has no Logistics_Lanes."""
+    return build_network(_dfs)
+
+def compute_sweep(file_hash, horizon, use_network, by_priority, plan, net):
+    """Runs every sidebar (uplift, delay) combination for one horizon in a single batch."""
+    scenarios = kpi_engine.scenario_grid(UPLIFT_STEPS, DELAY_STEPS, [horizon])
+    return get_result_cache().get_or_compute(
+        ("sweep", file_hash, horizon, use_network, by_priority),
+        lambda: plan.project_batch(scenarios, network=net, by_priority=by_priority)
+    )
+
+def run_sweep(file_hash, horizon, plan, net, by_priority):
+    """
+    Sweep for the current workbook. A revised upload in the same session
+    reuses the previous sweep and only recomputes keys whose inputs changed.
+    """
+    use_network = net is not None
+    # Incremental updates only follow input changes, so the lanes must match too
+    lanes = net.lane_table() if use_network else None
+    last = st.session_state.get("last_sweep")
+    same_run = (
+        last is not None and last["horizon"] == horizon and last["by_priority"] == by_priority
+        and (last["lanes"] is None) == (lanes is None)
+        and (lanes is None or lanes.equals(last["lanes"]))
+    )
+    if same_run and last["hash"] == file_hash:
+        result = last["result"]
+    elif same_run:
+        scenarios = kpi_engine.scenario_grid(UPLIFT_STEPS, DELAY_STEPS, [horizon])
+        summary, detail, _ = kpi_engine.update_kpis_batch(last["plan"], last["result"], plan, scenarios, network=net, by_priority=by_priority)
+        result = (summary, detail)
     else:
-        m = m.drop_duplicates(subset=["sku"])
-        df = df.merge(m[["sku", "unit_revenue", "unit_cogs"]], on=["sku"], how="left")
-        
-    df["unit_revenue"] = df["unit_revenue"].fillna(1.0)
-    df["unit_cogs"] = df["unit_cogs"].fillna(0.5)
-    return df
-
-def generate_ppt(summary, tot_rar, skus_stockout, avg_fill, safety_breaches):
-    """Generate PowerPoint presentation with dashboard results"""
-    prs = Presentation()
-    prs.slide_width = Inches(10)
-    prs.slide_height = Inches(7.5)
-    
-    # Title Slide
-    title_slide = prs.slides.add_slide(prs.slide_layouts[0])
-    title = title_slide.shapes.title
-    subtitle = title_slide.placeholders[1]
-    title.text = "Supply Chain Risk Dashboard"
-    subtitle.text = f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    
-    # KPI Summary Slide
-    kpi_slide = prs.slides.add_slide(prs.slide_layouts[5])
-    title = kpi_slide.shapes.title
-    title.text = "Executive KPI Summary"
-    
-    left = Inches(1)
-    top = Inches(2)
-    width = Inches(8)
-    height = Inches(0.8)
-    
-    metrics = [
-        ("💰 Revenue at Risk", f"${tot_rar:,.0f}"),
-        ("⚠️ SKUs with Stockouts", f"{int(skus_stockout)}"),
-        ("📉 Average Fill Rate", f"{avg_fill*100:.1f}%"),
-        ("🛡️ Safety Stock Breaches", f"{int(safety_breaches)}")
-    ]
-    
-    for i, (label, value) in enumerate(metrics):
-        textbox = kpi_slide.shapes.add_textbox(left, top + i*height, width, height)
-        text_frame = textbox.text_frame
-        text_frame.text = f"{label}: {value}"
-        text_frame.paragraphs[0].font.size = Pt(18)
-        text_frame.paragraphs[0].font.bold = True
-    
-    # Top Risks Slide
-    risks_slide = prs.slides.add_slide(prs.slide_layouts[5])
-    title = risks_slide.shapes.title
-    title.text = "Top 10 At-Risk SKU-Locations"
-    
-    top_risks = summary.nlargest(10, 'revenue_at_risk')[['sku', 'location', 'revenue_at_risk', 'fill_rate']]
-    
-    left = Inches(1)
-    top = Inches(2)
-    width = Inches(8)
-    height = Inches(4)
-    
-    table = risks_slide.shapes.add_table(len(top_risks) + 1, 4, left, top, width, height).table
-    
-    # Header
-    headers = ['SKU', 'Location', 'Revenue at Risk', 'Fill Rate']
-    for col_idx, header in enumerate(headers):
-        cell = table.cell(0, col_idx)
-        cell.text = header
-        cell.text_frame.paragraphs[0].font.bold = True
-    
-    # Data
-    for row_idx, (_, row) in enumerate(top_risks.iterrows(), start=1):
-        table.cell(row_idx, 0).text = str(row['sku'])
-        table.cell(row_idx, 1).text = str(row['location'])
-        table.cell(row_idx, 2).text = f"${row['revenue_at_risk']:,.0f}"
-        table.cell(row_idx, 3).text = f"{row['fill_rate']*100:.1f}%"
-    
-    # Save to BytesIO
-    ppt_io = io.BytesIO()
-    prs.save(ppt_io)
-    ppt_io.seek(0)
-    return ppt_io
+        result = compute_sweep(file_hash, horizon, use_network, by_priority, plan, net)
+    st.session_state["last_sweep"] = {"hash": file_hash, "horizon": horizon, "lanes": lanes, "by_priority": by_priority, "plan": plan, "result": result}
+    return result
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_montecarlo(file_hash, horizon, demand_uplift, supply_delay, n_samples, seed, _plan, _dfs):
+    """Monte Carlo run for one scenario, cached per (workbook, scenario, samples, seed)."""
+    scenario = pd.Series({"horizon_weeks": horizon, "demand_uplift_pct": demand_uplift, "supply_delay_weeks": supply_delay})
+    return run_montecarlo(_dfs, n_samples, seed, scenario=scenario, plan=_plan)
+
+def compute_moves(file_hash, horizon, demand_uplift, supply_delay, plan, dfs):
+    """Proposed pull-ins/transfers and the summary after them, shared across sessions."""
+    scenario = pd.Series({"horizon_weeks": horizon, "demand_uplift_pct": demand_uplift, "supply_delay_weeks": supply_delay})
+    key = ("optimize", file_hash, horizon, demand_uplift, supply_delay)
+    return get_result_cache().get_or_compute(key, lambda: run_optimizer(dfs, scenario=scenario, plan=plan))
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def index_sweep(file_hash, horizon, use_network, by_priority, _sweep):
+    """(summary, detail) row-range indexes of a sweep, built once per (workbook, horizon, mode)."""
+    summary, detail = _sweep
+    return kpi_engine.KeyIndex(summary), kpi_engine.KeyIndex(detail)
+
+def compute_scenario(file_hash, horizon, demand_uplift, supply_delay, by_priority, plan, net, dfs):
+    """
+    KPIs, master data, revenue at risk and recommendations for the sidebar
+    scenario, memoized across reruns and sessions.
+
+    Returns:
+        (summary, detail, detail_index, actions); actions is summary with a
+        Recommendation column, most revenue at risk first. Read-only.
+    """
+    key = ("scenario", file_hash, horizon, demand_uplift, supply_delay, net is not None, by_priority)
+    cached = get_result_cache().get(key)
+    if cached is not None:
+        return cached
+
+    sweep_rows = plan.n_keys * horizon * len(UPLIFT_STEPS) * len(DELAY_STEPS)
+    if sweep_rows <= SWEEP_MAX_DETAIL_ROWS:
+        # Whole slider grid in one pass; lever moves become lookups
+        sweep = run_sweep(file_hash, horizon, plan, net, by_priority)
+        summary, detail, detail_index = select_scenario(sweep, index_sweep(file_hash, horizon, net is not None, by_priority, sweep), horizon, demand_uplift, supply_delay)
+    else:
+        summary, detail = plan.project(
+            horizon_weeks=horizon,
+            demand_uplift_pct=demand_uplift,
+            supply_delay_weeks=supply_delay,
+            network=net,
+            by_priority=by_priority
+        )
+        detail_index = kpi_engine.KeyIndex(detail)
+
+    summary = add_excess_value(add_revenue_at_risk(enrich_master(summary, dfs)))
+    actions = summary.assign(Recommendation=recommend_actions(summary, read_params(dfs)))
+    actions = actions.sort_values(["revenue_at_risk", "first_stockout_week"], ascending=[False, True])
+    result = (summary, detail, detail_index, actions)
+    get_result_cache().put(key, result)
+    return result
+
+def select_scenario(sweep, index, horizon, demand_uplift, supply_delay):
+    """
+    Slices one scenario out of a precomputed sweep. Scenarios are contiguous
+    row blocks, so this is two slices rather than a scan.
+
+    Returns:
+        (summary, detail, detail_index)
+    """
+    grid = kpi_engine.scenario_grid(UPLIFT_STEPS, DELAY_STEPS, [horizon])
+    scenario_id = grid.loc[
+        np.isclose(grid["demand_uplift_pct"], demand_uplift) & (grid["supply_delay_weeks"] == supply_delay),
+        "scenario_id"
+    ].iloc[0]
+    s_index, d_index = index
+    summary = sweep[0].iloc[s_index.scenario_rows(scenario_id)].drop(columns=["scenario_id"] + kpi_engine.SCENARIO_COLS)
+    detail = sweep[1].iloc[d_index.scenario_rows(scenario_id)].drop(columns=["scenario_id"])
+    return summary.reset_index(drop=True), detail.reset_index(drop=True), d_index.for_scenario(scenario_id)
 
 # ---------------------------------------------------------
 # Views
@@ -260,100 +322,325 @@ def show_cockpit():
     demand_uplift = st.sidebar.slider("Demand Uplift (%)", 0, 50, 0, 5) / 100.0
     supply_delay = st.sidebar.slider("Supply Delay (Weeks)", 0, 8, 0, 1)
     horizon = st.sidebar.slider("Planning Horizon (Weeks)", 4, 16, 8, 1)
+    use_network = st.sidebar.checkbox("🔗 Network Mode", value=False, help="Pass shortfalls up the Logistics_Lanes and transfers back down")
+    by_priority = st.sidebar.checkbox("🎯 Priority Allocation", value=False, help="Serve customer_priority tiers in rank order and report fill rate per tier")
+    diagnostics = st.sidebar.checkbox("🩺 Diagnostics", value=False, help="Time each pipeline stage on this run")
 
-    uploaded_file = st.file_uploader("Upload 'control_tower_input_with_help.xlsx'", type=["xlsx"])
+    uploaded_files = st.file_uploader(
+        "Upload 'control_tower_input_with_help.xlsx'", type=["xlsx"], accept_multiple_files=True,
+        help="Upload several workbooks (one per region) for a consolidated view"
+    )
     
-    if not uploaded_file:
+    if not uploaded_files:
         st.info("👆 Please upload the data file to proceed.")
         return
+    if len(uploaded_files) > 1:
+        show_regions(uploaded_files, horizon, demand_uplift, supply_delay, use_network, by_priority)
+        return
+    uploaded_file = uploaded_files[0]
 
     # Data Processing
+    # Cached steps do not re-run, so only work done on this rerun is timed
+    prof = profiling.start() if diagnostics else None
     try:
         file_bytes = uploaded_file.read()
-        dfs = load_excel(file_bytes)
+        file_hash = plan_cache.content_hash(file_bytes)
         
-        ok, errors = validator.validate_data(dfs)
-        if not ok:
-            st.error("❌ Data Validation Failed")
-            for e in errors:
-                st.write(f"- {e}")
-            st.stop()
+        # Repeat uploads (and server restarts) skip parsing + validation
+        dfs = get_plan_cache().get(file_hash)
+        if dfs is None:
+            dfs, ingest_report = load_excel(file_bytes)
             
-        inv = dfs["Inventory"]
-        demand = dfs["Demand_Plan"]
-        supply = dfs["Supply_Plan"]
+            # Coerces each column once; the engine reuses the coerced frames
+            dfs, issues = validator.validate_plan(dfs)
+            if not validator.is_valid(issues):
+                show_load_details(ingest_report, issues.iloc[:0])
+                st.error("❌ Data Validation Failed")
+                for e in validator.error_messages(issues):
+                    st.write(f"- {e}")
+                st.dataframe(issues, use_container_width=True)
+                st.stop()
+            
+            # Only validated workbooks are persisted, with what the load reported
+            get_plan_cache().put(file_hash, dfs, info=plan_cache.load_info(ingest_report, issues))
+        else:
+            st.caption("⚡ Loaded from plan cache")
+            ingest_report, issues = plan_cache.load_details(get_plan_cache().info(file_hash))
+        show_load_details(ingest_report, issues)
+        
+        coverage = validator.check_horizon(dfs, horizon)
+        if not coverage.empty:
+            st.warning(f"Demand_Plan does not cover the full horizon: {coverage['value'].iloc[0]}")
         
         with st.spinner("Computing Scenarios..."):
-            summary, detail = kpi_engine.compute_kpis(
-                inv, demand, supply, 
-                horizon_weeks=horizon,
-                demand_uplift_pct=demand_uplift,
-                supply_delay_weeks=supply_delay
-            )
+            plan = prepare_plan(file_hash, dfs)
+            net = prepare_network(file_hash, dfs) if use_network else None
+            if use_network and net is None:
+                st.warning("Network mode needs a Logistics_Lanes sheet; projecting locations independently.")
+            
+            # Track what changed since the previous upload in this session
+            last = st.session_state.get("last_upload")
+            if last is not None and last["hash"] != file_hash:
+                st.session_state["upload_changes"] = kpi_engine.diff_plans(last["plan"], plan)
+            st.session_state["last_upload"] = {"hash": file_hash, "plan": plan}
+            
+            summary, detail, detail_index, actions = compute_scenario(file_hash, horizon, demand_uplift, supply_delay, by_priority, plan, net, dfs)
+            
+        changes = st.session_state.get("upload_changes")
+        if changes is not None:
+            with st.expander(f"🔄 Changes vs Previous Upload ({len(changes)} SKU-Locations)"):
+                st.dataframe(changes, use_container_width=True)
             
-        summary = enrich_master(summary, dfs)
-        summary["revenue_at_risk"] = summary["total_unmet"] * summary["unit_revenue"]
-        
         # Executive Metrics
         tot_rar = summary["revenue_at_risk"].sum()
         skus_stockout = summary["stockout_flag"].sum()
         avg_fill = summary["fill_rate"].mean()
         safety_breaches = summary["safety_breach_flag"].sum()
         
-        c1, c2, c3, c4 = st.columns(4)
+        c1, c2, c3, c4, c5, c6 = st.columns(6)
         c1.metric("💰 Revenue at Risk", f"${tot_rar:,.0f}")
         c2.metric("⚠️ SKUs with Stockouts", int(skus_stockout))
         c3.metric("📉 Avg Fill Rate", f"{avg_fill*100:.1f}%")
         c4.metric("🛡️ Safety Breaches", int(safety_breaches))
+        c5.metric("🏷️ Holding Cost", f"${summary['total_holding_cost'].sum():,.0f}")
+        c6.metric("📦 Excess Value", f"${summary['excess_value'].sum():,.0f}")
+        
+        if by_priority and plan.tiers:
+            tiers = pd.DataFrame({
+                "tier": plan.tiers,
+                "demand": [summary[f"total_demand_{t}"].sum() for t in plan.tiers],
+                "served": [summary[f"total_served_{t}"].sum() for t in plan.tiers],
+            })
+            tiers["fill_rate"] = np.where(tiers["demand"] > 0, tiers["served"] / tiers["demand"].where(tiers["demand"] > 0, 1), 1.0)
+            st.caption("🎯 Fill rate by customer priority (served in this order)")
+            st.dataframe(tiers.style.format({"demand": "{:,.0f}", "served": "{:,.0f}", "fill_rate": "{:.1%}"}), use_container_width=True, hide_index=True)
+        elif by_priority:
+            st.info("Priority allocation needs a customer_priority column in Demand_Plan.")
         
-        # PPT Export Button
+        # PPT Export: built on request in the background, cached per scenario
         st.write("")  # Spacer
-        ppt_data = generate_ppt(summary, tot_rar, skus_stockout, avg_fill, safety_breaches)
-        st.download_button(
-            label="📊 Download as PowerPoint",
-            data=ppt_data,
-            file_name=f"supply_chain_dashboard_{datetime.now().strftime('%Y%m%d_%H%M')}.pptx",
-            mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
-        )
+        decks = get_deck_cache()
+        deck_key = (file_hash, horizon, demand_uplift, supply_delay, net is not None, by_priority)
+        if st.button("📊 Prepare PowerPoint", disabled=decks.pending(deck_key)):
+            decks.submit(deck_key, summary, tot_rar, skus_stockout, avg_fill, safety_breaches)
+        # Polled, never awaited: a deck requested on this run shows up on a later one
+        try:
+            ppt_data = decks.result(deck_key, timeout=0)
+        except Exception as e:
+            # The failed build is dropped, so the button retries it
+            ppt_data = None
+            st.warning(f"PowerPoint build failed: {e}")
+        if ppt_data is not None:
+            st.download_button(
+                label="📊 Download as PowerPoint",
+                data=ppt_data,
+                file_name=f"supply_chain_dashboard_{datetime.now().strftime('%Y%m%d_%H%M')}.pptx",
+                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
+            )
+        elif decks.pending(deck_key):
+            st.caption("⏳ Building PowerPoint in the background; it will appear on the next interaction.")
+        
+        show_montecarlo(file_hash, horizon, demand_uplift, supply_delay, plan, dfs)
+        show_moves(file_hash, horizon, demand_uplift, supply_delay, plan, dfs, summary)
         
         st.divider()
         
         # Actions
         st.subheader("🔥 Top Actions")
-        def recommend(row):
-            if row["stockout_flag"]: return "🟥 EXPEDITE"
-            if row["safety_breach_flag"]: return "🟧 REPLENISH"
-            if row["min_poh"] > row["safety_stock_qty"]*3 and row["min_poh"] > 10000: return "🟦 PROMO"
-            return "✅ OK"
-            
-        actions = summary.copy()
-        actions["Recommendation"] = actions.apply(recommend, axis=1)
-        actions = actions.sort_values(["revenue_at_risk", "first_stockout_week"], ascending=[False, True])
+        # Only the visible page is styled and sent to the browser
+        p1, p2, p3 = st.columns([1, 1, 2])
+        page_size = p1.selectbox("Rows per page", ACTION_PAGE_SIZES, index=0)
+        n_pages = max(1, -(-len(actions) // page_size))
+        page = p2.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+        start = (page - 1) * page_size
+        p3.caption(f"Showing {start + 1 if len(actions) else 0:,}–{min(start + page_size, len(actions)):,} of {len(actions):,} SKU-locations")
         
         st.dataframe(
-            actions[[
+            actions.iloc[start:start + page_size][[
                 "sku", "location", "Recommendation", 
                 "revenue_at_risk", "fill_rate", 
-                "first_stockout_week", "first_safety_breach_week"
+                "first_stockout_week", "first_safety_breach_week",
+                "min_weeks_of_cover", "excess_value"
             ]].style.format({
                 "revenue_at_risk": "${:,.0f}",
-                "fill_rate": "{:.1%}"
-            }).applymap(lambda x: "color: red; font-weight: bold" if "EXPEDITE" in str(x) else ("color: orange; font-weight: bold" if "REPLENISH" in str(x) else ""), subset=["Recommendation"]),
+                "fill_rate": "{:.1%}",
+                "min_weeks_of_cover": "{:,.1f}",
+                "excess_value": "${:,.0f}"
+            }).map(lambda x: ACTION_STYLES.get(x, ""), subset=["Recommendation"]),
             use_container_width=True
         )
         
         # Drilldown
         st.divider()
         st.subheader("🔍 Drilldown")
-        sku = st.selectbox("Select SKU", summary["sku"].unique())
-        loc = st.selectbox("Select Location", summary[summary["sku"]==sku]["location"].unique())
+        sku = st.selectbox("Select SKU", detail_index.sku_list())
+        loc = st.selectbox("Select Location", detail_index.locations_for(sku))
         
-        drill = detail[(detail["sku"]==sku) & (detail["location"]==loc)].copy()
-        st.line_chart(drill.set_index("week_start")[["on_hand_qty", "forecast_qty", "supply_qty"]])
-        st.dataframe(drill[["week_start", "forecast_qty", "supply_qty", "NAI", "POH", "served_qty", "unmet_qty"]].style.format("{:,.0f}"), use_container_width=True)
+        # Contiguous slice via the key index instead of a boolean scan
+        drill = detail.iloc[detail_index.rows(sku, loc)].copy()
+        st.line_chart(drill.set_index("week_start")[["POH", "safety_stock_qty", "forecast_qty", "supply_qty"]])
+        network_cols = [c for c in ["dependent_demand_qty", "dependent_unmet_qty", "transfer_in_qty"] if c in drill.columns]
+        tier_cols = [f"{kind}_{t}" for t in plan.tiers for kind in ["served_qty", "unmet_qty"] if f"{kind}_{t}" in drill.columns]
+        st.dataframe(drill[["week_start", "forecast_qty", *network_cols, "supply_qty", "released_qty", "NAI", "POH", "served_qty", "unmet_qty", *tier_cols, "holding_cost", "weeks_of_cover", "excess_qty"]].style.format("{:,.0f}").format({"weeks_of_cover": "{:,.1f}"}), use_container_width=True)
 
     except Exception as e:
         st.error(f"Error: {str(e)}")
+    finally:
+        if prof is not None:
+            profiling.stop()
+            show_diagnostics(prof)
+
+def show_regions(files, horizon, demand_uplift, supply_delay, use_network, by_priority):
+    """
+    Consolidated view of several workbooks, one region each. Regions are
+    loaded and computed concurrently and shown as each one finishes.
+    """
+    names = regions.region_names([f.name for f in files])
+    blobs = {name: f.getvalue() for name, f in zip(names, files)}
+    hashes = {name: plan_cache.content_hash(data) for name, data in blobs.items()}
+    keys = {name: ("region", h, horizon, demand_uplift, supply_delay, use_network, by_priority) for name, h in hashes.items()}
+    
+    # Regions already computed for this scenario (any session) are not rerun
+    summaries = {name: get_result_cache().get(keys[name]) for name in names}
+    failed = {}
+    status = pd.DataFrame({
+        "region": names,
+        "status": ["✅ done" if summaries[n] is not None else "⏳ running" for n in names],
+        "sku_locations": [len(summaries[n]) if summaries[n] is not None else None for n in names],
+        "revenue_at_risk": [summaries[n]["revenue_at_risk"].sum() if summaries[n] is not None else None for n in names],
+    }).set_index("region")
+    
+    st.subheader(f"🌍 {len(names)} Regions")
+    progress = st.progress(0.0)
+    board = st.empty()
+    
+    def refresh():
+        n_done = int((status["status"] != "⏳ running").sum())
+        progress.progress(n_done / len(names), text=f"{n_done} of {len(names)} regions processed")
+        board.dataframe(status.style.format({"revenue_at_risk": "${:,.0f}", "sku_locations": "{:,.0f}"}, na_rep=""), use_container_width=True)
+    
+    refresh()
+    todo = {name: blobs[name] for name in names if summaries[name] is None}
+    scenarios = kpi_engine.scenario_grid([demand_uplift], [supply_delay], [horizon])
+    for name, summary, errors in regions.process_regions(todo, scenarios, use_network, by_priority, cache=get_plan_cache()):
+        if summary is None:
+            failed[name] = errors
+            status.loc[name, "status"] = "❌ failed"
+        else:
+            get_result_cache().put(keys[name], summary)
+            summaries[name] = summary
+            status.loc[name, ["status", "sku_locations", "revenue_at_risk"]] = ["✅ done", len(summary), summary["revenue_at_risk"].sum()]
+        refresh()
+    
+    for name, errors in failed.items():
+        with st.expander(f"❌ {name}: could not be processed"):
+            for e in errors:
+                st.write(f"- {e}")
+    
+    summary = regions.consolidate(summaries)
+    if summary.empty:
+        st.error("No region could be processed.")
+        return
+    
+    c1, c2, c3, c4, c5, c6 = st.columns(6)
+    c1.metric("💰 Revenue at Risk", f"${summary['revenue_at_risk'].sum():,.0f}")
+    c2.metric("⚠️ SKUs with Stockouts", int(summary["stockout_flag"].sum()))
+    c3.metric("📉 Avg Fill Rate", f"{summary['fill_rate'].mean()*100:.1f}%")
+    c4.metric("🛡️ Safety Breaches", int(summary["safety_breach_flag"].sum()))
+    c5.metric("🏷️ Holding Cost", f"${summary['total_holding_cost'].sum():,.0f}")
+    c6.metric("📦 Excess Value", f"${summary['excess_value'].sum():,.0f}")
+    
+    st.caption("📍 By region")
+    st.dataframe(
+        regions.region_totals(summary).style.format({
+            "revenue_at_risk": "${:,.0f}", "avg_fill_rate": "{:.1%}",
+            "holding_cost": "${:,.0f}", "excess_value": "${:,.0f}"
+        }),
+        use_container_width=True, hide_index=True
+    )
+    
+    st.divider()
+    st.subheader("🔥 Top Actions")
+    actions = summary.sort_values(["revenue_at_risk", "first_stockout_week"], ascending=[False, True])
+    st.dataframe(
+        actions.head(ACTION_PAGE_SIZES[-1])[[
+            "region", "sku", "location", "Recommendation",
+            "revenue_at_risk", "fill_rate",
+            "first_stockout_week", "first_safety_breach_week",
+            "min_weeks_of_cover", "excess_value"
+        ]].style.format({
+            "revenue_at_risk": "${:,.0f}",
+            "fill_rate": "{:.1%}",
+            "min_weeks_of_cover": "{:,.1f}",
+            "excess_value": "${:,.0f}"
+        }).map(lambda x: ACTION_STYLES.get(x, ""), subset=["Recommendation"]),
+        use_container_width=True, hide_index=True
+    )
+    st.download_button("⬇️ Download consolidated summary (CSV)", data=actions.to_csv(index=False), file_name="consolidated_summary.csv", mime="text/csv")
+    st.caption("Upload a single workbook for drilldown, uncertainty and expedite/rebalance proposals.")
+
+def show_montecarlo(file_hash, horizon, demand_uplift, supply_delay, plan, dfs):
+    """Stockout probability and risk quantiles for the current scenario, run on request."""
+    with st.expander("🎲 Uncertainty (Monte Carlo)"):
+        m1, m2, m3 = st.columns([1, 1, 2])
+        n_samples = m1.number_input("Samples per SKU-location", min_value=100, max_value=10000, value=1000, step=100)
+        seed = m2.number_input("Seed", min_value=0, value=0, step=1)
+        st.caption("Demand noise and supply slips/shortfalls default to montecarlo.DEFAULT_UNCERTAINTY; override them by name in Constraints_Params.")
+        mc_key = (file_hash, horizon, demand_uplift, supply_delay, int(n_samples), int(seed))
+        if m3.button("🎲 Run Simulation"):
+            st.session_state["mc_key"] = mc_key
+        if st.session_state.get("mc_key") != mc_key:
+            return
+        
+        with st.spinner(f"Sampling {int(n_samples):,} scenarios..."):
+            per_key, portfolio = compute_montecarlo(*mc_key, plan, dfs)
+        st.dataframe(portfolio.style.format("{:,.0f}", subset=["total_unmet", "revenue_at_risk"]).format("{:,.1f}", subset=["stockout_keys"]), use_container_width=True, hide_index=True)
+        risky = per_key.sort_values(["stockout_prob", "revenue_at_risk_mean"], ascending=False).head(ACTION_PAGE_SIZES[0])
+        st.dataframe(risky.style.format("{:,.0f}", subset=[c for c in risky.columns if c.startswith(("unmet_", "revenue_at_risk_"))]).format({"stockout_prob": "{:.1%}"}), use_container_width=True, hide_index=True)
+
+def show_moves(file_hash, horizon, demand_uplift, supply_delay, plan, dfs, summary):
+    """Cheapest pull-ins and lane transfers closing the scenario's stockouts, run on request."""
+    with st.expander("🚚 Expedite & Rebalance"):
+        st.caption(
+            "Pulls later Supply_Plan receipts in and ships stock along Logistics_Lanes, cheapest first. "
+            "Set max_pull_in_weeks and expedite_cost_per_unit_week in Constraints_Params. Network mode is not applied here."
+        )
+        moves_key = (file_hash, horizon, demand_uplift, supply_delay)
+        if st.button("🚚 Propose Moves"):
+            st.session_state["moves_key"] = moves_key
+        if st.session_state.get("moves_key") != moves_key:
+            return
+        
+        with st.spinner("Closing stockouts..."):
+            moves, after = compute_moves(*moves_key, plan, dfs)
+        m1, m2, m3 = st.columns(3)
+        m1.metric("⚠️ SKUs with Stockouts", int(after["stockout_flag"].sum()), delta=int(after["stockout_flag"].sum() - summary["stockout_flag"].sum()), delta_color="inverse")
+        m2.metric("💰 Revenue at Risk", f"${after['revenue_at_risk'].sum():,.0f}", delta=f"{after['revenue_at_risk'].sum() - summary['revenue_at_risk'].sum():,.0f}", delta_color="inverse")
+        m3.metric("🚚 Cost of Moves", f"${moves['cost'].sum():,.2f}")
+        if moves.empty:
+            st.info("No pull-in or transfer can close the stockouts in this scenario.")
+            return
+        st.dataframe(
+            moves.head(ACTION_PAGE_SIZES[-1]).style.format({"qty": "{:,.0f}", "unit_cost": "${:,.2f}", "cost": "${:,.2f}"}),
+            use_container_width=True, hide_index=True
+        )
+        st.download_button("⬇️ Download all moves (CSV)", data=moves.to_csv(index=False), file_name="proposed_moves.csv", mime="text/csv")
+
+def show_diagnostics(prof):
+    """Per-stage wall time, rows and peak RSS growth for the current rerun."""
+    stages = prof.frame()
+    with st.expander(f"🩺 Diagnostics ({stages['seconds'].sum():.2f}s in {len(stages)} stages)"):
+        cache = get_result_cache().stats()
+        st.caption(
+            f"Result cache: {cache['entries']} entries, {cache['bytes'] / 2**20:,.1f} of {cache['max_bytes'] / 2**20:,.0f} MB, "
+            f"{cache['hits']:,} hits / {cache['misses']:,} misses, {cache['evictions']:,} evicted"
+        )
+        if stages.empty:
+            st.caption("Nothing was recomputed on this run (all steps served from cache).")
+            return
+        st.bar_chart(stages.set_index("stage")["seconds"])
+        st.dataframe(stages, use_container_width=True)
+        st.download_button("⬇️ Download profile (JSON)", data=prof.to_json(), file_name="profile.json", mime="application/json")
 
 # ---------------------------------------------------------
 # Main Navigation
@@ -0,0 +1,140 @@
+"""
+Headless KPI run for scheduled jobs.
+
+    python -m batch_runner control_tower_input_with_help.xlsx -o out/ --format parquet
+    python -m batch_runner tables/ --uplift 0 0.1 0.2 --delay 0 2 --horizon 8 12
+
+Input is an .xlsx workbook or a directory of per-sheet Parquet/CSV files
+(Inventory.parquet, Demand_Plan.csv, ...). Without --uplift/--delay/--horizon
+the scenario comes from the Constraints_Params sheet. Imports neither
+Streamlit nor python-pptx.
+"""
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+from typing import Dict, List, Optional
+
+import ingest
+import validator
+import kpi_engine
+import pipeline
+import profiling
+
+OUTPUT_FORMATS = ["parquet", "csv", "xlsx"]
+EXCEL_MAX_ROWS = 1_048_575
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m batch_runner", description="Run the KPI pipeline without the UI.")
+    p.add_argument("input", help=".xlsx workbook or directory of per-sheet .parquet/.csv files")
+    p.add_argument("-o", "--out", default="kpi_output", help="Output directory (default: kpi_output)")
+    p.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet", help="Output format (default: parquet)")
+    p.add_argument("--uplift", type=float, nargs="+", help="Demand uplift levers, e.g. 0 0.1 0.2")
+    p.add_argument("--delay", type=int, nargs="+", help="Supply delay levers in weeks")
+    p.add_argument("--horizon", type=int, nargs="+", help="Planning horizons in weeks")
+    p.add_argument("--workers", type=int, default=1, help="Processes for sharded runs (0 = all cores)")
+    p.add_argument("--network", action="store_true", help="Project along Logistics_Lanes (multi-echelon)")
+    p.add_argument("--by-priority", action="store_true", help="Serve customer_priority tiers in rank order and report per-tier fill rates")
+    p.add_argument("--samples", type=int, default=0, help="Monte Carlo draws per key for the first scenario (0 = off)")
+    p.add_argument("--seed", type=int, default=0, help="Monte Carlo seed (default: 0)")
+    p.add_argument("--optimize", action="store_true", help="Propose pull-ins/transfers closing stockouts for the first scenario")
+    p.add_argument("--no-detail", action="store_true", help="Only write the summary")
+    p.add_argument("--profile", metavar="PATH", help="Write per-stage timings/rows/peak RSS as JSON")
+    return p.parse_args(argv)
+
+def build_scenarios(args: argparse.Namespace, dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """CLI levers if any were given (others from Constraints_Params), else Constraints_Params alone."""
+    base = pipeline.scenarios_from_params(dfs).iloc[0]
+    if args.uplift is None and args.delay is None and args.horizon is None:
+        return pipeline.scenarios_from_params(dfs)
+    return kpi_engine.scenario_grid(
+        args.uplift if args.uplift is not None else [float(base["demand_uplift_pct"])],
+        args.delay if args.delay is not None else [int(base["supply_delay_weeks"])],
+        args.horizon if args.horizon is not None else [int(base["horizon_weeks"])]
+    )
+
+@profiling.profiled("write_results")
+def write_results(frames: Dict[str, pd.DataFrame], out_dir: str, fmt: str) -> List[str]:
+    """
+    Writes each frame as <name>.<fmt>; xlsx puts them all in one workbook.
+
+    Returns:
+        Paths written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if fmt == "xlsx":
+        too_big = [name for name, df in frames.items() if len(df) > EXCEL_MAX_ROWS]
+        if too_big:
+            raise ValueError(f"{', '.join(too_big)} exceeds the Excel row limit; use --format parquet or csv")
+        path = os.path.join(out_dir, "kpi_results.xlsx")
+        with pd.ExcelWriter(path) as writer:
+            for name, df in frames.items():
+                df.to_excel(writer, sheet_name=name, index=False)
+        return [path]
+
+    paths = []
+    for name, df in frames.items():
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not args.profile:
+        return run(args)
+
+    with profiling.collect() as prof:
+        code = run(args)
+    with open(args.profile, "w") as f:
+        f.write(prof.to_json())
+    print(f"wrote {args.profile}")
+    return code
+
+def run(args: argparse.Namespace) -> int:
+    t0 = time.perf_counter()
+
+    dfs, _ = ingest.read_path(args.input)
+    dfs, issues = validator.validate_plan(dfs)
+    if not validator.is_valid(issues):
+        print("Data validation failed:", file=sys.stderr)
+        for e in validator.error_messages(issues):
+            print(f"- {e}", file=sys.stderr)
+        return 1
+    warnings = issues.drop_duplicates(["sheet", "column", "rule"])
+    for r in warnings.itertuples():
+        print(f"warning: {r.sheet}: {r.rule} in {r.column} ({r.count} rows)", file=sys.stderr)
+
+    if args.network and pipeline.build_network(dfs) is None:
+        print("warning: --network ignored, Logistics_Lanes is missing or empty", file=sys.stderr)
+    scenarios = build_scenarios(args, dfs)
+    summary, detail = pipeline.run_pipeline(
+        dfs, scenarios,
+        include_detail=not args.no_detail,
+        workers=args.workers or None,
+        use_network=args.network,
+        by_priority=args.by_priority
+    )
+
+    frames = {"summary": summary}
+    if not args.no_detail:
+        frames["detail"] = detail
+    if args.samples > 0:
+        frames["montecarlo"], frames["montecarlo_portfolio"] = pipeline.run_montecarlo(
+            dfs, args.samples, args.seed, scenario=scenarios.iloc[0]
+        )
+    if args.optimize:
+        frames["actions"], frames["summary_optimized"] = pipeline.run_optimizer(dfs, scenario=scenarios.iloc[0])
+    paths = write_results(frames, args.out, args.format)
+
+    print(f"{len(scenarios)} scenario(s), {len(summary):,} summary rows in {time.perf_counter() - t0:.2f}s")
+    for path in paths:
+        print(f"wrote {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Performance benchmark on synthetic workbooks.
+
+    python -m benchmark --skus 2000 --locations 5 --weeks 12 -o bench.json
+    python -m benchmark --skus 2000 --baseline bench.json --max-regression 1.25
+
+Times each pipeline stage separately (best and median of --repeat runs),
+then re-runs once under tracemalloc for per-stage peak memory. Results go
+to a JSON file; with --baseline, stage medians are compared and the run
+fails if any stage slowed down by more than --max-regression.
+"""
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional, Callable, Tuple
+
+import ingest
+import validator
+import kpi_engine
+import make_template
+from pipeline import enrich_master, add_revenue_at_risk
+from ppt_export import generate_ppt
+
+STAGES = ["load_excel", "validate_data", "compute_kpis", "enrich_master", "generate_ppt"]
+
+def _stages(data: bytes, horizon: int) -> List[Tuple[str, Callable[[dict], dict]]]:
+    """Pipeline steps in app order; each reads and extends a shared state dict."""
+
+    def load(s):
+        s["dfs"], _ = ingest.read_workbook(data)
+        return {"rows_in": len(data), "rows_out": sum(len(df) for df in s["dfs"].values())}
+
+    def validate(s):
+        # validate_plan is the single-pass form of validate_data that also hands back coerced frames
+        s["dfs"], issues = validator.validate_plan(s["dfs"])
+        return {"rows_in": sum(len(df) for df in s["dfs"].values()), "rows_out": len(issues)}
+
+    def compute(s):
+        dfs = s["dfs"]
+        s["summary"], s["detail"] = kpi_engine.compute_kpis(dfs["Inventory"], dfs["Demand_Plan"], dfs["Supply_Plan"], horizon_weeks=horizon)
+        return {"rows_in": len(dfs["Inventory"]) + len(dfs["Demand_Plan"]) + len(dfs["Supply_Plan"]), "rows_out": len(s["detail"])}
+
+    def enrich(s):
+        s["summary"] = add_revenue_at_risk(enrich_master(s["summary"], s["dfs"]))
+        return {"rows_in": len(s["summary"]), "rows_out": len(s["summary"])}
+
+    def ppt(s):
+        summary = s["summary"]
+        deck = generate_ppt(
+            summary, summary["revenue_at_risk"].sum(), summary["stockout_flag"].sum(),
+            summary["fill_rate"].mean(), summary["safety_breach_flag"].sum()
+        )
+        return {"rows_in": len(summary), "rows_out": len(deck.getvalue())}
+
+    return list(zip(STAGES, [load, validate, compute, enrich, ppt]))
+
+def run_benchmark(
+    n_skus: int = 1000,
+    n_locations: int = 5,
+    weeks: int = 12,
+    sparsity: float = 0.0,
+    backlog_freq: float = 0.1,
+    repeat: int = 3,
+    seed: int = 0
+) -> Dict:
+    """
+    Benchmarks every stage on one synthetic workbook.
+
+    Returns:
+        JSON-ready dict with meta, params and one entry per stage:
+        seconds_min, seconds_median, peak_mb (tracemalloc), rows_in, rows_out
+    """
+    params = {
+        "n_skus": n_skus, "n_locations": n_locations, "weeks": weeks,
+        "sparsity": sparsity, "backlog_freq": backlog_freq, "repeat": repeat, "seed": seed,
+    }
+    dfs = make_template.synthetic_frames(n_skus, n_locations, weeks, sparsity, backlog_freq, seed)
+    buf = io.BytesIO()
+    make_template.write_workbook(dfs, buf, formatted=False)
+    data = buf.getvalue()
+    params["workbook_bytes"] = len(data)
+
+    stages = _stages(data, weeks)
+    timings = {name: [] for name, _ in stages}
+    counts = {}
+    for _ in range(max(repeat, 1)):
+        state = {}
+        for name, fn in stages:
+            t0 = time.perf_counter()
+            counts[name] = fn(state)
+            timings[name].append(time.perf_counter() - t0)
+
+    # Separate pass: tracemalloc overhead would skew the timings
+    peaks = {}
+    state = {}
+    tracemalloc.start()
+    try:
+        for name, fn in stages:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            fn(state)
+            peaks[name] = (tracemalloc.get_traced_memory()[1] - base) / 2**20
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "meta": _meta(),
+        "params": params,
+        "stages": {
+            name: {
+                "seconds_min": round(min(timings[name]), 6),
+                "seconds_median": round(float(np.median(timings[name])), 6),
+                "peak_mb": round(peaks[name], 3),
+                **counts[name],
+            }
+            for name, _ in stages
+        },
+    }
+
+def compare(result: Dict, baseline: Dict) -> pd.DataFrame:
+    """Per-stage median ratio vs a previous run (ratio > 1 = slower)."""
+    rows = []
+    for name, cur in result["stages"].items():
+        prev = baseline.get("stages", {}).get(name)
+        if prev is None:
+            continue
+        rows.append({
+            "stage": name,
+            "baseline_s": prev["seconds_median"],
+            "current_s": cur["seconds_median"],
+            "ratio": cur["seconds_median"] / prev["seconds_median"] if prev["seconds_median"] else np.nan,
+        })
+    return pd.DataFrame(rows, columns=["stage", "baseline_s", "current_s", "ratio"])
+
+def _meta() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmark", description="Time and memory-profile the KPI pipeline.")
+    p.add_argument("--skus", type=int, default=1000)
+    p.add_argument("--locations", type=int, default=5)
+    p.add_argument("--weeks", type=int, default=12)
+    p.add_argument("--sparsity", type=float, default=0.0, help="Share of demand rows left out")
+    p.add_argument("--backlog", type=float, default=0.1, help="Share of SKU-locations starting in backlog")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("-o", "--out", default="benchmark.json")
+    p.add_argument("--baseline", help="Previous benchmark JSON to compare against")
+    p.add_argument("--max-regression", type=float, default=None, help="Fail if any stage median ratio exceeds this")
+    args = p.parse_args(argv)
+
+    result = run_benchmark(args.skus, args.locations, args.weeks, args.sparsity, args.backlog, args.repeat, args.seed)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(pd.DataFrame(result["stages"]).T.to_string())
+    print(f"wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            ratios = compare(result, json.load(f))
+        print(ratios.to_string(index=False))
+        if args.max_regression is not None and (ratios["ratio"] > args.max_regression).any():
+            print(f"regression: stage slower than {args.max_regression}x baseline", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
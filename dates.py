@@ -0,0 +1,73 @@
+"""
+Week grid date math shared by the engine and the validator.
+
+Dates are handled as int64 days since 1970-01-01 and grid weeks start on
+Mondays, so week arithmetic is plain integer arithmetic.
+"""
+import functools
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+def to_days(col: pd.Series) -> np.ndarray:
+    """Dates -> int64 days since 1970-01-01 (NaT -> -1 sentinel, filter via mask)."""
+    # Frames from validator.validate_plan are already datetime64
+    ts = col if pd.api.types.is_datetime64_any_dtype(col) else pd.to_datetime(col)
+    days = ts.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+    return np.where(ts.isna().to_numpy(), -1, days)
+
+
+def days_to_dates(days: np.ndarray) -> np.ndarray:
+    """int days since epoch -> object array of datetime.date"""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype(object)
+
+
+@functools.lru_cache(maxsize=256)
+def week_calendar(anchor_day: int, n_weeks: int) -> np.ndarray:
+    """
+    Grid week starts (int days since epoch) for n_weeks from anchor_day.
+
+    Memoized per (anchor, horizon); the returned array is read-only.
+    """
+    days = int(anchor_day) + 7 * np.arange(max(0, int(n_weeks)), dtype=np.int64)
+    days.flags.writeable = False
+    return days
+
+
+def grid_anchor(inv: pd.DataFrame, calendar: Optional[pd.DataFrame] = None, flow_days: List[int] = ()) -> int:
+    """
+    First grid Monday (days since epoch) for a workbook.
+
+    Args:
+        inv: Inventory; the latest as_of_date's week is the snapshot week
+        calendar: Optional Calendar sheet; its first week_start on or after
+            the snapshot week wins
+        flow_days: Dated demand/supply days, used when there is no snapshot
+
+    Returns:
+        Monday days since epoch; inputs without any date anchor at week 0
+    """
+    as_of = to_days(inv["as_of_date"]) if "as_of_date" in inv.columns and len(inv) else np.zeros(0, dtype=np.int64)
+    as_of = as_of[as_of >= 0]
+    start = int(monday(as_of.max())) if len(as_of) else None
+
+    if calendar is not None and "week_start" in calendar.columns and len(calendar):
+        weeks = to_days(calendar["week_start"])
+        weeks = np.unique(monday(weeks[weeks >= 0]))
+        if start is not None:
+            weeks = weeks[weeks >= start]
+        if len(weeks):
+            return int(weeks[0])
+    if start is not None:
+        return start
+    return int(monday(min(flow_days))) if flow_days else 4
+
+
+def monday(days: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday (weekday 3)
+    return days - (days + 3) % 7
+
+
+def week_number(days: np.ndarray) -> np.ndarray:
+    """Monday days since epoch -> weeks since Monday 1970-01-05"""
+    return (np.asarray(days) - 4) // 7
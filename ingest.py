@@ -0,0 +1,159 @@
+import io
+import os
+import time
+import pandas as pd
+from typing import Dict, List, Tuple, Union, Optional, Iterable
+from openpyxl import load_workbook
+
+import validator
+import profiling
+
+# Columns the engine reads beyond validator.REQUIRED_COLS. Anything else in
+# the workbook (Help, descriptive columns, ...) is never parsed.
+OPTIONAL_COLS = {
+    "Inventory": ["safety_stock_qty", "qa_hold_qty", "blocked_qty"],
+    "Demand_Plan": ["customer_priority"],
+    "Master_Data": ["sku", "location", "unit_revenue", "unit_cogs", "holding_cost_rate_pa"],
+    "Constraints_Params": ["param_name", "param_value"],
+    "Logistics_Lanes": ["from_location", "to_location", "transit_days", "cost_per_unit"],
+    "Calendar": ["week_start"],
+}
+
+DATE_COLS = {"as_of_date", "week_start"}
+TEXT_COLS = {"sku", "location", "param_name", "from_location", "to_location", "customer_priority"}
+
+# Per-sheet table files accepted by read_tables, in lookup order
+TABLE_EXTENSIONS = [".parquet", ".csv"]
+
+def sheet_columns() -> Dict[str, List[str]]:
+    """Sheet -> columns to load (required first, then optional)."""
+    spec = {sh: list(cols) for sh, cols in validator.REQUIRED_COLS.items()}
+    for sh, cols in OPTIONAL_COLS.items():
+        spec.setdefault(sh, [])
+        spec[sh] += [c for c in cols if c not in spec[sh]]
+    return spec
+
+@profiling.profiled("load_excel")
+def read_workbook(
+    source: Union[bytes, str],
+    columns: Optional[Dict[str, List[str]]] = None
+) -> Tuple[Dict[str, pd.DataFrame], List[Dict]]:
+    """
+    Streams only the needed sheets/columns of an .xlsx file.
+
+    Uses openpyxl read-only mode and iter_rows(values_only=True), so cell
+    objects are never materialized and unused sheets are never opened.
+    Types are coerced per column as it is built: dates -> datetime64,
+    sku/location -> str, everything else -> float (invalid -> NaT/NaN, left
+    for the validator to report). Blank rows are skipped; each frame is
+    indexed by the Excel row it came from (validator.SOURCE_ROW), so
+    validation issues point at the right row.
+
+    Args:
+        source: Raw file bytes or a path
+        columns: Sheet -> columns to keep (defaults to sheet_columns())
+
+    Returns:
+        (dfs, report) where report has one dict per loaded sheet with
+        sheet, rows, columns and seconds.
+    """
+    columns = columns or sheet_columns()
+    fh = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    wb = load_workbook(fh, read_only=True, data_only=True)
+
+    dfs = {}
+    report = []
+    try:
+        for sh in wb.sheetnames:
+            if sh not in columns:
+                continue
+            t0 = time.perf_counter()
+            dfs[sh] = _read_sheet(wb[sh].iter_rows(values_only=True), columns[sh])
+            report.append({
+                "sheet": sh,
+                "rows": len(dfs[sh]),
+                "columns": len(dfs[sh].columns),
+                "seconds": round(time.perf_counter() - t0, 4),
+            })
+    finally:
+        wb.close()
+
+    return dfs, report
+
+@profiling.profiled("load_tables")
+def read_tables(directory: str, columns: Optional[Dict[str, List[str]]] = None) -> Tuple[Dict[str, pd.DataFrame], List[Dict]]:
+    """
+    Loads one Parquet or CSV file per sheet (e.g. Inventory.parquet,
+    Demand_Plan.csv) from a directory, with the same column pruning and
+    coercion as read_workbook. Sheets without a file are skipped.
+
+    Returns:
+        (dfs, report) as read_workbook
+    """
+    columns = columns or sheet_columns()
+    dfs = {}
+    report = []
+    for sh, wanted in columns.items():
+        path = next((os.path.join(directory, sh + ext) for ext in TABLE_EXTENSIONS if os.path.exists(os.path.join(directory, sh + ext))), None)
+        if path is None:
+            continue
+        t0 = time.perf_counter()
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            present = [c for c in wanted if c in pq.read_schema(path).names]
+            raw = pd.read_parquet(path, columns=present)
+        else:
+            raw = pd.read_csv(path, usecols=lambda c: c in wanted)
+        dfs[sh] = pd.DataFrame({c: _coerce(c, raw[c]) for c in wanted if c in raw.columns})
+        report.append({
+            "sheet": sh,
+            "rows": len(dfs[sh]),
+            "columns": len(dfs[sh].columns),
+            "seconds": round(time.perf_counter() - t0, 4),
+        })
+    return dfs, report
+
+def read_path(path: str) -> Tuple[Dict[str, pd.DataFrame], List[Dict]]:
+    """Dispatches to read_tables for a directory, read_workbook otherwise."""
+    if os.path.isdir(path):
+        return read_tables(path)
+    return read_workbook(path)
+
+def _read_sheet(rows: Iterable[tuple], wanted: List[str]) -> pd.DataFrame:
+    """Header row + column pruning + per-column coercion, indexed by sheet row."""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+
+    names = [str(h) if h is not None else None for h in header]
+    picks = [(names.index(c), c) for c in wanted if c in names]
+
+    values = {c: [] for _, c in picks}
+    source_rows = []
+    # Read-only sheets yield gaps as empty rows, so the count matches Excel
+    for n, row in enumerate(rows, start=2):
+        if row is None or all(v is None for v in row):
+            continue
+        source_rows.append(n)
+        for i, c in picks:
+            values[c].append(row[i] if i < len(row) else None)
+
+    df = pd.DataFrame({c: _coerce(c, values[c]) for _, c in picks})
+    if picks:
+        df.index = pd.Index(source_rows, name=validator.SOURCE_ROW)
+    return df
+
+def _coerce(col: str, values: Union[list, pd.Series]) -> pd.Series:
+    if isinstance(values, pd.Series):
+        # Typed columns (Parquet, CSV) only convert when needed
+        if col in DATE_COLS:
+            return values if pd.api.types.is_datetime64_any_dtype(values) else pd.Series(pd.to_datetime(values, errors='coerce'))
+        if col in TEXT_COLS:
+            return values.astype(str).astype(object).where(values.notna(), None)
+        return values if pd.api.types.is_numeric_dtype(values) else pd.to_numeric(values, errors='coerce')
+    if col in DATE_COLS:
+        return pd.Series(pd.to_datetime(pd.Series(values, dtype=object), errors='coerce'))
+    if col in TEXT_COLS:
+        return pd.Series([None if v is None else str(v) for v in values], dtype=object)
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
@@ -1,19 +1,47 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, Tuple, List
-import datetime
+from typing import Dict, Tuple, List, Optional
+import copy
+
+import profiling
+from dates import to_days, days_to_dates, monday, week_number, week_calendar, grid_anchor
+
+SCENARIO_COLS = ["demand_uplift_pct", "supply_delay_weeks", "horizon_weeks"]
+PROJECTION_METHODS = ["vectorized", "loop"]
+
+# Inventory stock that is part of on_hand_qty but not yet available to serve demand
+HOLD_COLS = ["qa_hold_qty", "blocked_qty"]
+
+# Weeks from the first projected week until held stock becomes available
+# (0 = available immediately, None = held for the whole horizon)
+DEFAULT_RELEASE_WEEKS = {"qa_hold_qty": 2, "blocked_qty": None}
+
+WEEKS_PER_YEAR = 52
+
+# Demand rows without a customer_priority fall into this tier, ranked last by default
+UNASSIGNED_TIER = "UNASSIGNED"
+
+# Cover and service targets (Constraints_Params names)
+DEFAULT_TARGETS = {
+    "excess_weeks_threshold": 12.0,   # stock beyond this many weeks of forward demand is excess
+    "service_level_target": 0.95,     # cumulative fill rate below this is a service breach
+}
 
 def compute_kpis(
-    inv: pd.DataFrame, 
-    demand: pd.DataFrame, 
-    supply: pd.DataFrame, 
+    inv: pd.DataFrame,
+    demand: pd.DataFrame,
+    supply: pd.DataFrame,
     horizon_weeks: int = 8,
     demand_uplift_pct: float = 0.0,
-    supply_delay_weeks: int = 0
+    supply_delay_weeks: int = 0,
+    method: str = "vectorized",
+    safety_stock_plan: Optional[pd.DataFrame] = None,
+    master: Optional[pd.DataFrame] = None,
+    release_weeks: Optional[Dict[str, Optional[int]]] = None
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Computes deterministic supply chain KPIs.
-    
+
     Args:
         inv: Inventory snapshot (sku, location, on_hand_qty, etc.)
         demand: Weekly demand (week_start, sku, location, forecast_qty)
@@ -21,167 +49,1185 @@ def compute_kpis(
         horizon_weeks: Number of weeks to project
         demand_uplift_pct: Scenario lever (e.g. 0.10 for 10% uplift)
         supply_delay_weeks: Scenario lever (shift supply by N weeks)
-        
+        method: Projection backend. "vectorized" (default) runs the NumPy
+            matrix kernel; "loop" runs the original per-row reference loop.
+        safety_stock_plan: Optional time-phased targets (week_start, sku,
+            location, safety_stock_qty). Each row applies from its week until
+            the key's next row; earlier weeks use Inventory safety_stock_qty.
+        master: Optional Master_Data (sku[, location], unit_cogs,
+            holding_cost_rate_pa) for projected holding cost
+        release_weeks: Release lead time per HOLD_COLS column, overriding
+            DEFAULT_RELEASE_WEEKS
+
     Returns:
         (summary_df, detail_df)
     """
-    
-    # ----------------------------------------------------
-    # 1. Pre-process & Scenario Application
-    # ----------------------------------------------------
-    inv = inv.copy()
-    d_df = demand.copy()
-    s_df = supply.copy()
-    
-    # Ensure minimal schema for empty dfs to avoid key errors later
-    if d_df.empty: 
-        d_df = pd.DataFrame(columns=["week_start", "sku", "location", "forecast_qty"])
-    if s_df.empty:
-        s_df = pd.DataFrame(columns=["week_start", "sku", "location", "supply_qty"])
-    if inv.empty:
-        inv = pd.DataFrame(columns=["as_of_date", "sku", "location", "on_hand_qty", "safety_stock_qty"])
-
-    # Ensure dates
-    for df, col in [(inv, "as_of_date"), (d_df, "week_start"), (s_df, "week_start")]:
-        # Safety for columns existing now
-        if col not in df.columns: df[col] = []
-        df[col] = pd.to_datetime(df[col]).dt.date
-
-    # Numeric conversion
-    for df, col in [(d_df, "forecast_qty"), (s_df, "supply_qty"), (inv, "on_hand_qty"), (inv, "safety_stock_qty")]:
-        if col not in df.columns: df[col] = 0.0
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    # Scenarios
-    if demand_uplift_pct != 0:
-        d_df["forecast_qty"] *= (1.0 + demand_uplift_pct)
-        
-    if supply_delay_weeks > 0:
-        # Add weeks to week_start
-        s_df["week_start"] = pd.to_datetime(s_df["week_start"]) + pd.to_timedelta(7 * supply_delay_weeks, unit="D")
-        s_df["week_start"] = s_df["week_start"].dt.date
-
-    # ----------------------------------------------------
-    # 2. Build Grid (SKU-Location-Week)
-    # ----------------------------------------------------
-    # Determine start week
-    starts = []
-    if not d_df.empty: starts.append(d_df["week_start"].min())
-    if not s_df.empty: starts.append(s_df["week_start"].min())
-    
-    if starts:
-        start_week = min(starts)
-    else:
-        start_week = datetime.date.today()
-    
-    # Normalize to Monday (0)
-    # If using ISO weeks, we want the Monday of that week.
-    start_week = start_week - datetime.timedelta(days=start_week.weekday())
-
-    weeks = [start_week + datetime.timedelta(days=7*i) for i in range(horizon_weeks)]
-    weeks_df = pd.DataFrame({"week_start": weeks})
-    
-    keys = inv[["sku", "location"]].drop_duplicates()
-    
-    # Cartesian product: Keys x Weeks
-    grid = keys.assign(_k=1).merge(weeks_df.assign(_k=1), on="_k").drop(columns="_k")
-    
-    # Aggregate demand/supply to SKU-Loc-Week level
-    d_agg = d_df.groupby(["sku", "location", "week_start"], as_index=False)["forecast_qty"].sum()
-    s_agg = s_df.groupby(["sku", "location", "week_start"], as_index=False)["supply_qty"].sum()
-    
-    # Merge into grid
-    detail = grid.merge(d_agg, on=["sku", "location", "week_start"], how="left") \
-                 .merge(s_agg, on=["sku", "location", "week_start"], how="left") \
-                 .fillna({"forecast_qty": 0, "supply_qty": 0})
-                 
-    # Merge initial inventory
-    inv_agg = inv.groupby(["sku", "location"], as_index=False)[["on_hand_qty", "safety_stock_qty"]].sum()
-    detail = detail.merge(inv_agg, on=["sku", "location"], how="left").fillna(0)
-    
-    # ----------------------------------------------------
-    # 3. Recursive Calculation (NAI, POH, etc.)
-    # ----------------------------------------------------
-    detail = detail.sort_values(["sku", "location", "week_start"])
-    
+    if method not in PROJECTION_METHODS:
+        raise ValueError(f"Unknown projection method: {method}")
+
+    plan = PreparedPlan(inv, demand, supply, safety_stock_plan, master, release_weeks)
+    return plan.project(horizon_weeks, demand_uplift_pct, supply_delay_weeks, method=method)
+
+
+def compute_kpis_batch(
+    inv: pd.DataFrame,
+    demand: pd.DataFrame,
+    supply: pd.DataFrame,
+    scenarios: pd.DataFrame,
+    include_detail: bool = True,
+    safety_stock_plan: Optional[pd.DataFrame] = None,
+    master: Optional[pd.DataFrame] = None,
+    release_weeks: Optional[Dict[str, Optional[int]]] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Evaluates many scenarios in one pass.
+
+    Inputs are parsed and aggregated once, then laid out as a
+    (scenarios x keys x weeks) tensor and projected in a single kernel call.
+
+    Args:
+        inv, demand, supply, safety_stock_plan, master, release_weeks: Same as compute_kpis
+        scenarios: One row per scenario with demand_uplift_pct,
+            supply_delay_weeks and horizon_weeks (see scenario_grid).
+            Missing columns take compute_kpis defaults.
+        include_detail: Set False to skip building the stacked detail frame
+
+    Returns:
+        (summary_df, detail_df) stacked over scenarios and tagged with scenario_id.
+        Each scenario slice matches compute_kpis for the same levers.
+    """
+    plan = PreparedPlan(inv, demand, supply, safety_stock_plan, master, release_weeks)
+    return plan.project_batch(scenarios, include_detail=include_detail)
+
+
+def scenario_grid(
+    uplifts: List[float] = (0.0,),
+    delays: List[int] = (0,),
+    horizons: List[int] = (8,)
+) -> pd.DataFrame:
+    """
+    Builds the cartesian product of scenario levers.
+
+    Returns:
+        DataFrame with scenario_id, demand_uplift_pct, supply_delay_weeks, horizon_weeks
+    """
+    grid = pd.MultiIndex.from_product([uplifts, delays, horizons], names=SCENARIO_COLS).to_frame(index=False)
+    grid.insert(0, "scenario_id", np.arange(len(grid)))
+    return grid
+
+
+# ----------------------------------------------------
+# Prepared Inputs
+# ----------------------------------------------------
+class PreparedPlan:
+    """
+    Parsed, aggregated and integer-coded inputs for one workbook.
+
+    Build once per upload; every scenario is then a call to project() or
+    project_batch() that skips copies, date parsing, groupbys and merges.
+
+    Attributes:
+        skus, locations: Sorted dimension tables; position is the int code
+        sku_code, loc_code: int32 codes of each (sku, location) key, sorted
+        keys: The same keys as categorical sku/location columns
+        on_hand, safety_stock: Per-key float arrays aligned with keys
+        held: HOLD_COLS column -> per-key held qty, capped so holds never
+            exceed on_hand (QA hold is netted first, then blocked)
+        release_weeks: HOLD_COLS column -> release lead time in weeks (None = never)
+        holding_rate: Per-key holding cost per unit per week
+            (unit_cogs x holding_cost_rate_pa / 52; 0 without Master_Data)
+        demand, supply: (key code, week number, qty) flows, one entry per
+            key-week. Week numbers are int32 Mondays since 1970-01-05.
+        ss_plan: Time-phased safety stock as (key code, week number, qty)
+            change points; empty when only Inventory safety_stock_qty is used
+        tiers: customer_priority tiers, highest priority first (empty
+            without the column)
+        tier_demand: Demand flows per tier, aligned with tiers
+        targets: DEFAULT_TARGETS with any overrides applied
+        anchor_day: First grid Monday (days since epoch). Every scenario
+            starts here, whatever its supply delay: the first Calendar week
+            on or after the Inventory as_of_date week, else that week,
+            else the earliest dated demand/supply row.
+    """
+
+    def __init__(
+        self,
+        inv: pd.DataFrame,
+        demand: pd.DataFrame,
+        supply: pd.DataFrame,
+        safety_stock_plan: Optional[pd.DataFrame] = None,
+        master: Optional[pd.DataFrame] = None,
+        release_weeks: Optional[Dict[str, Optional[int]]] = None,
+        priority_order: Optional[List[str]] = None,
+        calendar: Optional[pd.DataFrame] = None,
+        targets: Optional[Dict[str, float]] = None
+    ):
+        # ----------------------------------------------------
+        # 1. Pre-process (once per workbook)
+        # ----------------------------------------------------
+        prof = profiling.timer("compute_kpis")
+        inv = inv.copy() if not inv.empty else pd.DataFrame(columns=["sku", "location", "on_hand_qty", "safety_stock_qty"])
+        for col in ["on_hand_qty", "safety_stock_qty"] + HOLD_COLS:
+            if col not in inv.columns: inv[col] = 0.0
+            inv[col] = pd.to_numeric(inv[col], errors='coerce').fillna(0)
+
+        # Dimension tables: sorted factorization keeps string sort order on ints
+        sku_codes, self.skus = pd.factorize(inv["sku"], sort=True)
+        loc_codes, self.locations = pd.factorize(inv["location"], sort=True)
+        ok = (sku_codes >= 0) & (loc_codes >= 0)
+
+        key_ids, inverse = np.unique(self._key_id(sku_codes[ok], loc_codes[ok]), return_inverse=True)
+        self._key_ids = key_ids
+        self.sku_code = (key_ids // max(len(self.locations), 1)).astype(np.int32)
+        self.loc_code = (key_ids % max(len(self.locations), 1)).astype(np.int32)
+        self.keys = pd.DataFrame({"sku": self._categorical(self.sku_code, self.skus), "location": self._categorical(self.loc_code, self.locations)})
+
+        n_keys = len(key_ids)
+        self.on_hand = np.bincount(inverse, weights=inv["on_hand_qty"].to_numpy(float)[ok], minlength=n_keys)
+        self.safety_stock = np.bincount(inverse, weights=inv["safety_stock_qty"].to_numpy(float)[ok], minlength=n_keys)
+
+        # Holds are part of on_hand_qty: net them here, once, rather than per scenario
+        self.held = {}
+        free = np.maximum(self.on_hand, 0)
+        for col in HOLD_COLS:
+            qty = np.bincount(inverse, weights=inv[col].to_numpy(float)[ok], minlength=n_keys)
+            self.held[col] = np.clip(qty, 0, free)
+            free = free - self.held[col]
+        self.release_weeks = _release_weeks(release_weeks)
+        self.targets = _targets(targets)
+        self.holding_rate = self._holding_rate(master)
+
+        d_min_day, self.demand = self._flows(demand, "forecast_qty")
+        self.tiers, self.tier_demand = self._tier_flows(demand, priority_order)
+        s_min_day, self.supply = self._flows(supply, "supply_qty")
+        _, self.ss_plan = self._flows(safety_stock_plan if safety_stock_plan is not None else pd.DataFrame(), "safety_stock_qty")
+        self.anchor_day = grid_anchor(inv, calendar, [d for d in (d_min_day, s_min_day) if d is not None])
+        self._fingerprints = None
+        prof.lap("1_preprocess", rows_in=len(inv) + len(demand) + len(supply), rows_out=n_keys)
+
+    @property
+    def n_keys(self) -> int:
+        return len(self._key_ids)
+
+    def key_table(self) -> pd.DataFrame:
+        """Per-key constants (on_hand_qty, holds, Inventory safety_stock_qty, holding rate), one row per key."""
+        return self.keys.assign(on_hand_qty=self.on_hand, **self.held, safety_stock_qty=self.safety_stock, holding_cost_per_week=self.holding_rate)
+
+    def _key_id(self, sku_codes: np.ndarray, loc_codes: np.ndarray) -> np.ndarray:
+        return sku_codes.astype(np.int64) * len(self.locations) + loc_codes
+
+    @staticmethod
+    def _categorical(codes: np.ndarray, categories: pd.Index) -> pd.Categorical:
+        return pd.Categorical.from_codes(codes, categories=categories)
+
+    def key_codes(self, sku: pd.Series, location: pd.Series) -> np.ndarray:
+        """Maps sku/location values to key codes (-1 where the key is not in Inventory)."""
+        sku_c = _dim_codes(self.skus, sku)
+        loc_c = _dim_codes(self.locations, location)
+        if self.n_keys == 0:
+            return np.full(len(sku_c), -1)
+        ids = self._key_id(sku_c, loc_c)
+        pos = np.minimum(np.searchsorted(self._key_ids, ids), self.n_keys - 1)
+        found = (sku_c >= 0) & (loc_c >= 0) & (self._key_ids[pos] == ids)
+        return np.where(found, pos, -1)
+
+    def _holding_rate(self, master: Optional[pd.DataFrame]) -> np.ndarray:
+        """
+        Per-key holding cost per unit per week from Master_Data, matched on
+        (sku, location) when it has a location column, else on sku. The first
+        row per key wins, as in pipeline.enrich_master; unmatched keys cost 0.
+        """
+        rate = np.zeros(self.n_keys)
+        if master is None or master.empty or not {"sku", "unit_cogs", "holding_cost_rate_pa"} <= set(master.columns):
+            return rate
+
+        cogs = pd.to_numeric(master["unit_cogs"], errors='coerce')
+        rate_pa = pd.to_numeric(master["holding_cost_rate_pa"], errors='coerce')
+        per_week = (cogs * rate_pa / WEEKS_PER_YEAR).fillna(0).to_numpy(float)
+        if "location" in master.columns:
+            codes = self.key_codes(master["sku"], master["location"])
+            table = rate
+        else:
+            codes = _dim_codes(self.skus, master["sku"])
+            table = np.zeros(len(self.skus))
+        ok = np.flatnonzero(codes >= 0)
+        # First row per key, picked explicitly rather than by write order
+        keys, first = np.unique(codes[ok], return_index=True)
+        table[keys] = per_week[ok[first]]
+        return rate if table is rate else table[self.sku_code]
+
+    def releases(self, n_weeks: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Held stock over a projection window.
+
+        Returns:
+            (opening, released, still_held): opening is on_hand net of every
+            hold not released in week 0; released and still_held are
+            (keys x weeks) quantities becoming available / still held each week.
+        """
+        opening = self.on_hand.copy()
+        released = np.zeros((self.n_keys, n_weeks))
+        still_held = np.zeros((self.n_keys, n_weeks))
+        for col, qty in self.held.items():
+            lead = self.release_weeks[col]
+            if lead == 0:
+                continue
+            opening -= qty
+            until = n_weeks if lead is None else min(lead, n_weeks)
+            still_held[:, :until] += qty[:, None]
+            if lead is not None and lead < n_weeks:
+                released[:, lead] += qty
+        return opening, released, still_held
+
+    def _tier_flows(self, demand: pd.DataFrame, priority_order: Optional[List[str]]) -> Tuple[List[str], List[Tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        """
+        Splits demand flows by customer_priority.
+
+        Tiers named in priority_order come first, in that order; the rest
+        follow alphabetically, with UNASSIGNED_TIER (blank priority) last.
+        """
+        if demand.empty or "customer_priority" not in demand.columns:
+            return [], []
+        labels = demand["customer_priority"].astype(object).where(demand["customer_priority"].notna(), UNASSIGNED_TIER).astype(str).str.strip()
+        codes, found = pd.factorize(labels)
+        ranked = [t for t in (priority_order or []) if t in set(found)]
+        rest = sorted(t for t in found if t not in ranked and t != UNASSIGNED_TIER)
+        tiers = ranked + rest + ([UNASSIGNED_TIER] if UNASSIGNED_TIER in set(found) and UNASSIGNED_TIER not in ranked else [])
+        return tiers, [self._flows(demand[codes == found.get_loc(t)], "forecast_qty")[1] for t in tiers]
+
+    def _flows(self, df: pd.DataFrame, qty_col: str) -> Tuple[Optional[int], Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Reduces a plan sheet to (min_day, (code, week, qty)) against the inventory keys."""
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=float))
+        if df.empty or "week_start" not in df.columns:
+            return None, empty
+
+        days = to_days(df["week_start"])
+        dated = days >= 0
+        # The grid anchor uses every dated row, matched to a key or not
+        min_day = int(days[dated].min()) if dated.any() else None
+
+        qty = pd.to_numeric(df[qty_col], errors='coerce').fillna(0).to_numpy(float) if qty_col in df.columns else np.zeros(len(df))
+        codes = self.key_codes(df["sku"], df["location"])
+        # Grid weeks are Mondays, so other dates can never land on the grid.
+        # Rows whose key is not in Inventory never reach the grid either.
+        keep = dated & (monday(days) == days) & (codes >= 0)
+        codes, weeks, qty = codes[keep], week_number(days[keep]), qty[keep]
+        if not len(codes):
+            return min_day, empty
+        return min_day, _aggregate_flows(codes, weeks, qty)
+
+    def fingerprints(self) -> Dict[str, np.ndarray]:
+        """
+        Per-key uint64 hashes of each input component, aligned with keys.
+
+        Flow hashes are order-independent sums over the key's (week, qty)
+        entries, so two plans can be compared key by key without a merge.
+        Computed once per plan.
+        """
+        if self._fingerprints is not None:
+            return self._fingerprints
+        out = {
+            "on_hand": pd.util.hash_array(self.on_hand),
+            "safety_stock": pd.util.hash_array(self.safety_stock),
+            "holds": pd.util.hash_array(self.held["qa_hold_qty"]) * np.uint64(1000003) ^ pd.util.hash_array(self.held["blocked_qty"]),
+            "holding_rate": pd.util.hash_array(self.holding_rate),
+        }
+        for name, flows in [("demand", self.demand), ("supply", self.supply), ("safety_stock_plan", self.ss_plan)]:
+            out[name] = self._flow_hash(flows)
+        # Weighted by rank, so moving demand between tiers shows up
+        out["demand_tiers"] = np.zeros(self.n_keys, dtype=np.uint64)
+        for rank, flows in enumerate(self.tier_demand):
+            out["demand_tiers"] += self._flow_hash(flows) * np.uint64(rank + 1)
+        self._fingerprints = out
+        return out
+
+    def _flow_hash(self, flows: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+        """Order-independent per-key sum of (week, qty) hashes."""
+        codes, weeks, qty = flows
+        h = pd.util.hash_array(weeks.astype(np.int64)) * np.uint64(1000003) ^ pd.util.hash_array(qty)
+        sums = np.zeros(self.n_keys, dtype=np.uint64)
+        if len(codes):
+            # Flows are sorted by key code, so each key is one contiguous run
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            sums[codes[starts]] = np.add.reduceat(h, starts)
+        return sums
+
+    @classmethod
+    def from_arrays(
+        cls,
+        skus: pd.Index,
+        locations: pd.Index,
+        key_ids: np.ndarray,
+        on_hand: np.ndarray,
+        safety_stock: np.ndarray,
+        demand: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        supply: Tuple[np.ndarray, np.ndarray, np.ndarray],
+        anchor_day: int,
+        ss_plan: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+        held: Optional[Dict[str, np.ndarray]] = None,
+        holding_rate: Optional[np.ndarray] = None,
+        release_weeks: Optional[Dict[str, Optional[int]]] = None,
+        tiers: Optional[List[str]] = None,
+        tier_demand: Optional[List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None,
+        targets: Optional[Dict[str, float]] = None
+    ) -> "PreparedPlan":
+        """Rebuilds a plan from its arrays (e.g. shared memory in a worker) without re-parsing."""
+        plan = object.__new__(cls)
+        plan.skus, plan.locations = skus, locations
+        plan._key_ids = np.asarray(key_ids, dtype=np.int64)
+        n_locs = max(len(locations), 1)
+        plan.sku_code = (plan._key_ids // n_locs).astype(np.int32)
+        plan.loc_code = (plan._key_ids % n_locs).astype(np.int32)
+        plan.keys = pd.DataFrame({"sku": cls._categorical(plan.sku_code, skus), "location": cls._categorical(plan.loc_code, locations)})
+        plan.on_hand, plan.safety_stock = on_hand, safety_stock
+        plan.held = held if held is not None else {col: np.zeros(len(plan._key_ids)) for col in HOLD_COLS}
+        plan.holding_rate = holding_rate if holding_rate is not None else np.zeros(len(plan._key_ids))
+        plan.release_weeks = _release_weeks(release_weeks)
+        plan.targets = _targets(targets)
+        plan.demand, plan.supply = demand, supply
+        plan.tiers, plan.tier_demand = list(tiers or []), list(tier_demand or [])
+        plan.ss_plan = ss_plan if ss_plan is not None else (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=float))
+        plan.anchor_day = int(anchor_day)
+        plan._fingerprints = None
+        return plan
+
+    def subset(self, codes: np.ndarray) -> "PreparedPlan":
+        """
+        Plan restricted to the given (sorted) key codes.
+
+        Dimension tables and the grid anchor are kept, so projecting the
+        subset gives exactly the rows a full run would give for those keys.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+
+        def _take(flows):
+            f_codes, weeks, qty = flows
+            pos = np.minimum(np.searchsorted(codes, f_codes), max(len(codes) - 1, 0))
+            keep = (codes[pos] == f_codes) if len(codes) else np.zeros(len(f_codes), dtype=bool)
+            return pos[keep].astype(np.int32), weeks[keep], qty[keep]
+
+        return PreparedPlan.from_arrays(
+            self.skus, self.locations, self._key_ids[codes],
+            self.on_hand[codes], self.safety_stock[codes],
+            _take(self.demand), _take(self.supply),
+            self.anchor_day,
+            _take(self.ss_plan),
+            {col: qty[codes] for col, qty in self.held.items()},
+            self.holding_rate[codes],
+            self.release_weeks,
+            self.tiers,
+            [_take(f) for f in self.tier_demand],
+            self.targets
+        )
+
+    def with_supply_moves(
+        self,
+        codes: np.ndarray,
+        weeks: np.ndarray,
+        qty: np.ndarray,
+        supply_delay_weeks: int = 0
+    ) -> "PreparedPlan":
+        """
+        The same plan with supply added (negative qty removes it), e.g. after
+        proposed moves. Other arrays are shared.
+
+        Args:
+            codes: Key code per move
+            weeks: Grid week per move (0 = anchor week), as projected under
+                supply_delay_weeks, so a move lands where it was planned
+            qty: Signed quantity per move
+            supply_delay_weeks: Scenario delay the weeks are seen under
+        """
+        first = int(week_number(self.anchor_day)) - max(0, int(supply_delay_weeks))
+        plan = copy.copy(self)
+        plan.supply = _aggregate_flows(
+            np.concatenate([self.supply[0], np.asarray(codes, dtype=np.int32)]),
+            np.concatenate([self.supply[1], first + np.asarray(weeks, dtype=np.int32)]),
+            np.concatenate([self.supply[2], np.asarray(qty, dtype=float)])
+        )
+        plan._fingerprints = None
+        return plan
+
+    def scenario_window(
+        self,
+        horizon_weeks: int = 8,
+        demand_uplift_pct: float = 0.0,
+        supply_delay_weeks: int = 0,
+        lead_weeks: int = 0
+    ) -> Tuple[int, np.ndarray, np.ndarray]:
+        """
+        Dense single-scenario inputs, laid out as project_batch lays them out.
+
+        Args:
+            lead_weeks: Extra supply weeks kept before the window, so further
+                delays of up to lead_weeks are a column shift
+
+        Returns:
+            (start_day, demand, supply): demand is (keys x horizon) with the
+            uplift applied; supply is (keys x (lead_weeks + horizon)) with the
+            delay applied, column lead_weeks being the first projected week.
+        """
+        delay, horizon = max(0, int(supply_delay_weeks)), max(0, int(horizon_weeks))
+        first = int(week_number(self.anchor_day))
+        demand = _dense(self.demand, self.n_keys, first, horizon) * (1.0 + demand_uplift_pct)
+        supply = _dense(self.supply, self.n_keys, first - delay - lead_weeks, lead_weeks + horizon)
+        return self.anchor_day, demand, supply
+
+    def project(
+        self,
+        horizon_weeks: int = 8,
+        demand_uplift_pct: float = 0.0,
+        supply_delay_weeks: int = 0,
+        method: str = "vectorized",
+        network=None,
+        by_priority: bool = False
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Runs one scenario. Same arguments and outputs as compute_kpis
+        (network, by_priority: see project_batch).
+        """
+        scenario = pd.DataFrame({
+            "demand_uplift_pct": [demand_uplift_pct],
+            "supply_delay_weeks": [supply_delay_weeks],
+            "horizon_weeks": [horizon_weeks],
+        })
+        summary, detail = self.project_batch(scenario, method=method, network=network, by_priority=by_priority)
+        return summary.drop(columns=["scenario_id"] + SCENARIO_COLS), detail.drop(columns=["scenario_id"])
+
+    def project_batch(
+        self,
+        scenarios: pd.DataFrame,
+        include_detail: bool = True,
+        method: str = "vectorized",
+        network=None,
+        by_priority: bool = False
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Runs many scenarios in one kernel call. See compute_kpis_batch.
+
+        With a network.Network, unmet demand is passed up the lanes and
+        filled transfers come back down first (see network.py). Stock
+        positions (NAI, POH, cover) then include dependent_demand_qty and
+        transfer_in_qty, while total_demand, served/unmet and fill rates stay
+        customer demand only; the children's requests and what could not be
+        shipped are reported apart as total_dependent_demand and
+        total_dependent_unmet (dependent_unmet_qty in detail). The summary
+        also adds total_transfer_in and total_transfer_cost.
+
+        With by_priority, each week's served quantity is allocated to the
+        customer_priority tiers in rank order (see tiers). The summary adds
+        total_demand_<tier>, total_served_<tier>, total_unmet_<tier> and
+        fill_rate_<tier>; detail adds served_qty_<tier> and unmet_qty_<tier>.
+        Totals are unchanged.
+        """
+        prof = profiling.timer("compute_kpis")
+        scen = scenarios.reset_index(drop=True).copy()
+        if "scenario_id" not in scen.columns:
+            scen.insert(0, "scenario_id", np.arange(len(scen)))
+        for col, default in zip(SCENARIO_COLS, [0.0, 0, 8]):
+            if col not in scen.columns: scen[col] = default
+
+        uplift = scen["demand_uplift_pct"].to_numpy(float)
+        # Negative delays are ignored, as in the single-scenario engine
+        delay = np.maximum(0, scen["supply_delay_weeks"].to_numpy(np.int64))
+        horizon = np.maximum(0, scen["horizon_weeks"].to_numpy(np.int64))
+        n_scen = len(scen)
+        n_keys = self.n_keys
+
+        # ----------------------------------------------------
+        # 2. Build Grid: one dense window, sliced per scenario
+        # ----------------------------------------------------
+        h_max = int(horizon.max()) if n_scen else 0
+        d_max = int(delay.max()) if n_scen else 0
+        calendar = week_calendar(self.anchor_day, h_max)
+        first = int(week_number(self.anchor_day))
+
+        # Supply is read d_max weeks early, so a delay is a plain column offset
+        d_dense = _dense(self.demand, n_keys, first, h_max)
+        s_dense = _dense(self.supply, n_keys, first - d_max, d_max + h_max)
+
+        weeks = np.arange(h_max)
+        valid = weeks[None, :] < horizon[:, None]
+
+        # (scenarios x keys x weeks)
+        d_t = np.where(valid[:, None, :], d_dense[None, :, :] * (1.0 + uplift)[:, None, None], 0.0)
+        s_t = s_dense[:, d_max - delay[:, None] + weeks[None, :]].transpose(1, 0, 2)
+        s_t = np.where(valid[:, None, :], s_t, 0.0)
+
+        # Held stock re-enters as a release on its lead-time week, unaffected by supply delay
+        opening, released, still_held = self.releases(h_max)
+        r_t = np.where(valid[:, None, :], released[None, :, :], 0.0) if released.any() else np.zeros((1, n_keys, h_max))
+        prof.lap("2_grid", rows_in=len(self.demand[0]) + len(self.supply[0]), rows_out=d_t.size)
+
+        # ----------------------------------------------------
+        # 3. Recursive Calculation (NAI, POH, etc.)
+        # ----------------------------------------------------
+        inflow = s_t + r_t if released.any() else s_t
+        need = d_t
+        if network is not None:
+            dependent, transfer_in = network.propagate(self, opening, d_t, inflow)
+            transfer_in = np.where(valid[:, None, :], transfer_in, 0.0)
+            need, inflow = d_t + dependent, inflow + transfer_in
+            prof.lap("3_network", rows_in=d_t.size, rows_out=int(np.count_nonzero(transfer_in)))
+
+        if method == "loop":
+            nai, poh, served, unmet = self._project_reference(opening, horizon, need, inflow)
+        elif method == "vectorized":
+            nai, poh, served, unmet = project_matrix(opening[None, :], need, inflow)
+        else:
+            raise ValueError(f"Unknown projection method: {method}")
+        prof.lap("3_project", rows_in=d_t.size, rows_out=nai.size)
+
+        if network is not None:
+            # Stock is shared pro-rata between customer demand and the
+            # children's requests, as in network.propagate. Served/unmet
+            # below are customer demand only, so a shortfall is not counted
+            # again at every echelon it is passed up to.
+            own = served * np.divide(d_t, need, out=np.zeros(need.shape), where=need > 0)
+            dependent_unmet = np.maximum(dependent - (served - own), 0.0)
+            served, unmet = own, np.maximum(d_t - own, 0.0)
+
+        tier_served = tier_unmet = None
+        if by_priority and self.tiers:
+            # (tiers x scenarios x keys x weeks), highest priority first
+            d_k = np.stack([_dense(f, n_keys, first, h_max) for f in self.tier_demand])
+            d_k = np.where(valid[None, :, None, :], d_k[:, None, :, :] * (1.0 + uplift)[None, :, None, None], 0.0)
+            # Each tier gets what is left after the tiers ahead of it
+            ahead = np.cumsum(d_k, axis=0) - d_k
+            tier_served = np.clip(served[None] - ahead, 0.0, d_k)
+            tier_unmet = d_k - tier_served
+            prof.lap("3_allocate", rows_in=d_k.size, rows_out=len(self.tiers))
+
+        # ----------------------------------------------------
+        # 4. Summary Stats
+        # ----------------------------------------------------
+        ss = _phased(self.ss_plan, self.safety_stock, first + weeks[None, :])
+        mask = np.broadcast_to(valid[:, None, :], nai.shape)
+        stockout = (nai < 0) & mask
+        ss_breach = (poh < ss) & mask
+        # Physical stock (available + still held) carries holding cost
+        holding = np.where(mask, (poh + still_held[None, :, :]) * self.holding_rate[None, :, None], 0.0)
+
+        # Past a scenario's horizon (padding, then beyond the grid) demand runs at its weekly average
+        avg = need.sum(axis=-1, keepdims=True) / np.maximum(horizon, 1)[:, None, None]
+        # A one-horizon grid (the cockpit sweep) has no padding to mask out
+        full = bool(valid.all())
+        cover, excess = _cover(poh, need if full else np.where(mask, need, avg), avg, self.targets["excess_weeks_threshold"])
+        # Cumulative fill rate to date, compared without dividing
+        target = np.cumsum(d_t, axis=-1)
+        target *= self.targets["service_level_target"]
+        service_breach = np.cumsum(served, axis=-1) < target
+        del target
+        if not full:
+            service_breach &= mask
+
+        def _first_week(flags: np.ndarray) -> np.ndarray:
+            if flags.shape[-1] == 0:
+                return np.full(flags.shape[0] * flags.shape[1], np.nan, dtype=object)
+            # Convert the handful of calendar weeks once, then index per key
+            dates = days_to_dates(calendar)[flags.argmax(axis=-1).ravel()]
+            dates[~flags.any(axis=-1).ravel()] = np.nan
+            return dates
+
+        summary = pd.DataFrame({
+            "scenario_id": np.repeat(scen["scenario_id"].to_numpy(), n_keys),
+            "demand_uplift_pct": np.repeat(uplift, n_keys),
+            "supply_delay_weeks": np.repeat(scen["supply_delay_weeks"].to_numpy(), n_keys),
+            "horizon_weeks": np.repeat(horizon, n_keys),
+            "sku": self._categorical(np.tile(self.sku_code, n_scen), self.skus),
+            "location": self._categorical(np.tile(self.loc_code, n_scen), self.locations),
+            "total_demand": d_t.sum(axis=-1).ravel(),
+            "total_served": served.sum(axis=-1).ravel(),
+            "total_unmet": unmet.sum(axis=-1).ravel(),
+            "min_nai": np.where(mask, nai, np.inf).min(axis=-1, initial=np.inf).ravel(),
+            "min_poh": np.where(mask, poh, np.inf).min(axis=-1, initial=np.inf).ravel(),
+            "safety_stock_qty": np.tile(self.safety_stock, n_scen),
+            "on_hand_qty": np.tile(self.on_hand, n_scen),
+            "available_qty": np.tile(opening, n_scen),
+            "total_holding_cost": holding.sum(axis=-1).ravel(),
+        })
+        if network is not None:
+            lane_cost = network.bind(self)[2]
+            summary["total_dependent_demand"] = dependent.sum(axis=-1).ravel()
+            summary["total_dependent_unmet"] = dependent_unmet.sum(axis=-1).ravel()
+            summary["total_transfer_in"] = transfer_in.sum(axis=-1).ravel()
+            summary["total_transfer_cost"] = (transfer_in.sum(axis=-1) * lane_cost[None, :]).ravel()
+        summary["fill_rate"] = np.where(
+            summary["total_demand"] > 0,
+            summary["total_served"] / summary["total_demand"],
+            1.0
+        )
+        if tier_served is not None:
+            for tier, t_served, t_unmet in zip(self.tiers, tier_served, tier_unmet):
+                t_demand = (t_served + t_unmet).sum(axis=-1).ravel()
+                summary[f"total_demand_{tier}"] = t_demand
+                summary[f"total_served_{tier}"] = t_served.sum(axis=-1).ravel()
+                summary[f"total_unmet_{tier}"] = t_unmet.sum(axis=-1).ravel()
+                summary[f"fill_rate_{tier}"] = np.divide(summary[f"total_served_{tier}"].to_numpy(), t_demand, out=np.ones(len(t_demand)), where=t_demand > 0)
+        summary["stockout_flag"] = (summary["min_nai"] < 0).astype(int)
+        summary["first_stockout_week"] = _first_week(stockout)
+        # Breaches are evaluated week by week, against time-phased targets when given
+        summary["safety_breach_flag"] = ss_breach.any(axis=-1).ravel().astype(int)
+        summary["first_safety_breach_week"] = _first_week(ss_breach)
+        summary["min_weeks_of_cover"] = (cover if full else np.where(mask, cover, np.inf)).min(axis=-1, initial=np.inf).ravel()
+        summary["excess_qty"] = (excess if full else np.where(mask, excess, 0.0)).max(axis=-1, initial=0.0).ravel()
+        summary["excess_flag"] = (summary["excess_qty"] > 0).astype(int)
+        summary["service_breach_flag"] = service_breach.any(axis=-1).ravel().astype(int)
+        summary["first_service_breach_week"] = _first_week(service_breach)
+        # A zero-week horizon has no grid rows, hence no summary rows
+        summary = summary[np.repeat(horizon > 0, n_keys)].reset_index(drop=True)
+        prof.lap("4_summary", rows_in=nai.size, rows_out=len(summary))
+
+        if not include_detail:
+            return summary, pd.DataFrame()
+
+        # Stacked detail in (scenario, key, week) order
+        flat = mask.ravel()
+        scen_idx, key_idx, week_idx = [a.ravel()[flat] for a in np.indices(nai.shape)]
+
+        detail = pd.DataFrame({
+            "scenario_id": scen["scenario_id"].to_numpy()[scen_idx],
+            "sku": self._categorical(self.sku_code[key_idx], self.skus),
+            "location": self._categorical(self.loc_code[key_idx], self.locations),
+            "week_start": _week_categorical(calendar, week_idx),
+            "forecast_qty": d_t.ravel()[flat],
+            "supply_qty": s_t.ravel()[flat],
+            "released_qty": np.broadcast_to(r_t, nai.shape).ravel()[flat],
+            # Target in force that week; per-key constants live in key_table()
+            "safety_stock_qty": np.broadcast_to(ss, nai.shape).ravel()[flat],
+            "NAI": nai.ravel()[flat],
+            "POH": poh.ravel()[flat],
+            "served_qty": served.ravel()[flat],
+            "unmet_qty": unmet.ravel()[flat],
+            "ss_breach": ss_breach.ravel()[flat],
+            "stockout": stockout.ravel()[flat],
+            "holding_cost": holding.ravel()[flat],
+            "weeks_of_cover": cover.ravel()[flat],
+            "excess_qty": excess.ravel()[flat],
+            "service_breach": service_breach.ravel()[flat],
+        })
+        if network is not None:
+            detail["dependent_demand_qty"] = dependent.ravel()[flat]
+            detail["dependent_unmet_qty"] = dependent_unmet.ravel()[flat]
+            detail["transfer_in_qty"] = transfer_in.ravel()[flat]
+        if tier_served is not None:
+            for tier, t_served, t_unmet in zip(self.tiers, tier_served, tier_unmet):
+                detail[f"served_qty_{tier}"] = t_served.ravel()[flat]
+                detail[f"unmet_qty_{tier}"] = t_unmet.ravel()[flat]
+        prof.lap("5_detail", rows_in=nai.size, rows_out=len(detail))
+        return summary, detail
+
+    def _project_reference(
+        self,
+        on_hand: np.ndarray,
+        horizon: np.ndarray,
+        d_t: np.ndarray,
+        s_t: np.ndarray
+    ) -> Tuple[np.ndarray, ...]:
+        """Runs _project_loop scenario by scenario and scatters it back onto the tensor."""
+        out = [np.zeros(d_t.shape) for _ in range(4)]
+        for i, h in enumerate(horizon):
+            if h == 0 or self.n_keys == 0:
+                continue
+            # Int codes sort like the strings they encode
+            detail = pd.DataFrame({
+                "sku": np.repeat(self.sku_code, h),
+                "location": np.repeat(self.loc_code, h),
+                "forecast_qty": d_t[i, :, :h].ravel(),
+                "supply_qty": s_t[i, :, :h].ravel(),
+                "on_hand_qty": np.repeat(on_hand, h),
+            })
+            for arr, values in zip(out, _project_loop(detail)):
+                arr[i, :, :h] = np.asarray(values, dtype=float).reshape(self.n_keys, h)
+        return tuple(out)
+
+
+# ----------------------------------------------------
+# Incremental Recompute
+# ----------------------------------------------------
+def diff_plans(old: PreparedPlan, new: PreparedPlan) -> pd.DataFrame:
+    """
+    Per-key differences between two versions of a plan.
+
+    Returns:
+        DataFrame (sku, location, change, fields) with change in
+        added/removed/modified and fields listing the inputs that differ.
+        Unchanged keys are omitted.
+    """
+    old_in_new = new.key_codes(old.keys["sku"], old.keys["location"])
+    new_in_old = old.key_codes(new.keys["sku"], new.keys["location"])
+
+    old_fp, new_fp = old.fingerprints(), new.fingerprints()
+    both = new_in_old >= 0
+    changed = {name: np.zeros(new.n_keys, dtype=bool) for name in new_fp}
+    for name in new_fp:
+        changed[name][both] = new_fp[name][both] != old_fp[name][new_in_old[both]]
+
+    fields = pd.DataFrame(changed)
+    modified = both & fields.any(axis=1).to_numpy()
+    field_names = fields[modified].apply(lambda r: ",".join(r.index[r]), axis=1) if modified.any() else pd.Series(dtype=object)
+
+    parts = [
+        pd.DataFrame({"sku": new.keys["sku"][~both].astype(object), "location": new.keys["location"][~both].astype(object), "change": "added", "fields": "all"}),
+        pd.DataFrame({"sku": old.keys["sku"][old_in_new < 0].astype(object), "location": old.keys["location"][old_in_new < 0].astype(object), "change": "removed", "fields": "all"}),
+        pd.DataFrame({"sku": new.keys["sku"][modified].astype(object), "location": new.keys["location"][modified].astype(object), "change": "modified", "fields": field_names.to_numpy()}),
+    ]
+    return pd.concat(parts, ignore_index=True).sort_values(["sku", "location"]).reset_index(drop=True)
+
+
+def update_kpis_batch(
+    old: PreparedPlan,
+    old_result: Tuple[pd.DataFrame, pd.DataFrame],
+    new: PreparedPlan,
+    scenarios: pd.DataFrame,
+    include_detail: bool = True,
+    network=None,
+    by_priority: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Recomputes only the keys whose inputs changed and splices them into a
+    previous project_batch result.
+
+    Projections are independent per (sku, location), so unchanged keys keep
+    their cached rows. If the grid anchor moved (a new earliest week), every
+    key shifts and this falls back to a full run; so does a change of
+    release lead times or of the tier list, which apply to every key.
+
+    Args:
+        old: Plan that produced old_result
+        old_result: (summary, detail) from old.project_batch(scenarios)
+        new: Plan built from the revised upload
+        scenarios: The same scenarios old_result was computed with
+        network: The network old_result was computed with, if any. Lanes
+            couple a SKU's locations, so every location of a changed SKU
+            is recomputed.
+        by_priority: Whether old_result was computed with tier allocation
+
+    Returns:
+        (summary, detail, changes), identical to new.project_batch(scenarios)
+        plus the diff_plans table.
+    """
+    changes = diff_plans(old, new)
+    if (old.anchor_day, old.release_weeks, old.tiers, old.targets) != (new.anchor_day, new.release_weeks, new.tiers, new.targets):
+        return (*new.project_batch(scenarios, include_detail=include_detail, network=network, by_priority=by_priority), changes)
+
+    touched = changes[changes["change"] != "removed"]
+    dirty = np.zeros(new.n_keys, dtype=bool)
+    dirty[new.key_codes(touched["sku"], touched["location"])] = True
+    if network is not None:
+        changed_skus = new.skus.get_indexer(changes["sku"])
+        dirty |= np.isin(new.sku_code, changed_skus[changed_skus >= 0])
+    dirty_codes = np.flatnonzero(dirty)
+
+    fresh = new.subset(dirty_codes).project_batch(scenarios, include_detail=include_detail, network=network, by_priority=by_priority)
+    scen_ids = pd.Index(scenarios["scenario_id"] if "scenario_id" in scenarios.columns else np.arange(len(scenarios)))
+    same_keys = np.array_equal(old._key_ids, new._key_ids) and old.skus.equals(new.skus) and old.locations.equals(new.locations)
+
+    def _splice(prev: pd.DataFrame, part: pd.DataFrame) -> pd.DataFrame:
+        if prev.empty and part.empty:
+            return part
+        if same_keys and len(prev.columns):
+            # Same key layout: overwrite the dirty rows in place. Both frames
+            # are in (scenario, key, week) order, so rows line up one to one.
+            # Rows per key in each scenario, as prev actually has them (a
+            # 0-week horizon has no detail rows and no summary rows)
+            per_key = np.bincount(scen_ids.get_indexer(prev["scenario_id"]), minlength=len(scen_ids)) // max(new.n_keys, 1)
+            rows = np.concatenate([np.repeat(dirty, h) for h in per_key if h > 0] or [np.zeros(0, dtype=bool)])
+            merged = prev.copy(deep=False)
+            for col in prev.columns.difference(["scenario_id", "sku", "location", "week_start"] + SCENARIO_COLS):
+                values = prev[col].to_numpy(copy=True)
+                values[rows] = part[col].to_numpy()
+                merged[col] = values
+            return merged
+
+        # Old rows survive unless their key was removed or recomputed
+        prev_codes = new.key_codes(prev["sku"], prev["location"])
+        keep = (prev_codes >= 0) & ~dirty[np.maximum(prev_codes, 0)]
+        prev = prev[keep]
+
+        codes = np.concatenate([prev_codes[keep], new.key_codes(part["sku"], part["location"])])
+        merged = pd.concat([prev, part[prev.columns]], ignore_index=True)
+        # Re-code on the new dimension tables so categoricals line up
+        merged["sku"] = new._categorical(new.sku_code[codes], new.skus)
+        merged["location"] = new._categorical(new.loc_code[codes], new.locations)
+        if "week_start" in merged.columns and len(prev) and len(part):
+            merged["week_start"] = pd.Categorical(merged["week_start"].astype(object), categories=prev["week_start"].cat.categories, ordered=True)
+
+        # Stable sort keeps week order inside each key
+        order = np.lexsort((codes, scen_ids.get_indexer(merged["scenario_id"])))
+        return merged.iloc[order].reset_index(drop=True)
+
+    summary = _splice(old_result[0], fresh[0])
+    detail = _splice(old_result[1], fresh[1]) if include_detail else pd.DataFrame()
+    return summary, detail, changes
+
+
+def update_kpis(
+    old: PreparedPlan,
+    old_result: Tuple[pd.DataFrame, pd.DataFrame],
+    new: PreparedPlan,
+    horizon_weeks: int = 8,
+    demand_uplift_pct: float = 0.0,
+    supply_delay_weeks: int = 0
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Single-scenario update_kpis_batch: old_result comes from old.project()
+    and the output matches new.project() for the same levers.
+    """
+    scenario = pd.DataFrame({
+        "scenario_id": [0],
+        "demand_uplift_pct": [demand_uplift_pct],
+        "supply_delay_weeks": [supply_delay_weeks],
+        "horizon_weeks": [horizon_weeks],
+    })
+    tagged = tuple(df.assign(scenario_id=0) for df in old_result)
+    summary, detail, changes = update_kpis_batch(old, tagged, new, scenario)
+    return summary.drop(columns=["scenario_id"]), detail.drop(columns=["scenario_id"]), changes
+
+
+# ----------------------------------------------------
+# Output Index
+# ----------------------------------------------------
+class KeyIndex:
+    """
+    Row ranges of each (scenario, sku, location) block in a summary or
+    detail frame from project()/project_batch().
+
+    The engine emits rows in (scenario, key, week) order, so each block is
+    one contiguous slice. Built once per result with a single vectorized
+    pass; lookups are then a binary search over keys instead of a scan
+    over rows.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.skus = frame["sku"].cat.categories
+        self.locations = frame["location"].cat.categories
+        n_locs = max(len(self.locations), 1)
+        key = frame["sku"].cat.codes.to_numpy(np.int64) * n_locs + frame["location"].cat.codes.to_numpy(np.int64)
+        scen = frame["scenario_id"].to_numpy() if "scenario_id" in frame.columns else np.zeros(len(frame), dtype=np.int64)
+
+        starts = np.flatnonzero(np.r_[True, (key[1:] != key[:-1]) | (scen[1:] != scen[:-1])]) if len(frame) else np.zeros(0, dtype=np.int64)
+        self._start = starts
+        self._stop = np.r_[starts[1:], len(frame)].astype(np.int64)
+        self._key = key[starts]
+
+        # Scenario id -> [first block, last block + 1)
+        block_scen = scen[starts]
+        edges = np.flatnonzero(np.r_[True, block_scen[1:] != block_scen[:-1], True]) if len(starts) else np.zeros(1, dtype=np.int64)
+        self._scenarios = {block_scen[lo]: (int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:])}
+        self._sku_lists = {}
+        self._views = {}
+
+    def _blocks(self, scenario_id=None) -> Tuple[int, int]:
+        if scenario_id is None:
+            return next(iter(self._scenarios.values()), (0, 0))
+        return self._scenarios.get(scenario_id, (0, 0))
+
+    def rows(self, sku, location, scenario_id=None) -> slice:
+        """
+        Row slice for one key (empty if absent). scenario_id defaults to the
+        first scenario, which is the only one after select/for_scenario.
+        """
+        lo, hi = self._blocks(scenario_id)
+        s, l = self.skus.get_indexer([sku])[0], self.locations.get_indexer([location])[0]
+        if s < 0 or l < 0:
+            return slice(0, 0)
+        target = s * max(len(self.locations), 1) + l
+        pos = lo + int(np.searchsorted(self._key[lo:hi], target))
+        if pos >= hi or self._key[pos] != target:
+            return slice(0, 0)
+        return slice(int(self._start[pos]), int(self._stop[pos]))
+
+    def scenario_rows(self, scenario_id) -> slice:
+        lo, hi = self._blocks(scenario_id)
+        if lo == hi:
+            return slice(0, 0)
+        return slice(int(self._start[lo]), int(self._stop[hi - 1]))
+
+    def for_scenario(self, scenario_id) -> "KeyIndex":
+        """Index over frame.iloc[scenario_rows(scenario_id)], without rescanning rows."""
+        if scenario_id in self._views:
+            return self._views[scenario_id]
+        lo, hi = self._blocks(scenario_id)
+        sub = object.__new__(KeyIndex)
+        sub.skus, sub.locations = self.skus, self.locations
+        offset = self._start[lo] if lo < hi else 0
+        sub._start = self._start[lo:hi] - offset
+        sub._stop = self._stop[lo:hi] - offset
+        sub._key = self._key[lo:hi]
+        sub._scenarios = {scenario_id: (0, hi - lo)} if lo < hi else {}
+        sub._sku_lists, sub._views = {}, {}
+        self._views[scenario_id] = sub
+        return sub
+
+    def sku_list(self, scenario_id=None) -> list:
+        """SKUs with rows, in dimension (sorted) order (memoized per scenario)."""
+        if scenario_id not in self._sku_lists:
+            lo, hi = self._blocks(scenario_id)
+            codes = self._key[lo:hi] // max(len(self.locations), 1)
+            # Keys are sorted, so each SKU's blocks are adjacent
+            first = np.r_[True, codes[1:] != codes[:-1]] if len(codes) else np.zeros(0, dtype=bool)
+            self._sku_lists[scenario_id] = self.skus.take(codes[first]).tolist()
+        return self._sku_lists[scenario_id]
+
+    def locations_for(self, sku, scenario_id=None) -> list:
+        """Locations stocking sku. Keys sort by (sku, location), so they are adjacent."""
+        lo, hi = self._blocks(scenario_id)
+        s = self.skus.get_indexer([sku])[0]
+        if s < 0:
+            return []
+        n_locs = max(len(self.locations), 1)
+        a, b = lo + np.searchsorted(self._key[lo:hi], [s * n_locs, (s + 1) * n_locs])
+        return list(self.locations[self._key[a:b] % n_locs])
+
+
+# ----------------------------------------------------
+# Projection Kernels
+# ----------------------------------------------------
+def project_matrix(
+    on_hand: np.ndarray,
+    demand: np.ndarray,
+    supply: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized NAI/POH recursion over a dense (keys x weeks) grid.
+
+    The week axis is always the last one, so extra leading axes (e.g.
+    scenarios) are projected in the same call.
+
+    Args:
+        on_hand: Opening stock per key, shape (..., )
+        demand: Weekly demand, shape (..., weeks)
+        supply: Weekly supply, shape (..., weeks)
+
+    Returns:
+        (nai, poh, served, unmet), each shaped like demand
+    """
+    on_hand = np.asarray(on_hand, dtype=float)
+    demand = np.asarray(demand, dtype=float)
+    supply = np.asarray(supply, dtype=float)
+    n_weeks = demand.shape[-1]
+
+    # Interleave [OH, S_1, -D_1, S_2, -D_2, ...] so a single running sum
+    # reproduces the loop's left-to-right additions exactly:
+    #   odd positions  -> NAI_{t-1} + S_t  (stock available to serve)
+    #   even positions -> NAI_t            (OH + CumS - CumD)
+    steps = np.empty(demand.shape[:-1] + (2 * n_weeks + 1,), dtype=float)
+    steps[..., 0] = on_hand
+    steps[..., 1::2] = supply
+    steps[..., 2::2] = -demand
+    running = np.cumsum(steps, axis=-1)
+
+    # Backlog semantics: avail = max(0, nai_prev + s_t)
+    avail = np.maximum(0, running[..., 1::2])
+    nai = running[..., 2::2]
+    served = np.minimum(demand, avail)
+    unmet = demand - served
+    poh = np.maximum(0, nai)
+    return nai, poh, served, unmet
+
+
+def _project_loop(detail: pd.DataFrame) -> Tuple[list, ...]:
+    """
+    Reference implementation: per-row recursion over each SKU-Location.
+    Kept for equivalence testing against the vectorized kernel.
+    """
     nai_list = []
     poh_list = []
     served_list = []
     unmet_list = []
-    
-    # Iterate by group is usually fast enough for MVP scale
+
     for _, g in detail.groupby(["sku", "location"]):
         # Initial state
         oh = g["on_hand_qty"].iloc[0]
         nai_prev = oh
-        
+
         for idx, row in g.iterrows():
             d_t = row["forecast_qty"]
             s_t = row["supply_qty"]
-            
+
             # Available to serve this week = what we had left + what just arrived
             avail = max(0, nai_prev + s_t)
-            
+
             served = min(d_t, avail)
             unmet = d_t - served
-            
+
             # Net Available Inventory (Carry over) -> Math: OH + CumS - CumD
             # Iterative equivalent: NAI_t = NAI_{t-1} + S_t - D_t
             # Note: NAI can be negative (backlog hole)
             nai = nai_prev + s_t - d_t
-            
+
             # Projected On Hand (Physical stock) -> cannot be negative
             poh = max(0, nai)
-            
+
             nai_list.append(nai)
             poh_list.append(poh)
             served_list.append(served)
             unmet_list.append(unmet)
-            
+
             nai_prev = nai
 
-    detail["NAI"] = nai_list
-    detail["POH"] = poh_list
-    detail["served_qty"] = served_list
-    detail["unmet_qty"] = unmet_list
-    
-    # ----------------------------------------------------
-    # 4. Summary Stats
-    # ----------------------------------------------------
-    # Safety stock breach column for calculation
-    detail["ss_breach"] = (detail["POH"] < detail["safety_stock_qty"])
-    detail["stockout"] = (detail["NAI"] < 0)
-
-    summary = detail.groupby(["sku", "location"], as_index=False).agg(
-        total_demand=("forecast_qty", "sum"),
-        total_served=("served_qty", "sum"),
-        total_unmet=("unmet_qty", "sum"),
-        min_nai=("NAI", "min"),
-        min_poh=("POH", "min"),
-        safety_stock_qty=("safety_stock_qty", "max"),
-        on_hand_qty=("on_hand_qty", "max")
-    )
-    
-    summary["fill_rate"] = np.where(
-        summary["total_demand"] > 0, 
-        summary["total_served"] / summary["total_demand"], 
-        1.0
+    return nai_list, poh_list, served_list, unmet_list
+
+
+def _targets(targets: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """DEFAULT_TARGETS with known overrides applied, as floats."""
+    return {**DEFAULT_TARGETS, **{k: float(v) for k, v in (targets or {}).items() if k in DEFAULT_TARGETS}}
+
+
+def _release_weeks(release_weeks: Optional[Dict[str, Optional[int]]]) -> Dict[str, Optional[int]]:
+    """DEFAULT_RELEASE_WEEKS overridden by release_weeks; leads are ints >= 0 or None."""
+    merged = {**DEFAULT_RELEASE_WEEKS, **{k: v for k, v in (release_weeks or {}).items() if k in HOLD_COLS}}
+    return {k: None if v is None or pd.isna(v) else max(0, int(v)) for k, v in merged.items()}
+
+
+def _dim_codes(dim: pd.Index, values: pd.Series) -> np.ndarray:
+    """Position of each value in a dimension table (-1 if absent)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Translate the (few) categories, then gather by code
+        lookup = np.append(dim.get_indexer(values.cat.categories), -1)
+        return lookup[values.cat.codes.to_numpy()]
+    return dim.get_indexer(values)
+
+
+# ----------------------------------------------------
+# Date Helpers
+# ----------------------------------------------------
+def _week_categorical(calendar: np.ndarray, week_idx: np.ndarray) -> pd.Categorical:
+    """Ordered categorical of datetime.date week starts from positions in a week_calendar."""
+    return pd.Categorical.from_codes(week_idx, categories=pd.Index(days_to_dates(calendar), dtype=object), ordered=True)
+
+
+def _phased(flows: Tuple[np.ndarray, np.ndarray, np.ndarray], default: np.ndarray, weeks: np.ndarray) -> np.ndarray:
+    """
+    Step-function lookup of time-phased per-key values.
+
+    Args:
+        flows: (code, week, value) change points, sorted by (code, week)
+        default: Per-key value before a key's first change point
+        weeks: (scenarios x weeks) absolute week numbers
+
+    Returns:
+        (1 x keys x 1) defaults when there are no change points, else a
+        (scenarios x keys x weeks) array of the latest value at or before
+        each week.
+    """
+    codes, f_weeks, values = flows
+    if not len(codes) or not weeks.size:
+        return default[None, :, None]
+
+    w0 = min(int(f_weeks.min()), int(weeks.min()))
+    span = max(int(f_weeks.max()), int(weeks.max())) - w0 + 1
+    keys = np.arange(len(default), dtype=np.int64)[None, :, None]
+    # (code, week) pairs as one sortable int, so a single searchsorted finds each latest entry
+    ids = codes.astype(np.int64) * span + (f_weeks - w0)
+    pos = np.searchsorted(ids, keys * span + (weeks[:, None, :] - w0), side="right") - 1
+    safe = np.maximum(pos, 0)
+    hit = (pos >= 0) & (codes[safe] == keys)
+    return np.where(hit, values[safe], default[None, :, None])
+
+
+def _cover(stock: np.ndarray, demand: np.ndarray, avg: np.ndarray, excess_weeks: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Forward weeks of cover and excess stock, on the last (week) axis.
+
+    Each week's closing stock is laid against the cumulative demand of the
+    weeks after it: a single searchsorted over the running demand total
+    finds, for every key-week, the week the stock runs out in, and the
+    remainder is a fraction of that week. Demand past the grid continues
+    at avg per week.
+
+    Args:
+        stock: Closing stock per week (negatives count as 0)
+        demand: Weekly demand, same shape
+        avg: Weekly demand past the grid, broadcastable to stock[..., :1]
+        excess_weeks: Cover kept before stock counts as excess
+
+    Returns:
+        (weeks_of_cover, excess_qty) shaped like stock; cover is 0 without
+        stock and inf where stock outlasts zero average demand
+    """
+    shape, n_weeks = stock.shape, stock.shape[-1]
+    if not stock.size:
+        return np.zeros(shape), np.zeros(shape)
+    d = demand.reshape(-1, n_weeks)
+    s = np.maximum(stock, 0).reshape(-1, n_weeks)
+    a = np.broadcast_to(avg, shape[:-1] + (1,)).reshape(-1, 1)
+    weeks = np.arange(n_weeks)
+    row_start = np.arange(0, d.size, n_weeks)[:, None]
+
+    # Demand is non-negative, so the running total over all rows is one sorted
+    # array; searching it for each key-week's running total plus its stock
+    # finds the run-out week of every row at once
+    flat = np.cumsum(d.ravel())
+    cum = flat.reshape(d.shape)
+    # Demand still to come after each week
+    rest = cum[:, -1:] - cum
+    inside = s <= rest
+    target = np.minimum(s, rest)
+    target += cum
+    pos = flat.searchsorted(target.ravel()).reshape(d.shape)
+    np.maximum(pos, row_start + weeks + 1, out=pos)
+    # Week the stock runs out in, else it outlasts the grid and runs on avg
+    inside &= pos < row_start + n_weeks
+    last = np.minimum(pos, row_start + n_weeks - 1)
+    # Stock left for that week (past the grid: beyond all remaining demand) and its rate
+    target -= np.take(flat, last - 1)
+    outside = ~inside
+    # Shared with excess below
+    beyond = s - rest
+    np.copyto(target, beyond, where=outside)
+    rate = np.take(d, last)
+    np.copyto(rate, a, where=outside)
+    del last, flat, inside
+    pos -= row_start
+    np.copyto(pos, n_weeks, where=outside)
+    pos -= weeks + 1
+    del outside
+    # Tiny average demand overflows to inf cover, which is the answer
+    with np.errstate(over="ignore"):
+        cover = np.divide(target, rate, out=np.where(target > 0, np.inf, 0.0), where=rate > 0)
+    del target, rate
+    cover += pos
+    del pos
+    # No stock covers nothing, even ahead of weeks without demand
+    np.copyto(cover, 0.0, where=s <= 0)
+
+    # Excess: stock above the next excess_weeks of demand, interpolated for a
+    # fractional threshold. A window ending inside the grid needs the demand
+    # still to come less what comes after it; a longer one runs on at avg.
+    whole, frac = int(np.floor(excess_weeks)), excess_weeks - np.floor(excess_weeks)
+    inner = max(n_weeks - whole, 0)
+    excess = beyond
+    excess[:, :inner] += rest[:, whole:]
+    excess[:, inner:] -= (np.arange(inner, n_weeks) + whole - (n_weeks - 1)) * a
+    if frac:
+        excess[:, :max(inner - 1, 0)] -= frac * d[:, whole + 1:]
+        excess[:, max(inner - 1, 0):] -= frac * a
+    np.maximum(excess, 0.0, out=excess)
+    return cover.reshape(shape), excess.reshape(shape)
+
+
+def _aggregate_flows(codes: np.ndarray, weeks: np.ndarray, qty: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """One (code, week, qty) entry per key-week, sorted by code, then week."""
+    if not len(codes):
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=float)
+    # Aggregate on a combined int id
+    codes, weeks = np.asarray(codes, dtype=np.int64), np.asarray(weeks, dtype=np.int64)
+    w0 = weeks.min()
+    n_w = int(weeks.max() - w0) + 1
+    ids, inverse = np.unique(codes * n_w + (weeks - w0), return_inverse=True)
+    return (
+        (ids // n_w).astype(np.int32),
+        (ids % n_w + w0).astype(np.int32),
+        np.bincount(inverse, weights=qty, minlength=len(ids)),
     )
-    
-    summary["stockout_flag"] = (summary["min_nai"] < 0).astype(int)
-    
-    # First Stockout Week
-    stockouts = detail[detail["stockout"]].groupby(["sku", "location"], as_index=False)["week_start"].min()
-    stockouts.rename(columns={"week_start": "first_stockout_week"}, inplace=True)
-    summary = summary.merge(stockouts, on=["sku", "location"], how="left")
-    
-    # Safety Breach Logic
-    # We check if min(POH) < safety_stock. 
-    # (Checking against max safety_stock is a simplification if SS varies by time, but demanded by MVP spec)
-    summary["safety_breach_flag"] = (summary["min_poh"] < summary["safety_stock_qty"]).astype(int)
-    
-    breaches = detail[detail["ss_breach"]].groupby(["sku", "location"], as_index=False)["week_start"].min()
-    breaches.rename(columns={"week_start": "first_safety_breach_week"}, inplace=True)
-    summary = summary.merge(breaches, on=["sku", "location"], how="left")
-
-    return summary, detail
+
+
+def _dense(flows: Tuple[np.ndarray, np.ndarray, np.ndarray], n_keys: int, first_week: int, n_weeks: int) -> np.ndarray:
+    """Scatters (code, week, qty) flows onto a (keys x weeks) grid starting at first_week."""
+    codes, weeks, qty = flows
+    week = weeks - first_week
+    ok = (week >= 0) & (week < n_weeks)
+    flat = codes[ok] * n_weeks + week[ok]
+    return np.bincount(flat, weights=qty[ok], minlength=n_keys * n_weeks).reshape(n_keys, n_weeks)
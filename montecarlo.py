@@ -0,0 +1,188 @@
+"""
+Monte Carlo demand/supply uncertainty on top of the projection kernel.
+
+Each sample perturbs one scenario's inputs per key:
+
+    demand    x lognormal noise (mean 1, demand_cv) per key-week
+    supply    the key's receipts slip by 1..max_supply_delay_weeks with
+              probability supply_delay_prob, and each receipt is cut by
+              supply_shortfall_pct with probability supply_shortfall_prob
+
+and is projected as a (weeks x keys x samples) batch. _sample_batch applies
+the project_matrix recursion in closed form (NAI is a running OH + S - D and
+unmet is clip(-NAI, 0, D)), so the batch is never interleaved or copied. Draws are made in fixed blocks of keys x samples, each with its own
+RNG stream seeded from (seed, first key, first sample), and only per-key
+totals are kept for a chunk of keys sized to chunk_mb, so memory stays flat
+however many samples are drawn and results do not depend on the chunk size.
+Network and priority modes are not sampled.
+
+    per_key, portfolio = simulate(plan, n_samples=1000, horizon_weeks=12, seed=7)
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, List, Optional
+
+import profiling
+from kpi_engine import PreparedPlan
+
+DEFAULT_UNCERTAINTY = {
+    "demand_cv": 0.2,               # std / mean of weekly demand
+    "supply_delay_prob": 0.1,       # chance a key's receipts slip ...
+    "max_supply_delay_weeks": 2,    # ... by 1..this many weeks
+    "supply_shortfall_prob": 0.1,   # chance a receipt arrives short ...
+    "supply_shortfall_pct": 0.3,    # ... by this share
+}
+
+DEFAULT_QUANTILES = [0.1, 0.5, 0.9]
+DEFAULT_CHUNK_MB = 256
+
+# Keys and samples per draw block; each block has its own RNG stream
+_BLOCK = 256
+
+# Bytes alive per (week, key, sample) cell of a draw block
+_CELL_BYTES = 8 * 14
+
+def simulate(
+    plan: PreparedPlan,
+    n_samples: int = 1000,
+    horizon_weeks: int = 8,
+    demand_uplift_pct: float = 0.0,
+    supply_delay_weeks: int = 0,
+    uncertainty: Optional[Dict[str, float]] = None,
+    unit_revenue: Optional[np.ndarray] = None,
+    quantiles: List[float] = DEFAULT_QUANTILES,
+    seed: int = 0,
+    chunk_mb: float = DEFAULT_CHUNK_MB
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Samples one scenario n_samples times.
+
+    Args:
+        plan: Prepared inputs; holds and releases apply as in project()
+        n_samples: Draws per key
+        horizon_weeks, demand_uplift_pct, supply_delay_weeks: The scenario
+            the noise is applied around (same levers as compute_kpis)
+        uncertainty: Overrides for DEFAULT_UNCERTAINTY
+        unit_revenue: Per-key revenue aligned with plan.keys (default 1.0)
+        quantiles: Quantiles to report, e.g. [0.1, 0.5, 0.9] -> p10/p50/p90
+        seed: Equal seeds with equal arguments give equal results
+        chunk_mb: Working-memory budget; one draw block is always held
+
+    Returns:
+        (per_key, portfolio): per_key has sku, location, stockout_prob,
+        unmet_mean, unmet_p<q>, revenue_at_risk_mean and revenue_at_risk_p<q>
+        per key. portfolio has one row per statistic (mean, p<q>) of the
+        network-wide totals per sample: total_unmet, revenue_at_risk and
+        stockout_keys.
+    """
+    u = {**DEFAULT_UNCERTAINTY, **{k: v for k, v in (uncertainty or {}).items() if k in DEFAULT_UNCERTAINTY}}
+    n_samples, horizon = max(1, int(n_samples)), max(0, int(horizon_weeks))
+    lead = max(0, int(u["max_supply_delay_weeks"]))
+    revenue = np.ones(plan.n_keys) if unit_revenue is None else np.asarray(unit_revenue, dtype=float)
+
+    prof = profiling.timer("montecarlo")
+    _, demand, supply = plan.scenario_window(horizon, demand_uplift_pct, supply_delay_weeks, lead)
+    opening, released, _ = plan.releases(horizon)
+    prof.lap("1_window", rows_in=plan.n_keys, rows_out=demand.size)
+
+    # Draws come in fixed (key, sample) blocks with their own streams, so results
+    # do not depend on chunk_mb; the budget sizes how many keys' totals (and their
+    # sorted copy for the quantiles) are held
+    budget = chunk_mb * 2**20 - _CELL_BYTES * _BLOCK * _BLOCK * max(horizon, 1)
+    key_chunk = max(1, int(budget // (17 * n_samples * _BLOCK))) * _BLOCK
+
+    sigma = np.sqrt(np.log1p(u["demand_cv"] ** 2))
+    stockout_prob = np.zeros(plan.n_keys)
+    stats = {"unmet_mean": np.zeros(plan.n_keys)}
+    stats.update({f"unmet_p{_pct(q)}": np.zeros(plan.n_keys) for q in quantiles})
+    portfolio = np.zeros((3, n_samples))
+
+    for k0 in range(0, plan.n_keys, key_chunk):
+        keys = slice(k0, min(k0 + key_chunk, plan.n_keys))
+        unmet_total = np.empty((keys.stop - k0, n_samples))
+        stockout = np.empty((keys.stop - k0, n_samples), dtype=bool)
+        for b0 in range(k0, keys.stop, _BLOCK):
+            block = slice(b0, min(b0 + _BLOCK, keys.stop))
+            rows = slice(b0 - k0, block.stop - k0)
+            for s0 in range(0, n_samples, _BLOCK):
+                n = min(_BLOCK, n_samples - s0)
+                rng = np.random.default_rng([seed, b0, s0])
+                stockout[rows, s0:s0 + n], unmet_total[rows, s0:s0 + n] = _sample_batch(
+                    rng, u, sigma, lead, n, opening[block], demand[block], supply[block], released[block]
+                )
+
+        stockout_prob[keys] = stockout.mean(axis=1)
+        stats["unmet_mean"][keys] = unmet_total.mean(axis=1)
+        if quantiles:
+            for q, values in zip(quantiles, np.quantile(unmet_total, quantiles, axis=1)):
+                stats[f"unmet_p{_pct(q)}"][keys] = values
+        portfolio[0] += unmet_total.sum(axis=0)
+        portfolio[1] += revenue[keys] @ unmet_total
+        portfolio[2] += stockout.sum(axis=0)
+    prof.lap("2_sample", rows_in=plan.n_keys * n_samples, rows_out=plan.n_keys)
+
+    per_key = plan.keys.assign(stockout_prob=stockout_prob, **stats)
+    # Revenue is a non-negative per-key scale, so its quantiles are the unmet quantiles scaled
+    for name in list(stats):
+        per_key[name.replace("unmet", "revenue_at_risk")] = per_key[name] * revenue
+
+    totals = pd.DataFrame(portfolio.T, columns=["total_unmet", "revenue_at_risk", "stockout_keys"])
+    summary = [totals.mean().rename("mean")] + [totals.quantile(q).rename(f"p{_pct(q)}") for q in quantiles]
+    return per_key, pd.DataFrame(summary).rename_axis("statistic").reset_index()
+
+
+def uncertainty_from_params(params: Dict[str, float]) -> Dict[str, float]:
+    """DEFAULT_UNCERTAINTY keys found in a read_params() dict."""
+    return {k: params[k] for k in DEFAULT_UNCERTAINTY if k in params}
+
+
+def _sample_batch(
+    rng: np.random.Generator,
+    u: Dict[str, float],
+    sigma: float,
+    lead: int,
+    n: int,
+    opening: np.ndarray,
+    demand: np.ndarray,
+    supply: np.ndarray,
+    released: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draws n samples for a block of keys and projects them.
+
+    Returns:
+        (stockout, unmet): any week with NAI < 0, and total unmet qty, each (keys x n)
+    """
+    n_keys, n_weeks = demand.shape
+    # Weeks lead the (weeks x keys x samples) grid, so per-week steps are contiguous slabs
+    d = np.repeat(demand.T[:, :, None], n, axis=2)
+    if sigma > 0:
+        noise = rng.standard_normal(d.shape, dtype=np.float32)
+        noise *= sigma
+        noise -= sigma ** 2 / 2
+        d *= np.exp(noise, out=noise)
+
+    window = supply.T[:, :, None]
+    s = np.repeat(window[lead:], n, axis=2)
+    delay = np.where(rng.random((n_keys, n)) < u["supply_delay_prob"], rng.integers(1, lead + 1, (n_keys, n)), 0) if lead else None
+    for shift in range(1, lead + 1):
+        np.copyto(s, window[lead - shift:lead - shift + n_weeks], where=(delay == shift)[None])
+    np.multiply(s, 1.0 - u["supply_shortfall_pct"], out=s, where=rng.random(s.shape, dtype=np.float32) < u["supply_shortfall_prob"])
+    s += released.T[:, :, None]
+
+    # project_matrix in closed form: NAI is the running OH + S - D, and
+    # unmet = D - min(D, max(0, NAI_prev + S)) = clip(-NAI, 0, D)
+    nai = s
+    nai -= d
+    nai[0] += opening[:, None]
+    for w in range(1, n_weeks):
+        nai[w] += nai[w - 1]
+    stockout = np.minimum.reduce(nai, axis=0) < 0 if n_weeks else np.zeros((n_keys, n), dtype=bool)
+    np.negative(nai, out=nai)
+    np.clip(nai, 0, d, out=nai)
+    return stockout, nai.sum(axis=0)
+
+
+def _pct(q: float) -> str:
+    """0.1 -> "10", 0.975 -> "97.5" """
+    return f"{q * 100:g}"
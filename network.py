@@ -0,0 +1,195 @@
+"""
+Multi-echelon projection over the Logistics_Lanes sheet.
+
+Locations are levelled by lane: a location with no inbound lane is level 0,
+and every other location sits one level below its supplier. Two passes then
+run level by level, each one kernel call over all SKUs of that level:
+
+    up    deepest level first: each key projects its own demand plus the
+          requests of its children; whatever it cannot cover becomes a
+          request on its own supplier, shipped transit weeks earlier.
+    down  level 0 first: each key projects with the transfers its supplier
+          could fill (its weekly fill rate x the request), arriving
+          transit weeks after they ship.
+
+PreparedPlan.project_batch(network=...) then projects every key once more
+with dependent demand and inbound transfers added, so outputs keep the
+single-location layout.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, List, Optional
+
+from kpi_engine import project_matrix
+
+LANE_COLS = ["from_location", "to_location", "transit_days"]
+
+class Network:
+    """
+    Location tree from Logistics_Lanes.
+
+    Each to_location is replenished through one lane: the cheapest
+    (cost_per_unit, then transit_days, then sheet order). Lanes only link
+    locations; a SKU moves along a lane when both ends stock it.
+
+    Attributes:
+        nodes: Sorted location labels; position is the node code
+        parent: Supplying node per node (-1 for level 0)
+        level: Depth per node
+        transit_weeks: Lane transit per node, rounded up to whole weeks
+        cost_per_unit: Lane cost per node (0 without a lane or cost)
+    """
+
+    def __init__(self, lanes: pd.DataFrame):
+        df = read_lanes(lanes)
+        primary = df.sort_values(["cost_per_unit", "transit_days"], kind="stable").drop_duplicates("to_location")
+        self.nodes = pd.Index(sorted(set(df["from_location"]) | set(df["to_location"])))
+        to_node = self.nodes.get_indexer(primary["to_location"])
+
+        self.parent = np.full(len(self.nodes), -1, dtype=np.int64)
+        self.parent[to_node] = self.nodes.get_indexer(primary["from_location"])
+        self.transit_weeks = np.zeros(len(self.nodes), dtype=np.int64)
+        self.transit_weeks[to_node] = primary["transit_weeks"].to_numpy()
+        self.cost_per_unit = np.zeros(len(self.nodes))
+        self.cost_per_unit[to_node] = primary["cost_per_unit"].to_numpy(float)
+        self.level = _levels(self.parent, self.nodes)
+
+    @property
+    def n_lanes(self) -> int:
+        return int((self.parent >= 0).sum())
+
+    def lane_table(self) -> pd.DataFrame:
+        """The lanes in use, one per supplied location, with its level."""
+        has = self.parent >= 0
+        return pd.DataFrame({
+            "from_location": self.nodes[self.parent[has]],
+            "to_location": self.nodes[has],
+            "transit_weeks": self.transit_weeks[has],
+            "cost_per_unit": self.cost_per_unit[has],
+            "level": self.level[has],
+        }).sort_values(["level", "to_location"]).reset_index(drop=True)
+
+    def bind(self, plan) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Per-key view of the network for one PreparedPlan.
+
+        Returns:
+            (parent_key, transit_weeks, cost_per_unit, level) aligned with
+            plan.keys; parent_key is -1 where the supplier does not stock the SKU.
+        """
+        node = self.nodes.get_indexer(plan.locations)[plan.loc_code] if plan.n_keys else np.zeros(0, dtype=np.int64)
+        known = node >= 0
+        parent_node = np.where(known, self.parent[np.maximum(node, 0)], -1)
+
+        parent_key = np.full(plan.n_keys, -1, dtype=np.int64)
+        linked = parent_node >= 0
+        if linked.any():
+            parent_key[linked] = plan.key_codes(
+                plan.keys["sku"][linked].reset_index(drop=True),
+                pd.Series(self.nodes[parent_node[linked]])
+            )
+        linked = parent_key >= 0
+        transit = np.where(linked, self.transit_weeks[np.maximum(node, 0)], 0)
+        cost = np.where(linked, self.cost_per_unit[np.maximum(node, 0)], 0.0)
+        level = np.where(known, self.level[np.maximum(node, 0)], 0)
+        return parent_key, transit, cost, level
+
+    def propagate(
+        self,
+        plan,
+        on_hand: np.ndarray,
+        demand: np.ndarray,
+        supply: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Runs the up and down passes on a (scenarios x keys x weeks) grid.
+
+        Args:
+            plan: PreparedPlan the grid was built from
+            on_hand: Opening available stock per key
+            demand, supply: Each key's own weekly demand and inflow
+
+        Returns:
+            (dependent, transfer_in): requests placed on each key by its
+            children, and transfers arriving from its supplier, both shaped
+            like demand.
+        """
+        parent, transit, _, level = self.bind(plan)
+        n_weeks = demand.shape[-1]
+        weeks = np.arange(n_weeks)
+        has = parent >= 0
+        by_level = [np.flatnonzero(level == lvl) for lvl in range(int(level.max()) + 1)] if len(level) else []
+
+        dependent = np.zeros(demand.shape)
+        requests = np.zeros(demand.shape)
+        # Up: children are one level deeper, so their requests are in before the parent projects
+        for idx in reversed(by_level):
+            _, _, _, unmet = project_matrix(on_hand[idx], demand[:, idx] + dependent[:, idx], supply[:, idx])
+            c = idx[has[idx]]
+            if not len(c):
+                continue
+            requests[:, c] = unmet[:, has[idx]]
+            ship = np.maximum(weeks[None, :] - transit[c][:, None], 0)
+            _scatter_add(dependent, parent[c], ship, requests[:, c])
+
+        transfer_in = np.zeros(demand.shape)
+        fill = np.ones(demand.shape)
+        # Down: a supplier's weekly fill rate is final before its children project
+        for idx in by_level:
+            c = idx[has[idx]]
+            if len(c):
+                ship = np.maximum(weeks[None, :] - transit[c][:, None], 0)
+                shipped = requests[:, c] * np.take_along_axis(fill[:, parent[c]], ship[None, :, :], axis=-1)
+                arrive = ship + transit[c][:, None]
+                # Arrivals after the last grid week fall outside the horizon
+                _scatter_add(transfer_in, c, np.minimum(arrive, n_weeks - 1), np.where(arrive < n_weeks, shipped, 0.0))
+
+            need = demand[:, idx] + dependent[:, idx]
+            _, _, served, _ = project_matrix(on_hand[idx], need, supply[:, idx] + transfer_in[:, idx])
+            fill[:, idx] = np.divide(served, need, out=np.ones(need.shape), where=need > 0)
+
+        return dependent, transfer_in
+
+
+def read_lanes(lanes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleaned Logistics_Lanes: stripped location labels, numeric transit_days
+    and cost_per_unit (blank = 0), transit_weeks rounded up, and no blank
+    or self lanes. Raises ValueError if a LANE_COLS column is missing.
+    """
+    missing = [c for c in LANE_COLS if c not in lanes.columns]
+    if missing:
+        raise ValueError(f"Sheet Logistics_Lanes missing columns: {missing}")
+
+    df = pd.DataFrame({
+        "from_location": lanes["from_location"].astype(object).where(lanes["from_location"].notna()),
+        "to_location": lanes["to_location"].astype(object).where(lanes["to_location"].notna()),
+        "transit_days": pd.to_numeric(lanes["transit_days"], errors='coerce').fillna(0).clip(lower=0),
+        "cost_per_unit": pd.to_numeric(lanes["cost_per_unit"], errors='coerce').fillna(0) if "cost_per_unit" in lanes.columns else 0.0,
+    }).dropna(subset=["from_location", "to_location"])
+    df["from_location"] = df["from_location"].astype(str).str.strip()
+    df["to_location"] = df["to_location"].astype(str).str.strip()
+    df["transit_weeks"] = np.ceil(df["transit_days"].to_numpy(float) / 7).astype(np.int64)
+    return df[df["from_location"] != df["to_location"]].reset_index(drop=True)
+
+
+def _levels(parent: np.ndarray, nodes: pd.Index) -> np.ndarray:
+    """Depth of every node below its root; raises ValueError on a cycle."""
+    level = np.zeros(len(parent), dtype=np.int64)
+    has = parent >= 0
+    # One step per level: depth settles after (longest chain + 1) rounds
+    for _ in range(len(parent) + 1):
+        nxt = np.where(has, level[np.maximum(parent, 0)] + 1, 0)
+        if np.array_equal(nxt, level):
+            return level
+        level = nxt
+    looped = nodes[level >= len(parent)][:5]
+    raise ValueError(f"Logistics_Lanes has a cycle through: {', '.join(map(str, looped))}")
+
+
+def _scatter_add(target: np.ndarray, keys: np.ndarray, weeks: np.ndarray, values: np.ndarray):
+    """target[s, keys[k], weeks[k, w]] += values[s, k, w] for every scenario s (repeats accumulate)."""
+    n_scen, n_keys, n_weeks = target.shape
+    scen = np.arange(n_scen)[:, None, None]
+    flat = (scen * n_keys + keys[None, :, None]) * n_weeks + weeks[None, :, :]
+    np.add.at(target.reshape(-1), flat.ravel(), values.ravel())
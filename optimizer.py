@@ -0,0 +1,180 @@
+"""
+Expedite / rebalance proposals that close projected stockouts.
+
+Works on the single-location projection (compute_kpis detail). A key is
+short in week t while its NAI is negative: cumulative supply has fallen
+behind cumulative demand, and the whole gap has to arrive by week t. Short
+keys are resolved earliest shortage first (most revenue at risk first
+within a week), walking their weeks in order, and each gap is filled from a
+min-heap of candidate moves by unit cost:
+
+    PULL_IN   a later Supply_Plan receipt of the same key, moved to week t;
+              expedite_cost_per_unit_week per unit and week moved, at most
+              max_pull_in_weeks (receipts past the horizon count too)
+    TRANSFER  stock of the same SKU at a location with a Logistics_Lanes
+              lane into this one, shipped transit weeks before t at the
+              lane's cost_per_unit; the donor keeps its safety stock in
+              every week from the shipment on
+
+A pulled receipt only raises stock until its original week, so a gap that
+persists past it pulls again; a transfer raises the receiver's stock and
+lowers the donor's for good. The moves are then applied as supply changes
+and the plan re-projected, so the returned KPIs are compute_kpis output.
+
+    actions, summary = propose(plan, horizon_weeks=8, lanes=dfs["Logistics_Lanes"])
+"""
+import heapq
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, List, Optional
+
+import network
+import profiling
+from kpi_engine import PreparedPlan, SCENARIO_COLS, scenario_grid
+from dates import week_calendar
+
+DEFAULT_PARAMS = {
+    "max_pull_in_weeks": 4,               # receipts move at most this many weeks earlier
+    "expedite_cost_per_unit_week": 0.05,  # cost of pulling one unit in by one week
+}
+
+ACTIONS = ["PULL_IN", "TRANSFER"]
+
+# from_week is the receipt's planned week (PULL_IN) or the ship week (TRANSFER);
+# lead_weeks is the weeks pulled in or the lane transit
+ACTION_COLS = ["sku", "location", "action", "from_location", "qty", "from_week", "to_week", "lead_weeks", "unit_cost", "cost"]
+
+# Gaps below this are float noise
+_EPS = 1e-9
+
+def propose(
+    plan: PreparedPlan,
+    horizon_weeks: int = 8,
+    demand_uplift_pct: float = 0.0,
+    supply_delay_weeks: int = 0,
+    lanes: Optional[pd.DataFrame] = None,
+    params: Optional[Dict[str, float]] = None,
+    unit_revenue: Optional[np.ndarray] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Proposes the cheapest pull-ins and transfers that remove unmet demand.
+
+    Args:
+        plan: Prepared inputs
+        horizon_weeks, demand_uplift_pct, supply_delay_weeks: Scenario levers
+            (same as compute_kpis)
+        lanes: Logistics_Lanes sheet; without it only pull-ins are proposed
+        params: Overrides for DEFAULT_PARAMS (e.g. read_params() output)
+        unit_revenue: Per-key revenue aligned with plan.keys, ranking keys
+            short in the same week (default 1.0)
+
+    Returns:
+        (actions, summary): actions has ACTION_COLS, one row per move in the
+        order they were chosen. summary is the compute_kpis summary with
+        every move applied; unmet left there could not be closed.
+    """
+    p = {**DEFAULT_PARAMS, **{k: v for k, v in (params or {}).items() if k in DEFAULT_PARAMS}}
+    horizon, reach = max(0, int(horizon_weeks)), max(0, int(p["max_pull_in_weeks"]))
+    delay = max(0, int(supply_delay_weeks))
+    revenue = np.ones(plan.n_keys) if unit_revenue is None else np.asarray(unit_revenue, dtype=float)
+
+    prof = profiling.timer("optimizer")
+    summary, detail = plan.project(horizon, demand_uplift_pct, delay)
+    if horizon == 0 or detail.empty:
+        return pd.DataFrame(columns=ACTION_COLS), summary
+    # Detail rows are key-major, one per horizon week
+    nai = detail["NAI"].to_numpy(float).reshape(plan.n_keys, horizon).copy()
+    ss = detail["safety_stock_qty"].to_numpy(float).reshape(plan.n_keys, horizon)
+    receipts = plan.scenario_window(horizon + reach, demand_uplift_pct, delay)[2]
+
+    short = nai < -_EPS
+    at_risk = np.flatnonzero(short.any(axis=1))
+    first = short.argmax(axis=1)
+    risk = revenue * summary["total_unmet"].to_numpy(float)
+    order = at_risk[np.lexsort((-risk[at_risk], first[at_risk]))]
+    donors = _donors(plan, at_risk, lanes)
+    prof.lap("1_shortfalls", rows_in=len(detail), rows_out=len(order))
+
+    moves = []
+    for k in order:
+        k_donors = donors.get(k, ())
+        row = nai[k]
+        # Receipts not pulled yet, as a list: indexing it is cheaper than the array
+        left = receipts[k].tolist()
+        for t in range(int(first[k]), horizon):
+            gap = -row[t]
+            if gap <= _EPS:
+                continue
+            # (unit cost, from week, donor key or -1 for the key's own receipt)
+            heap = [(p["expedite_cost_per_unit_week"] * (r - t), r, -1) for r in range(t + 1, t + reach + 1) if left[r] > _EPS]
+            heap += [(cost, t - transit, d) for cost, transit, d in k_donors if transit <= t]
+            heapq.heapify(heap)
+            while gap > _EPS and heap:
+                unit_cost, week, d = heapq.heappop(heap)
+                if d < 0:
+                    qty = min(gap, left[week])
+                    left[week] -= qty
+                    row[t:week] += qty
+                else:
+                    qty = min(gap, (nai[d, week:] - ss[d, week:]).min())
+                    if qty <= _EPS:
+                        continue
+                    nai[d, week:] -= qty
+                    row[t:] += qty
+                moves.append((k, d, qty, week, t, unit_cost))
+                gap -= qty
+    prof.lap("2_greedy", rows_in=len(order), rows_out=len(moves))
+
+    actions = _action_table(plan, moves, week_calendar(plan.anchor_day, horizon + reach))
+    if moves:
+        k, d, qty, week, t, _ = map(np.array, zip(*moves))
+        source = np.where(d < 0, k, d)
+        # Each move removes supply where it came from and adds it where it lands
+        plan = plan.with_supply_moves(np.r_[source, k], np.r_[week, t], np.r_[-qty, qty], delay)
+        summary, _ = plan.project_batch(scenario_grid([demand_uplift_pct], [delay], [horizon]), include_detail=False)
+        summary = summary.drop(columns=["scenario_id"] + SCENARIO_COLS)
+    prof.lap("3_reproject", rows_in=len(moves), rows_out=len(summary))
+    return actions, summary
+
+
+def params_from(params: Dict[str, float]) -> Dict[str, float]:
+    """DEFAULT_PARAMS keys found in a read_params() dict."""
+    return {k: params[k] for k in DEFAULT_PARAMS if k in params}
+
+
+def _donors(plan: PreparedPlan, receivers: np.ndarray, lanes: Optional[pd.DataFrame]) -> Dict[int, List[Tuple[float, int, int]]]:
+    """Receiver key -> [(cost_per_unit, transit_weeks, donor key)] over every lane into its location."""
+    if lanes is None or lanes.empty or not len(receivers):
+        return {}
+    recv = pd.DataFrame({
+        "receiver": receivers,
+        "sku": plan.keys["sku"].to_numpy()[receivers].astype(str),
+        "to_location": plan.keys["location"].to_numpy()[receivers].astype(str),
+    })
+    pairs = recv.merge(network.read_lanes(lanes), on="to_location")
+    pairs["donor"] = plan.key_codes(pairs["sku"], pairs["from_location"])
+    pairs = pairs[pairs["donor"] >= 0]
+
+    donors = {}
+    for r, cost, transit, d in zip(pairs["receiver"], pairs["cost_per_unit"], pairs["transit_weeks"], pairs["donor"]):
+        donors.setdefault(int(r), []).append((float(cost), int(transit), int(d)))
+    return donors
+
+
+def _action_table(plan: PreparedPlan, moves: List[tuple], calendar: np.ndarray) -> pd.DataFrame:
+    """One ACTION_COLS row per (key, donor, qty, from week, to week, unit cost) move."""
+    if not moves:
+        return pd.DataFrame(columns=ACTION_COLS)
+    k, d, qty, week, t, unit_cost = map(np.array, zip(*moves))
+    transfer = d >= 0
+    dates = pd.to_datetime(calendar, unit="D").date
+    actions = plan.keys.iloc[k].reset_index(drop=True)
+    actions["action"] = pd.Categorical(np.where(transfer, ACTIONS[1], ACTIONS[0]), categories=ACTIONS)
+    actions["from_location"] = plan.keys["location"].iloc[np.where(transfer, d, k)].to_numpy()
+    actions["qty"] = qty
+    actions["from_week"] = dates[week]
+    actions["to_week"] = dates[t]
+    actions["lead_weeks"] = np.abs(week - t)
+    actions["unit_cost"] = unit_cost
+    actions["cost"] = qty * unit_cost
+    return actions[ACTION_COLS]
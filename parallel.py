@@ -0,0 +1,197 @@
+import os
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Tuple, List, Optional
+
+from kpi_engine import PreparedPlan, HOLD_COLS
+
+# Keys per worker below which sharding costs more (process start, shared
+# memory, merge) than it saves; smaller inputs use fewer shards
+DEFAULT_MIN_KEYS_PER_SHARD = 20_000
+
+def compute_kpis_parallel(
+    inv: pd.DataFrame,
+    demand: pd.DataFrame,
+    supply: pd.DataFrame,
+    scenarios: pd.DataFrame,
+    include_detail: bool = True,
+    workers: Optional[int] = None,
+    min_keys_per_shard: int = DEFAULT_MIN_KEYS_PER_SHARD,
+    safety_stock_plan: Optional[pd.DataFrame] = None,
+    master: Optional[pd.DataFrame] = None,
+    release_weeks: Optional[Dict[str, Optional[int]]] = None,
+    network=None,
+    by_priority: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Sharded compute_kpis_batch. See project_batch_parallel.
+    """
+    plan = PreparedPlan(inv, demand, supply, safety_stock_plan, master, release_weeks)
+    return project_batch_parallel(plan, scenarios, include_detail, workers, min_keys_per_shard, network=network, by_priority=by_priority)
+
+
+def project_batch_parallel(
+    plan: PreparedPlan,
+    scenarios: pd.DataFrame,
+    include_detail: bool = True,
+    workers: Optional[int] = None,
+    min_keys_per_shard: int = DEFAULT_MIN_KEYS_PER_SHARD,
+    start_method: str = "spawn",
+    network=None,
+    by_priority: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Runs plan.project_batch across worker processes, one shard of keys each.
+
+    Every (sku, location) projects independently, so keys are hash-partitioned
+    into shards and each worker projects plan.subset(shard). The plan arrays
+    are placed in shared memory once; workers attach to them instead of
+    receiving pickled copies. Results are concatenated and restored to
+    (scenario, key, week) order, so the output is identical to
+    plan.project_batch(scenarios) regardless of worker count or finish order.
+
+    Args:
+        plan: Prepared inputs
+        scenarios: Same as compute_kpis_batch
+        include_detail: Set False to skip building the stacked detail frame
+        workers: Process count (defaults to SCM_KPI_WORKERS, else CPU count)
+        min_keys_per_shard: Inputs too small to give every worker this many
+            keys use fewer shards; a single shard runs in-process.
+        start_method: multiprocessing start method. "spawn" is safe inside
+            threaded hosts such as Streamlit; "fork" starts faster in batch jobs.
+        network: Optional network.Network. Lanes couple a SKU's locations,
+            so shards then split by SKU instead of by key.
+        by_priority: Allocate served quantity by customer_priority tier
+
+    Returns:
+        (summary_df, detail_df) as project_batch
+    """
+    n_shards = min(resolve_workers(workers), plan.n_keys // max(min_keys_per_shard, 1))
+    if n_shards <= 1:
+        return plan.project_batch(scenarios, include_detail=include_detail, network=network, by_priority=by_priority)
+
+    shards = [s for s in shard_keys(plan, n_shards, by_sku=network is not None) if len(s)]
+    blocks = {}
+    try:
+        spec = {}
+        for name, arr in _plan_arrays(plan).items():
+            blocks[name], spec[name] = _share(arr)
+        meta = (plan.skus, plan.locations, plan.anchor_day, plan.release_weeks, plan.tiers, plan.targets)
+
+        ctx = mp.get_context(start_method)
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=ctx) as pool:
+            futures = [pool.submit(_run_shard, spec, meta, codes, scenarios, include_detail, network, by_priority) for codes in shards]
+            results = [f.result() for f in futures]
+    finally:
+        for shm in blocks.values():
+            shm.close()
+            shm.unlink()
+
+    scen_ids = pd.Index(scenarios["scenario_id"] if "scenario_id" in scenarios.columns else np.arange(len(scenarios)))
+    summary = _merge(plan, scen_ids, [r[0] for r in results])
+    detail = _merge(plan, scen_ids, [r[1] for r in results]) if include_detail else pd.DataFrame()
+    return summary, detail
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """Explicit count, else SCM_KPI_WORKERS, else the CPU count."""
+    if workers is None:
+        # Override with SCM_KPI_WORKERS (e.g. to leave cores free on a shared host)
+        workers = int(os.environ.get("SCM_KPI_WORKERS", 0)) or os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def shard_keys(plan: PreparedPlan, n_shards: int, by_sku: bool = False) -> List[np.ndarray]:
+    """
+    Hash-partitions key codes into n_shards sorted arrays.
+
+    The hash is taken over the sku/location labels, not the codes, so a key
+    lands in the same shard across uploads. by_sku hashes the SKU alone,
+    keeping all of a SKU's locations in one shard.
+    """
+    if plan.n_keys == 0:
+        return [np.zeros(0, dtype=np.int64) for _ in range(n_shards)]
+    labels = pd.DataFrame({"sku": plan.keys["sku"].astype(str)})
+    if not by_sku:
+        labels["location"] = plan.keys["location"].astype(str)
+    bucket = pd.util.hash_pandas_object(labels, index=False).to_numpy() % np.uint64(n_shards)
+    return [np.flatnonzero(bucket == i) for i in range(n_shards)]
+
+
+# ----------------------------------------------------
+# Shared Memory
+# ----------------------------------------------------
+def _plan_arrays(plan: PreparedPlan) -> Dict[str, np.ndarray]:
+    return {
+        "key_ids": plan._key_ids,
+        "on_hand": plan.on_hand,
+        "safety_stock": plan.safety_stock,
+        "d_codes": plan.demand[0], "d_weeks": plan.demand[1], "d_qty": plan.demand[2],
+        "s_codes": plan.supply[0], "s_weeks": plan.supply[1], "s_qty": plan.supply[2],
+        "ss_codes": plan.ss_plan[0], "ss_weeks": plan.ss_plan[1], "ss_qty": plan.ss_plan[2],
+        "holding_rate": plan.holding_rate,
+        **{f"held_{col}": qty for col, qty in plan.held.items()},
+        **{f"tier{i}_{part}": arr for i, flows in enumerate(plan.tier_demand) for part, arr in zip(["codes", "weeks", "qty"], flows)},
+    }
+
+
+def _share(arr: np.ndarray) -> Tuple[shared_memory.SharedMemory, Tuple[str, str, Tuple[int, ...]]]:
+    arr = np.ascontiguousarray(arr)
+    # Zero-size segments are not allowed
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, arr.dtype.str, arr.shape)
+
+
+def _run_shard(
+    spec: Dict[str, Tuple[str, str, Tuple[int, ...]]],
+    meta: tuple,
+    codes: np.ndarray,
+    scenarios: pd.DataFrame,
+    include_detail: bool,
+    network=None,
+    by_priority: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Worker: attach to the shared plan, project one shard."""
+    handles = {name: shared_memory.SharedMemory(name=shm_name) for name, (shm_name, _, _) in spec.items()}
+    try:
+        a = {name: np.ndarray(shape, dtype=dtype, buffer=handles[name].buf) for name, (_, dtype, shape) in spec.items()}
+        skus, locations, anchor_day, release_weeks, tiers, targets = meta
+        plan = PreparedPlan.from_arrays(
+            skus, locations, a["key_ids"], a["on_hand"], a["safety_stock"],
+            (a["d_codes"], a["d_weeks"], a["d_qty"]),
+            (a["s_codes"], a["s_weeks"], a["s_qty"]),
+            anchor_day,
+            (a["ss_codes"], a["ss_weeks"], a["ss_qty"]),
+            {col: a[f"held_{col}"] for col in HOLD_COLS},
+            a["holding_rate"],
+            release_weeks,
+            tiers,
+            [(a[f"tier{i}_codes"], a[f"tier{i}_weeks"], a[f"tier{i}_qty"]) for i in range(len(tiers))],
+            targets
+        )
+        # subset() copies, so nothing below references the shared buffers
+        part = plan.subset(codes)
+        del plan, a
+        return part.project_batch(scenarios, include_detail=include_detail, network=network, by_priority=by_priority)
+    finally:
+        for shm in handles.values():
+            shm.close()
+
+
+def _merge(plan: PreparedPlan, scen_ids: pd.Index, parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates shard outputs back into (scenario, key, week) order."""
+    parts = [p for p in parts if len(p.columns)]
+    if not parts:
+        return pd.DataFrame()
+    merged = pd.concat(parts, ignore_index=True)
+    if merged.empty:
+        return merged
+
+    codes = plan.key_codes(merged["sku"], merged["location"])
+    # Stable sort keeps week order inside each key
+    order = np.lexsort((codes, scen_ids.get_indexer(merged["scenario_id"])))
+    return merged.iloc[order].reset_index(drop=True)
@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Tuple, Optional
+
+import kpi_engine
+import montecarlo
+import network
+import optimizer
+import profiling
+
+# Recommendation labels in rule priority order; the last one is the default
+RECOMMENDATIONS = ["🟥 EXPEDITE", "🟧 REPLENISH", "🟦 PROMO", "✅ OK"]
+
+# PROMO thresholds, overridable through Constraints_Params
+ACTION_PARAMS = {
+    "promo_cover_multiple": 3.0,   # min_poh above this many x safety stock ...
+    "promo_min_poh": 10000.0,      # ... and above this many units
+}
+
+# Constraints_Params names that map onto scenario levers
+PARAM_SCENARIO_COLS = {
+    "demand_uplift_pct": 0.0,
+    "supply_delay_weeks": 0,
+    "horizon_weeks": 8,
+}
+
+# Constraints_Params names for hold release lead times (weeks), by Inventory column
+RELEASE_PARAMS = {
+    "qa_release_weeks": "qa_hold_qty",
+    "blocked_release_weeks": "blocked_qty",
+}
+
+# Constraints_Params names "priority_rank_<tier>" rank customer_priority tiers (1 = served first)
+PRIORITY_RANK_PREFIX = "priority_rank_"
+
+def read_params(dfs: Dict[str, pd.DataFrame]) -> Dict[str, float]:
+    """
+    Constraints_Params as a {param_name: param_value} dict.
+
+    Missing sheet, blank names and non-numeric values are skipped.
+    """
+    params = dfs.get("Constraints_Params")
+    if params is None or params.empty or not {"param_name", "param_value"} <= set(params.columns):
+        return {}
+    values = pd.to_numeric(params["param_value"], errors='coerce')
+    ok = params["param_name"].notna() & values.notna()
+    return dict(zip(params["param_name"][ok].astype(str).str.strip(), values[ok].astype(float)))
+
+def scenarios_from_params(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    One scenario from Constraints_Params (horizon_weeks, demand_uplift_pct,
+    supply_delay_weeks), falling back to compute_kpis defaults.
+    """
+    params = read_params(dfs)
+    levers = {col: params.get(col, default) for col, default in PARAM_SCENARIO_COLS.items()}
+    return kpi_engine.scenario_grid(
+        [float(levers["demand_uplift_pct"])],
+        [int(levers["supply_delay_weeks"])],
+        [int(levers["horizon_weeks"])]
+    )
+
+def build_plan(dfs: Dict[str, pd.DataFrame]) -> kpi_engine.PreparedPlan:
+    """
+    PreparedPlan for validated frames, with the optional Safety_Stock_Plan,
+    Master_Data and Calendar sheets, plus from Constraints_Params: hold release lead
+    times (missing names keep kpi_engine.DEFAULT_RELEASE_WEEKS), tier
+    ranks (unranked tiers follow alphabetically) and the cover/service
+    targets (kpi_engine.DEFAULT_TARGETS names).
+    """
+    params = read_params(dfs)
+    release_weeks = {col: params[name] for name, col in RELEASE_PARAMS.items() if name in params}
+    ranks = {name[len(PRIORITY_RANK_PREFIX):]: rank for name, rank in params.items() if name.startswith(PRIORITY_RANK_PREFIX)}
+    return kpi_engine.PreparedPlan(
+        dfs["Inventory"], dfs["Demand_Plan"], dfs["Supply_Plan"],
+        dfs.get("Safety_Stock_Plan"), dfs.get("Master_Data"), release_weeks,
+        sorted(ranks, key=ranks.get), dfs.get("Calendar"),
+        {name: params[name] for name in kpi_engine.DEFAULT_TARGETS if name in params}
+    )
+
+def build_network(dfs: Dict[str, pd.DataFrame]) -> Optional[network.Network]:
+    """Network from Logistics_Lanes, or None when the sheet is missing or empty."""
+    lanes = dfs.get("Logistics_Lanes")
+    if lanes is None or lanes.empty:
+        return None
+    return network.Network(lanes)
+
+def run_pipeline(
+    dfs: Dict[str, pd.DataFrame],
+    scenarios: pd.DataFrame,
+    include_detail: bool = True,
+    workers: Optional[int] = 1,
+    use_network: bool = False,
+    by_priority: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    KPI projection + master data + revenue at risk for validated frames.
+
+    Args:
+        dfs: Validated sheets (see validator.validate_plan)
+        scenarios: See kpi_engine.compute_kpis_batch
+        include_detail: Set False to skip the stacked detail frame
+        workers: >1 (or None for all cores) shards keys across processes
+        use_network: Project along Logistics_Lanes (see network.py)
+        by_priority: Allocate by customer_priority tier (see PreparedPlan.project_batch)
+
+    Returns:
+        (summary_df, detail_df) tagged with scenario_id; summary carries
+        unit_revenue, unit_cogs, revenue_at_risk, excess_value and total_holding_cost.
+    """
+    plan = build_plan(dfs)
+    net = build_network(dfs) if use_network else None
+    if workers == 1:
+        summary, detail = plan.project_batch(scenarios, include_detail=include_detail, network=net, by_priority=by_priority)
+    else:
+        # Imported on demand: multiprocessing setup is not needed for single-core runs
+        import parallel
+        summary, detail = parallel.project_batch_parallel(
+            plan, scenarios, include_detail=include_detail, workers=workers, network=net, by_priority=by_priority
+        )
+
+    summary = add_excess_value(add_revenue_at_risk(enrich_master(summary, dfs)))
+    return summary, detail
+
+def run_montecarlo(
+    dfs: Dict[str, pd.DataFrame],
+    n_samples: int = 1000,
+    seed: int = 0,
+    scenario: Optional[pd.Series] = None,
+    plan: Optional[kpi_engine.PreparedPlan] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Stockout probability and unmet/revenue-at-risk quantiles per key under
+    demand and supply uncertainty (see montecarlo.simulate).
+
+    Args:
+        dfs: Validated sheets; Constraints_Params may override
+            montecarlo.DEFAULT_UNCERTAINTY by name
+        n_samples: Draws per key
+        seed: Equal seeds give equal results
+        scenario: Row with the scenario levers (defaults to scenarios_from_params)
+        plan: Reuse an already built PreparedPlan
+
+    Returns:
+        (per_key, portfolio) as montecarlo.simulate, valued at unit_revenue
+    """
+    plan = plan if plan is not None else build_plan(dfs)
+    scenario = scenario if scenario is not None else scenarios_from_params(dfs).iloc[0]
+    revenue = enrich_master(plan.keys.copy(), dfs)["unit_revenue"].to_numpy(float)
+    return montecarlo.simulate(
+        plan, n_samples,
+        horizon_weeks=int(scenario["horizon_weeks"]),
+        demand_uplift_pct=float(scenario["demand_uplift_pct"]),
+        supply_delay_weeks=int(scenario["supply_delay_weeks"]),
+        uncertainty=montecarlo.uncertainty_from_params(read_params(dfs)),
+        unit_revenue=revenue,
+        seed=seed
+    )
+
+def run_optimizer(
+    dfs: Dict[str, pd.DataFrame],
+    scenario: Optional[pd.Series] = None,
+    plan: Optional[kpi_engine.PreparedPlan] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Pull-ins and lane transfers that close stockouts at least cost (see
+    optimizer.propose), with the KPIs they lead to.
+
+    Args:
+        dfs: Validated sheets; Logistics_Lanes enables transfers and
+            Constraints_Params may override optimizer.DEFAULT_PARAMS by name
+        scenario: Row with the scenario levers (defaults to scenarios_from_params)
+        plan: Reuse an already built PreparedPlan
+
+    Returns:
+        (actions, summary): optimizer.ACTION_COLS rows, and the summary after
+        every move with master data, revenue at risk and excess value
+    """
+    plan = plan if plan is not None else build_plan(dfs)
+    scenario = scenario if scenario is not None else scenarios_from_params(dfs).iloc[0]
+    revenue = enrich_master(plan.keys.copy(), dfs)["unit_revenue"].to_numpy(float)
+    actions, summary = optimizer.propose(
+        plan,
+        horizon_weeks=int(scenario["horizon_weeks"]),
+        demand_uplift_pct=float(scenario["demand_uplift_pct"]),
+        supply_delay_weeks=int(scenario["supply_delay_weeks"]),
+        lanes=dfs.get("Logistics_Lanes"),
+        params=optimizer.params_from(read_params(dfs)),
+        unit_revenue=revenue
+    )
+    return actions, add_excess_value(add_revenue_at_risk(enrich_master(summary, dfs)))
+
+@profiling.profiled("enrich_master")
+def enrich_master(df, dfs):
+    """Joins master data (unit_revenue, cogs, etc.)"""
+    if "Master_Data" not in dfs:
+        df["unit_revenue"] = 1.0
+        df["unit_cogs"] = 0.5
+        return df
+
+    m = dfs["Master_Data"].copy()
+    if "location" in m.columns:
+        m = m.drop_duplicates(subset=["sku", "location"])
+        df = df.merge(m[["sku", "location", "unit_revenue", "unit_cogs"]], on=["sku", "location"], how="left")
+    else:
+        m = m.drop_duplicates(subset=["sku"])
+        df = df.merge(m[["sku", "unit_revenue", "unit_cogs"]], on=["sku"], how="left")
+
+    df["unit_revenue"] = df["unit_revenue"].fillna(1.0)
+    df["unit_cogs"] = df["unit_cogs"].fillna(0.5)
+    return df
+
+@profiling.profiled("revenue_at_risk")
+def add_revenue_at_risk(summary: pd.DataFrame) -> pd.DataFrame:
+    """Unmet demand valued at unit revenue (expects enrich_master columns)."""
+    summary["revenue_at_risk"] = summary["total_unmet"] * summary["unit_revenue"]
+    return summary
+
+@profiling.profiled("excess_value")
+def add_excess_value(summary: pd.DataFrame) -> pd.DataFrame:
+    """Peak excess stock valued at unit COGS (expects enrich_master columns)."""
+    summary["excess_value"] = summary["excess_qty"] * summary["unit_cogs"]
+    return summary
+
+def recommend_actions(summary: pd.DataFrame, params: Optional[Dict[str, float]] = None) -> pd.Series:
+    """
+    One recommendation per summary row, first matching rule wins:
+    EXPEDITE on a stockout, REPLENISH on a safety stock breach, PROMO on
+    excess stock (excess_flag, when present) or when min_poh exceeds both
+    promo thresholds, else OK.
+
+    Args:
+        summary: compute_kpis summary
+        params: read_params() output; missing thresholds use ACTION_PARAMS
+
+    Returns:
+        Categorical Series aligned with summary (categories in RECOMMENDATIONS order)
+    """
+    params = {**ACTION_PARAMS, **{k: v for k, v in (params or {}).items() if k in ACTION_PARAMS}}
+    min_poh = summary["min_poh"].to_numpy(float)
+    excess = summary["excess_flag"].to_numpy().astype(bool) if "excess_flag" in summary.columns else False
+    conditions = [
+        summary["stockout_flag"].to_numpy().astype(bool),
+        summary["safety_breach_flag"].to_numpy().astype(bool),
+        excess | ((min_poh > summary["safety_stock_qty"].to_numpy(float) * params["promo_cover_multiple"]) & (min_poh > params["promo_min_poh"])),
+    ]
+    labels = np.select(conditions, RECOMMENDATIONS[:-1], default=RECOMMENDATIONS[-1])
+    return pd.Series(pd.Categorical(labels, categories=RECOMMENDATIONS), index=summary.index, name="Recommendation")
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import pandas as pd
+import pyarrow as pa
+from typing import Dict, Tuple, List, Optional
+
+import ingest
+import validator
+
+# Override with SCM_PLAN_CACHE_DIR / SCM_PLAN_CACHE_MB (e.g. a mounted volume)
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".plan_cache")
+DEFAULT_MAX_MB = 512
+
+MANIFEST = "manifest.json"
+
+# Bump when validator/ingest changes alter what a cached workbook holds
+# without changing the loaded columns (e.g. a new coercion rule)
+CACHE_VERSION = 2
+
+def content_hash(file_bytes: bytes) -> str:
+    """SHA-256 of the uploaded workbook bytes."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def schema_fingerprint() -> str:
+    """CACHE_VERSION plus the sheet/column spec the loader reads, hashed."""
+    spec = json.dumps({"version": CACHE_VERSION, "columns": ingest.sheet_columns()}, sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+def load_info(report: List[Dict], issues: pd.DataFrame) -> dict:
+    """PlanCache info for a workbook: the ingest report and validation warnings, as JSON."""
+    return {"report": report, "warnings": json.loads(issues.to_json(orient="records"))}
+
+def load_details(info: Optional[dict]) -> Tuple[List[Dict], pd.DataFrame]:
+    """(report, issues) back from load_info() output; empty for entries without it."""
+    info = info or {}
+    return info.get("report", []), pd.DataFrame(info.get("warnings", []), columns=validator.ISSUE_COLS)
+
+class PlanCache:
+    """
+    Size-bounded on-disk cache of validated, normalized workbook frames.
+
+    Each entry is a directory named by the workbook hash holding one
+    uncompressed Arrow IPC file per sheet, so reads are memory-mapped
+    instead of parsed. Frames are built one block per column, so numeric
+    and date columns are views of the mapped file rather than copies. The directory mtime doubles as the LRU clock. The
+    manifest records the schema fingerprint the entry was written under;
+    an entry from another loader version (e.g. on a volume kept across
+    upgrades) is a miss and is overwritten by the next put. It also keeps
+    the caller's info for the entry (e.g. load report and data warnings),
+    so a cache hit can show what a fresh load would have.
+
+    Args:
+        root: Cache directory (created on demand)
+        max_bytes: Total size budget; least recently used entries are evicted
+        fingerprint: Schema fingerprint (defaults to schema_fingerprint())
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None, fingerprint: Optional[str] = None):
+        self.root = root or os.environ.get("SCM_PLAN_CACHE_DIR", DEFAULT_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("SCM_PLAN_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint or schema_fingerprint()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """Returns the cached frames for key, or None on a miss, unreadable or stale entry."""
+        path = self._entry(key)
+        try:
+            with open(os.path.join(path, MANIFEST)) as f:
+                manifest = json.load(f)
+            if manifest.get("schema") != self.fingerprint:
+                return None
+            sheets = manifest["sheets"]
+            dfs = {}
+            for sh in sheets:
+                with pa.memory_map(os.path.join(path, f"{sh}.arrow"), "r") as src:
+                    # One block per column: no consolidation copy
+                    dfs[sh] = pa.ipc.open_file(src).read_all().to_pandas(split_blocks=True, self_destruct=True)
+        except (OSError, ValueError, KeyError, pa.ArrowException):
+            return None
+
+        # Touch for LRU
+        os.utime(path, None)
+        return dfs
+
+    def info(self, key: str) -> Optional[dict]:
+        """The info stored with key by put() ({} if none), or None on a miss or stale entry."""
+        try:
+            with open(os.path.join(self._entry(key), MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("schema") != self.fingerprint:
+            return None
+        return manifest.get("info", {})
+
+    def put(self, key: str, dfs: Dict[str, pd.DataFrame], info: Optional[dict] = None) -> bool:
+        """
+        Stores frames under key. Writes go to a temp dir and are renamed
+        into place, so readers never see a partial entry.
+
+        Args:
+            key: Workbook hash
+            dfs: Validated frames
+            info: JSON-serializable details returned by info()
+
+        Returns:
+            True if stored, False if a frame could not be converted to Arrow
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            for sh, df in dfs.items():
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                with pa.OSFile(os.path.join(tmp, f"{sh}.arrow"), "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            with open(os.path.join(tmp, MANIFEST), "w") as f:
+                json.dump({"sheets": list(dfs), "schema": self.fingerprint, "info": info or {}, "created": time.time()}, f)
+
+            dest = self._entry(key)
+            if os.path.exists(dest):
+                shutil.rmtree(dest, ignore_errors=True)
+            os.replace(tmp, dest)
+        except (OSError, TypeError, ValueError, pa.ArrowException):
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        """Drops least recently used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            path = self._entry(name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+            entries.append((os.stat(path).st_mtime, size, path))
+            total += size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
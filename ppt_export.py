@@ -0,0 +1,160 @@
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from typing import Hashable, Optional
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from datetime import datetime
+
+import profiling
+
+# Decks kept per (workbook hash, scenario); a deck is ~30 KB
+DECK_CACHE_ENTRIES = 32
+
+@profiling.profiled("generate_ppt")
+def generate_ppt(summary, tot_rar, skus_stockout, avg_fill, safety_breaches):
+    """Generate PowerPoint presentation with dashboard results"""
+    prs = Presentation()
+    prs.slide_width = Inches(10)
+    prs.slide_height = Inches(7.5)
+    
+    # Title Slide
+    title_slide = prs.slides.add_slide(prs.slide_layouts[0])
+    title = title_slide.shapes.title
+    subtitle = title_slide.placeholders[1]
+    title.text = "Supply Chain Risk Dashboard"
+    subtitle.text = f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    
+    # KPI Summary Slide
+    kpi_slide = prs.slides.add_slide(prs.slide_layouts[5])
+    title = kpi_slide.shapes.title
+    title.text = "Executive KPI Summary"
+    
+    left = Inches(1)
+    top = Inches(2)
+    width = Inches(8)
+    height = Inches(0.8)
+    
+    metrics = [
+        ("💰 Revenue at Risk", f"${tot_rar:,.0f}"),
+        ("⚠️ SKUs with Stockouts", f"{int(skus_stockout)}"),
+        ("📉 Average Fill Rate", f"{avg_fill*100:.1f}%"),
+        ("🛡️ Safety Stock Breaches", f"{int(safety_breaches)}")
+    ]
+    
+    for i, (label, value) in enumerate(metrics):
+        textbox = kpi_slide.shapes.add_textbox(left, top + i*height, width, height)
+        text_frame = textbox.text_frame
+        text_frame.text = f"{label}: {value}"
+        text_frame.paragraphs[0].font.size = Pt(18)
+        text_frame.paragraphs[0].font.bold = True
+    
+    # Top Risks Slide
+    risks_slide = prs.slides.add_slide(prs.slide_layouts[5])
+    title = risks_slide.shapes.title
+    title.text = "Top 10 At-Risk SKU-Locations"
+    
+    top_risks = summary.nlargest(10, 'revenue_at_risk')[['sku', 'location', 'revenue_at_risk', 'fill_rate']]
+    
+    left = Inches(1)
+    top = Inches(2)
+    width = Inches(8)
+    height = Inches(4)
+    
+    table = risks_slide.shapes.add_table(len(top_risks) + 1, 4, left, top, width, height).table
+    
+    # Header
+    headers = ['SKU', 'Location', 'Revenue at Risk', 'Fill Rate']
+    for col_idx, header in enumerate(headers):
+        cell = table.cell(0, col_idx)
+        cell.text = header
+        cell.text_frame.paragraphs[0].font.bold = True
+    
+    # Data
+    for row_idx, row in enumerate(top_risks.itertuples(index=False), start=1):
+        table.cell(row_idx, 0).text = str(row.sku)
+        table.cell(row_idx, 1).text = str(row.location)
+        table.cell(row_idx, 2).text = f"${row.revenue_at_risk:,.0f}"
+        table.cell(row_idx, 3).text = f"{row.fill_rate*100:.1f}%"
+    
+    # Save to BytesIO
+    ppt_io = io.BytesIO()
+    prs.save(ppt_io)
+    ppt_io.seek(0)
+    return ppt_io
+
+class DeckCache:
+    """
+    Builds decks on demand on a background thread and keeps the most
+    recent ones by key (e.g. workbook hash + scenario levers).
+
+    submit() returns immediately; callers poll pending()/result() on later
+    reruns, so the UI never blocks on python-pptx. Failed builds are
+    dropped so the next request retries. Each build is profiled on its own
+    thread; the first result() to find it finished merges those timings into
+    the caller's profile (see profiling.merge).
+
+    Args:
+        max_entries: Decks (finished or pending) kept, least recently used first out
+        workers: Build threads
+    """
+
+    def __init__(self, max_entries: int = DECK_CACHE_ENTRIES, workers: int = 1):
+        self.max_entries = max_entries
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ppt")
+        self._futures = OrderedDict()
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, summary, tot_rar, skus_stockout, avg_fill, safety_breaches) -> Future:
+        """Starts a generate_ppt build for key unless one exists already."""
+        with self._lock:
+            fut = self._futures.get(key)
+            if fut is None:
+                fut = self._pool.submit(self._build, key, summary, tot_rar, skus_stockout, avg_fill, safety_breaches)
+                self._futures[key] = fut
+                while len(self._futures) > self.max_entries:
+                    old, _ = self._futures.popitem(last=False)
+                    self._profiles.pop(old, None)
+            self._futures.move_to_end(key)
+            return fut
+
+    def _build(self, key: Hashable, *args) -> bytes:
+        # Profiles are per thread: collect here, hand over in result()
+        with profiling.collect() as prof:
+            data = generate_ppt(*args).getvalue()
+        with self._lock:
+            if key in self._futures:
+                self._profiles[key] = prof
+        return data
+
+    def pending(self, key: Hashable) -> bool:
+        with self._lock:
+            fut = self._futures.get(key)
+        return fut is not None and not fut.done()
+
+    def result(self, key: Hashable, timeout: Optional[float] = 0) -> Optional[bytes]:
+        """
+        The finished deck for key, waiting up to timeout seconds (None = forever).
+        Returns None if not requested or still building; re-raises build errors.
+        """
+        with self._lock:
+            fut = self._futures.get(key)
+            if fut is not None:
+                self._futures.move_to_end(key)
+        if fut is None:
+            return None
+        try:
+            data = fut.result(timeout=timeout)
+        except FutureTimeout:
+            return None
+        except Exception:
+            with self._lock:
+                if self._futures.get(key) is fut:
+                    del self._futures[key]
+            raise
+        with self._lock:
+            prof = self._profiles.pop(key, None)
+        profiling.merge(prof)
+        return data
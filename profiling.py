@@ -0,0 +1,147 @@
+"""
+Opt-in stage timings for the pipeline.
+
+Collection is per thread (one Streamlit session = one script thread) and
+only happens between start() and stop(). Without an active profile every
+hook returns a shared no-op, so instrumented code pays one thread-local
+lookup per stage and nothing per row.
+
+    with profiling.collect() as prof:
+        compute_kpis(inv, demand, supply)
+    prof.frame()          # stage, seconds, rows_in, rows_out, peak_rss_delta_mb
+"""
+import sys
+import json
+import time
+import functools
+import threading
+import contextlib
+import pandas as pd
+from typing import Dict, List, Optional, Callable, Iterator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RECORD_COLS = ["stage", "seconds", "rows_in", "rows_out", "peak_rss_delta_mb"]
+
+_state = threading.local()
+
+class Profile:
+    """Ordered stage records for one run."""
+
+    def __init__(self):
+        self.records: List[Dict] = []
+
+    def add(self, stage: str, seconds: float, rows_in: Optional[int], rows_out: Optional[int], rss_delta: Optional[float]):
+        self.records.append({
+            "stage": stage,
+            "seconds": round(seconds, 6),
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "peak_rss_delta_mb": None if rss_delta is None else round(rss_delta, 3),
+        })
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records, columns=RECORD_COLS)
+
+    def to_json(self) -> str:
+        return json.dumps({"stages": self.records, "total_seconds": round(sum(r["seconds"] for r in self.records), 6)}, indent=2)
+
+class _Timer:
+    """Lap timer: each lap() records the time since the previous one."""
+
+    def __init__(self, profile: Profile, prefix: str):
+        self.profile = profile
+        self.prefix = prefix
+        self.t0 = time.perf_counter()
+        self.rss0 = _peak_rss_mb()
+
+    def lap(self, name: str, rows_in: Optional[int] = None, rows_out: Optional[int] = None):
+        now, rss = time.perf_counter(), _peak_rss_mb()
+        self.profile.add(f"{self.prefix}.{name}", now - self.t0, rows_in, rows_out, None if rss is None else rss - self.rss0)
+        self.t0, self.rss0 = now, rss
+
+class _NullTimer:
+    def lap(self, name: str, rows_in: Optional[int] = None, rows_out: Optional[int] = None):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+# ----------------------------------------------------
+# Collection
+# ----------------------------------------------------
+def start() -> Profile:
+    """Starts collecting on this thread and returns the (empty) profile."""
+    _state.profile = Profile()
+    return _state.profile
+
+def stop() -> Optional[Profile]:
+    """Stops collecting on this thread and returns what was collected."""
+    profile = getattr(_state, "profile", None)
+    _state.profile = None
+    return profile
+
+def active() -> Optional[Profile]:
+    return getattr(_state, "profile", None)
+
+def merge(profile: Optional[Profile]) -> None:
+    """Appends records collected on another thread (e.g. a background build) to this thread's profile, if collecting."""
+    current = getattr(_state, "profile", None)
+    if current is not None and profile is not None:
+        current.records.extend(profile.records)
+
+@contextlib.contextmanager
+def collect() -> Iterator[Profile]:
+    profile = start()
+    try:
+        yield profile
+    finally:
+        stop()
+
+# ----------------------------------------------------
+# Hooks
+# ----------------------------------------------------
+def timer(prefix: str):
+    """Lap timer for multi-step functions; a no-op when not collecting."""
+    profile = getattr(_state, "profile", None)
+    if profile is None:
+        return _NULL_TIMER
+    return _Timer(profile, prefix)
+
+def profiled(stage: str) -> Callable:
+    """
+    Decorator recording one stage per call. Rows are taken from the first
+    argument and the result when they are DataFrames (or dicts/tuples of them).
+    """
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            profile = getattr(_state, "profile", None)
+            if profile is None:
+                return fn(*args, **kwargs)
+            t0, rss0 = time.perf_counter(), _peak_rss_mb()
+            result = fn(*args, **kwargs)
+            rss = _peak_rss_mb()
+            profile.add(stage, time.perf_counter() - t0, _rows(args[0]) if args else None, _rows(result), None if rss is None else rss - rss0)
+            return result
+        return inner
+    return wrap
+
+def _rows(obj) -> Optional[int]:
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    if isinstance(obj, dict) and obj and all(isinstance(v, pd.DataFrame) for v in obj.values()):
+        return sum(len(v) for v in obj.values())
+    if isinstance(obj, tuple) and obj:
+        return _rows(obj[0])
+    return None
+
+def _peak_rss_mb() -> Optional[float]:
+    """Process high-water RSS in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KB elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
@@ -0,0 +1,168 @@
+"""
+Several workbooks (one per region or business unit) run side by side.
+
+Each workbook is loaded on a thread pool (plan cache read, else parse +
+validate) and, once valid, its KPIs are computed on a process pool. Results
+are yielded region by region as they finish, so a slow region does not hold
+back the others:
+
+    names = region_names(["north.xlsx", "south.xlsx"])
+    done = {}
+    for region, summary, errors in process_regions(dict(zip(names, blobs)), scenarios):
+        done[region] = summary   # None when errors
+    summary = consolidate(done)
+
+Parsing is mostly Python (openpyxl), so parse threads overlap with disk
+reads and with the compute processes rather than with each other.
+"""
+import os
+import multiprocessing as mp
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Tuple, List, Optional, Iterator
+
+import ingest
+import validator
+import plan_cache
+import pipeline
+import parallel
+
+# Workbooks loaded at once; parsing holds the GIL, so more threads mostly add memory
+DEFAULT_LOAD_WORKERS = 4
+
+# Column added to every consolidated frame
+REGION_COL = "region"
+
+def region_names(filenames: List[str]) -> List[str]:
+    """File stems as region names, suffixed " (2)", " (3)", ... when repeated."""
+    names, seen = [], {}
+    for filename in filenames:
+        stem = os.path.splitext(os.path.basename(filename))[0] or "region"
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(stem if seen[stem] == 1 else f"{stem} ({seen[stem]})")
+    return names
+
+def load_region(file_bytes: bytes, cache: Optional[plan_cache.PlanCache] = None) -> Tuple[Optional[Dict[str, pd.DataFrame]], List[str]]:
+    """
+    Validated frames for one workbook, from cache when possible.
+
+    Args:
+        file_bytes: Raw .xlsx bytes
+        cache: Plan cache to read first and fill with valid workbooks
+
+    Returns:
+        (dfs, errors): dfs is None when validation fails
+    """
+    key = plan_cache.content_hash(file_bytes)
+    dfs = cache.get(key) if cache is not None else None
+    if dfs is not None:
+        return dfs, []
+    dfs, report = ingest.read_workbook(file_bytes)
+    dfs, issues = validator.validate_plan(dfs)
+    if not validator.is_valid(issues):
+        return None, validator.error_messages(issues)
+    if cache is not None:
+        cache.put(key, dfs, info=plan_cache.load_info(report, issues))
+    return dfs, []
+
+def compute_region(
+    dfs: Dict[str, pd.DataFrame],
+    scenarios: pd.DataFrame,
+    use_network: bool = False,
+    by_priority: bool = False
+) -> pd.DataFrame:
+    """run_pipeline summary (no detail) with a Recommendation column."""
+    summary, _ = pipeline.run_pipeline(dfs, scenarios, include_detail=False, use_network=use_network, by_priority=by_priority)
+    return summary.assign(Recommendation=pipeline.recommend_actions(summary, pipeline.read_params(dfs)))
+
+def process_regions(
+    files: Dict[str, bytes],
+    scenarios: pd.DataFrame,
+    use_network: bool = False,
+    by_priority: bool = False,
+    cache: Optional[plan_cache.PlanCache] = None,
+    workers: Optional[int] = None,
+    load_workers: int = DEFAULT_LOAD_WORKERS,
+    start_method: str = "spawn"
+) -> Iterator[Tuple[str, Optional[pd.DataFrame], List[str]]]:
+    """
+    Loads and computes every workbook concurrently, yielding each region
+    as soon as it is done (or has failed).
+
+    Args:
+        files: Region name -> workbook bytes
+        scenarios: See kpi_engine.compute_kpis_batch
+        use_network, by_priority: See pipeline.run_pipeline
+        cache: Plan cache shared with single-workbook runs
+        workers: Compute processes (defaults to SCM_KPI_WORKERS, else CPU
+            count, capped at the number of regions); with one, compute runs
+            on the load threads instead
+        load_workers: Threads parsing and validating workbooks
+        start_method: See parallel.project_batch_parallel
+
+    Yields:
+        (region, summary, errors) in finish order; summary is the
+        compute_region output, or None with the validation or processing
+        errors of that region
+    """
+    if not files:
+        return
+    n_procs = min(parallel.resolve_workers(workers), len(files))
+    threads = ThreadPoolExecutor(max_workers=max(1, min(load_workers, len(files))), thread_name_prefix="region")
+    procs = ProcessPoolExecutor(max_workers=n_procs, mp_context=mp.get_context(start_method)) if n_procs > 1 else None
+    try:
+        # future -> (region, stage)
+        pending = {threads.submit(load_region, data, cache): (region, "load") for region, data in files.items()}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                region, stage = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield region, None, [f"{type(e).__name__}: {e}"]
+                    continue
+                if stage == "compute":
+                    yield region, result, []
+                    continue
+                dfs, errors = result
+                if dfs is None:
+                    yield region, None, errors
+                    continue
+                pool = procs if procs is not None else threads
+                pending[pool.submit(compute_region, dfs, scenarios, use_network, by_priority)] = (region, "compute")
+    finally:
+        # An abandoned iteration does not wait for the remaining regions
+        threads.shutdown(wait=False, cancel_futures=True)
+        if procs is not None:
+            procs.shutdown(wait=False, cancel_futures=True)
+
+def consolidate(summaries: Dict[str, Optional[pd.DataFrame]]) -> pd.DataFrame:
+    """
+    One summary across regions, REGION_COL first (categorical, in the
+    order given); regions without a summary are left out.
+    """
+    parts = {region: s for region, s in summaries.items() if s is not None}
+    if not parts:
+        return pd.DataFrame(columns=[REGION_COL])
+    merged = pd.concat(
+        [s.assign(**{REGION_COL: region}) for region, s in parts.items()],
+        ignore_index=True
+    )
+    merged[REGION_COL] = pd.Categorical(merged[REGION_COL], categories=list(parts))
+    # Per-region categories differ, so concat leaves labels as objects
+    for col in ["sku", "location"]:
+        merged[col] = merged[col].astype(str).astype("category")
+    return merged[[REGION_COL] + [c for c in merged.columns if c != REGION_COL]]
+
+def region_totals(summary: pd.DataFrame) -> pd.DataFrame:
+    """Executive metrics per region of a consolidated summary."""
+    return summary.groupby(REGION_COL, observed=True).agg(
+        sku_locations=("sku", "size"),
+        revenue_at_risk=("revenue_at_risk", "sum"),
+        stockouts=("stockout_flag", "sum"),
+        avg_fill_rate=("fill_rate", "mean"),
+        safety_breaches=("safety_breach_flag", "sum"),
+        holding_cost=("total_holding_cost", "sum"),
+        excess_value=("excess_value", "sum"),
+    ).reset_index()
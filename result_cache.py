@@ -0,0 +1,116 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+# Override with SCM_RESULT_CACHE_MB (e.g. on a host serving many planners)
+DEFAULT_MAX_MB = 1024
+
+class ResultCache:
+    """
+    In-process, memory-bounded LRU of computed results, shared by every
+    session of the server. Keys are the input fingerprint (workbook hash)
+    plus the scenario levers and modes.
+
+    Values are handed out as-is, without copies, so callers must treat them
+    as read-only. get_or_compute() runs the computation once per key even
+    when several sessions ask for it at the same time.
+
+    Args:
+        max_bytes: Total size budget; least recently used entries are
+            evicted first. A value larger than the budget is returned but
+            not kept.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("SCM_RESULT_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._bytes = 0
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable):
+        """The cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value) -> bool:
+        """
+        Stores value under key, evicting least recently used entries to fit.
+
+        Returns:
+            True if stored, False if value alone exceeds the budget
+        """
+        size = nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._counts["evictions"] += 1
+            return True
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        """Cached value for key, else compute() stored under key (computed once across threads)."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another session may have finished it while this one waited
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            try:
+                value = compute()
+                self.put(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """entries, bytes, max_bytes, hits, misses and evictions so far."""
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, **self._counts}
+
+
+def nbytes(value) -> int:
+    """Approximate memory held by a result: frames, arrays and containers of them."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    if hasattr(value, "__dict__"):
+        return sum(nbytes(v) for v in vars(value).values())
+    return 64
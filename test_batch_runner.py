@@ -0,0 +1,52 @@
+import os
+import pandas as pd
+import batch_runner
+from ingest import read_workbook
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), "control_tower_input_with_help.xlsx")
+
+def test_workbook_to_parquet_uses_constraints_params(tmp_path):
+    assert batch_runner.main([TEMPLATE, "-o", str(tmp_path), "--optimize"]) == 0
+
+    summary = pd.read_parquet(tmp_path / "summary.parquet")
+    detail = pd.read_parquet(tmp_path / "detail.parquet")
+    # Template sets horizon_weeks = 8
+    assert summary["horizon_weeks"].unique().tolist() == [8]
+    assert detail.groupby(["sku", "location"], observed=True).size().eq(8).all()
+    assert (summary["revenue_at_risk"] == summary["total_unmet"] * summary["unit_revenue"]).all()
+
+    # Proposed moves only ever reduce unmet demand
+    actions = pd.read_parquet(tmp_path / "actions.parquet")
+    optimized = pd.read_parquet(tmp_path / "summary_optimized.parquet")
+    assert len(actions) and (actions["qty"] > 0).all()
+    assert optimized["total_unmet"].sum() < summary["total_unmet"].sum()
+
+def test_csv_tables_with_cli_scenarios(tmp_path):
+    dfs, _ = read_workbook(TEMPLATE)
+    src = tmp_path / "tables"
+    src.mkdir()
+    for sh, df in dfs.items():
+        df.to_csv(src / f"{sh}.csv", index=False)
+
+    out = tmp_path / "out"
+    assert batch_runner.main([str(src), "-o", str(out), "--format", "csv", "--uplift", "0", "0.2", "--delay", "0", "2", "--no-detail", "--samples", "200"]) == 0
+    assert not (out / "detail.csv").exists()
+
+    summary = pd.read_csv(out / "summary.csv")
+    assert summary["scenario_id"].nunique() == 4
+    base = summary[summary["scenario_id"] == 0]
+    uplifted = summary[summary["scenario_id"] == 2]
+    assert uplifted["total_demand"].sum() == base["total_demand"].sum() * 1.2
+
+    # Monte Carlo runs around the first scenario
+    mc = pd.read_csv(out / "montecarlo.csv")
+    assert len(mc) == len(base) and mc["stockout_prob"].between(0, 1).all()
+    assert pd.read_csv(out / "montecarlo_portfolio.csv")["statistic"].tolist() == ["mean", "p10", "p50", "p90"]
+
+def test_validation_failure_exits_nonzero(tmp_path, capsys):
+    src = tmp_path / "tables"
+    src.mkdir()
+    pd.DataFrame({"sku": ["A"], "location": ["L"], "on_hand_qty": [1]}).to_csv(src / "Inventory.csv", index=False)
+
+    assert batch_runner.main([str(src), "-o", str(tmp_path / "out")]) == 1
+    assert "Missing required sheet: Demand_Plan" in capsys.readouterr().err
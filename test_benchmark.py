@@ -0,0 +1,35 @@
+import json
+import numpy as np
+import benchmark
+from make_template import synthetic_frames
+from validator import validate_data
+
+def test_synthetic_frames_shape_and_validity():
+    dfs = synthetic_frames(n_skus=50, n_locations=3, weeks=6, sparsity=0.25, backlog_freq=0.5, seed=1)
+    assert len(dfs["Inventory"]) == 150
+    assert 0.6 < len(dfs["Demand_Plan"]) / (150 * 6) < 0.9
+    assert dfs["Demand_Plan"]["week_start"].nunique() == 6
+
+    ok, errs = validate_data(dfs)
+    assert ok, errs
+
+    # Backlogged keys start below their weekly demand
+    inv = dfs["Inventory"]
+    assert 0.3 < (inv["on_hand_qty"] < inv["safety_stock_qty"] / 1.5).mean() < 0.7
+
+    again = synthetic_frames(n_skus=50, n_locations=3, weeks=6, sparsity=0.25, backlog_freq=0.5, seed=1)
+    assert all(again[sh].equals(df) for sh, df in dfs.items())
+
+def test_benchmark_writes_json_and_compares(tmp_path):
+    out = tmp_path / "bench.json"
+    assert benchmark.main(["--skus", "20", "--locations", "2", "--weeks", "4", "--repeat", "1", "-o", str(out)]) == 0
+
+    result = json.loads(out.read_text())
+    assert list(result["stages"]) == benchmark.STAGES
+    assert result["params"]["n_skus"] == 20
+    assert result["stages"]["compute_kpis"]["rows_out"] == 40 * 4
+    assert all(s["seconds_median"] >= 0 and s["peak_mb"] >= 0 for s in result["stages"].values())
+
+    slower = {"stages": {k: dict(v, seconds_median=v["seconds_median"] * 4) for k, v in result["stages"].items()}}
+    ratios = benchmark.compare(slower, result)
+    assert np.allclose(ratios["ratio"], 4)
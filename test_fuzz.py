@@ -16,7 +16,7 @@ def supply_chain_data(draw):
     for s in skus:
         for l in locs:
             inv_data.append({
-                "as_of_date": datetime.date(2026, 1, 1),
+                "as_of_date": datetime.date(2026, 1, 19),
                 "sku": s,
                 "location": l,
                 "on_hand_qty": draw(st.integers(min_value=0, max_value=1000000)),
@@ -81,3 +81,15 @@ def test_fuzz_kpi_engine_crash(data):
     if not summ.empty:
         assert (summ["fill_rate"] <= 1.000001).all() # Float tolerance
         assert (summ["on_hand_qty"] >= 0).all()
+
+@settings(max_examples=30, deadline=None)
+@given(supply_chain_data(), st.floats(min_value=0, max_value=0.5), st.integers(min_value=0, max_value=3))
+def test_fuzz_vectorized_matches_loop(data, uplift, delay):
+    """The matrix kernel must reproduce the reference loop exactly."""
+    inv, dem, sup = data
+
+    s_loop, d_loop = compute_kpis(inv, dem, sup, horizon_weeks=6, demand_uplift_pct=uplift, supply_delay_weeks=delay, method="loop")
+    s_vec, d_vec = compute_kpis(inv, dem, sup, horizon_weeks=6, demand_uplift_pct=uplift, supply_delay_weeks=delay)
+
+    pd.testing.assert_frame_equal(d_vec, d_loop, check_dtype=False, check_exact=True)
+    pd.testing.assert_frame_equal(s_vec, s_loop, check_dtype=False, check_exact=True)
@@ -0,0 +1,86 @@
+import io
+import os
+import pandas as pd
+from datetime import date, datetime
+from openpyxl import Workbook
+from ingest import read_workbook
+from validator import validate_data, validate_plan
+
+def _workbook_bytes(sheets):
+    wb = Workbook()
+    del wb["Sheet"]
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for r in rows:
+            ws.append(r)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+def test_prunes_sheets_and_columns():
+    data = _workbook_bytes({
+        "Help": [["Section", "Instructions"], ["a", "b"]],
+        "Inventory": [
+            ["as_of_date", "sku", "location", "on_hand_qty", "qa_hold_qty", "safety_stock_qty", "batch_no"],
+            [datetime(2026,1,19), "A", "L", 100, 5, 10, "B1"],
+        ],
+        "Demand_Plan": [
+            ["week_start", "sku", "location", "forecast_qty", "customer_priority"],
+            [datetime(2026,1,19), "A", "L", 10, "TRADE"],
+            [None, None, None, None, None],  # trailing blank row
+            ["2026-01-26", 12345, "L", "7", "TRADE"],
+        ],
+    })
+    dfs, report = read_workbook(data)
+
+    assert set(dfs) == {"Inventory", "Demand_Plan"}
+    assert list(dfs["Inventory"].columns) == ["as_of_date", "sku", "location", "on_hand_qty", "safety_stock_qty", "qa_hold_qty"]
+    assert list(dfs["Demand_Plan"].columns) == ["week_start", "sku", "location", "forecast_qty", "customer_priority"]
+
+    dem = dfs["Demand_Plan"]
+    assert len(dem) == 2
+    assert dem["sku"].tolist() == ["A", "12345"]
+    assert dem["forecast_qty"].tolist() == [10, 7]
+    assert dem["week_start"].dt.date.tolist() == [date(2026,1,19), date(2026,1,26)]
+    assert dem.index.tolist() == [2, 4]
+
+    assert [r["sheet"] for r in report] == ["Inventory", "Demand_Plan"]
+    assert report[1]["rows"] == 2
+
+def test_bad_values_reach_validator():
+    data = _workbook_bytes({
+        "Inventory": [["as_of_date", "sku", "location", "on_hand_qty"], [datetime(2026,1,19), "A", "L", 1]],
+        "Demand_Plan": [["week_start", "sku", "location", "forecast_qty"], ["not a date", "A", "L", 1]],
+        "Supply_Plan": [["week_start", "sku", "location", "supply_qty"], [datetime(2026,1,19), "A", "L", 1]],
+    })
+    dfs, _ = read_workbook(data)
+    assert dfs["Demand_Plan"]["week_start"].isna().all()
+
+    ok, errs = validate_data(dfs)
+    assert ok is False
+    assert any("Invalid dates" in e for e in errs)
+
+def test_issue_rows_skip_blank_rows():
+    data = _workbook_bytes({
+        "Inventory": [["as_of_date", "sku", "location", "on_hand_qty"], [datetime(2026,1,19), "A", "L", 1]],
+        "Demand_Plan": [
+            ["week_start", "sku", "location", "forecast_qty"],
+            [datetime(2026,1,19), "A", "L", 1],
+            [None, None, None, None],
+            [datetime(2026,1,26), "A", "L", -5],
+        ],
+        "Supply_Plan": [["week_start", "sku", "location", "supply_qty"], [datetime(2026,1,19), "A", "L", 1]],
+    })
+    dfs, _ = read_workbook(data)
+    _, issues = validate_plan(dfs)
+    assert issues.loc[issues["rule"] == "negative", "row"].tolist() == [4]
+
+def test_matches_read_excel_on_template():
+    with open(os.path.join(os.path.dirname(__file__), "control_tower_input_with_help.xlsx"), "rb") as f:
+        data = f.read()
+    dfs, _ = read_workbook(data)
+    ref = pd.read_excel(io.BytesIO(data), sheet_name=None)
+    for sh, df in dfs.items():
+        # Indexed by Excel row rather than position
+        assert df.index[0] == 2
+        pd.testing.assert_frame_equal(df.reset_index(drop=True), ref[sh][df.columns], check_dtype=False)
@@ -1,7 +1,7 @@
 import pytest
 import pandas as pd
-from datetime import date
-from kpi_engine import compute_kpis
+from datetime import date, timedelta
+from kpi_engine import compute_kpis, compute_kpis_batch, scenario_grid, PreparedPlan, diff_plans, update_kpis, update_kpis_batch, KeyIndex, week_calendar
 
 def test_basic_kpi():
     # Setup: 1 SKU, 1 Location, 2 Weeks
@@ -9,7 +9,7 @@ def test_basic_kpi():
     # Week 2: D=10, S=20. Prev NAI=-5. Avail=15. Served=10. NAI=5.
     
     inv = pd.DataFrame([{
-        "as_of_date": date(2026,1,1), "sku": "A", "location": "L", 
+        "as_of_date": date(2026,1,19), "sku": "A", "location": "L", 
         "on_hand_qty": 5, "safety_stock_qty": 0
     }])
     
@@ -56,7 +56,7 @@ def test_basic_kpi():
 
 def test_scenario_uplift():
     # Demand = 100. Uplift 10% -> 110.
-    inv = pd.DataFrame([{"as_of_date": date(2026,1,1), "sku": "A", "location": "L", "on_hand_qty": 1000, "safety_stock_qty": 0}])
+    inv = pd.DataFrame([{"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 1000, "safety_stock_qty": 0}])
     dem = pd.DataFrame([{"week_start": date(2026,1,19), "sku": "A", "location": "L", "forecast_qty": 100}])
     sup = pd.DataFrame([])
     
@@ -67,8 +67,8 @@ def test_scenario_delay():
     # Supply in W1. Delay 1 week -> Supply in W2.
     w1 = date(2026,1,19)
     w2 = date(2026,1,26)
-    inv = pd.DataFrame([{"as_of_date": date(2026,1,1), "sku": "A", "location": "L", "on_hand_qty": 0, "safety_stock_qty": 0}])
-    # Anchor demand at w1 so grid starts there, even if supply shifts to w2
+    inv = pd.DataFrame([{"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 0, "safety_stock_qty": 0}])
+    # The snapshot anchors the grid at w1, even if supply shifts to w2
     dem = pd.DataFrame([{"week_start": w1, "sku": "A", "location": "L", "forecast_qty": 0}])
     sup = pd.DataFrame([{"week_start": w1, "sku": "A", "location": "L", "supply_qty": 50}])
     
@@ -81,3 +81,342 @@ def test_scenario_delay():
     assert det.loc[w1]["supply_qty"] == 0
     # W2 should have 50 supply
     assert det.loc[w2]["supply_qty"] == 50
+
+def test_vectorized_matches_loop():
+    # Backlog case: NAI goes negative, recovers, then dips again.
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 5, "safety_stock_qty": 3},
+        {"as_of_date": date(2026,1,19), "sku": "B", "location": "L", "on_hand_qty": 100, "safety_stock_qty": 50},
+    ])
+    weeks = [date(2026,1,19), date(2026,1,26), date(2026,2,2), date(2026,2,9)]
+    dem = pd.DataFrame(
+        [{"week_start": w, "sku": "A", "location": "L", "forecast_qty": q} for w, q in zip(weeks, [10, 10, 0, 30.5])] +
+        [{"week_start": w, "sku": "B", "location": "L", "forecast_qty": 40} for w in weeks]
+    )
+    sup = pd.DataFrame([
+        {"week_start": weeks[1], "sku": "A", "location": "L", "supply_qty": 8},
+        {"week_start": weeks[2], "sku": "A", "location": "L", "supply_qty": 20},
+    ])
+
+    s_loop, d_loop = compute_kpis(inv, dem, sup, horizon_weeks=4, method="loop")
+    s_vec, d_vec = compute_kpis(inv, dem, sup, horizon_weeks=4)
+
+    pd.testing.assert_frame_equal(d_vec, d_loop, check_dtype=False)
+    pd.testing.assert_frame_equal(s_vec, s_loop, check_dtype=False)
+
+    # Week 2 for A: NAI_prev=-5, S=8 -> avail=3, served=3
+    a = d_vec[d_vec["sku"] == "A"].set_index("week_start")
+    assert a.loc[weeks[1], "served_qty"] == 3
+    assert a.loc[weeks[1], "NAI"] == -7
+
+def test_unknown_method():
+    inv = pd.DataFrame([{"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 1, "safety_stock_qty": 0}])
+    with pytest.raises(ValueError):
+        compute_kpis(inv, pd.DataFrame([]), pd.DataFrame([]), method="fast")
+
+def test_batch_matches_single_runs():
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 30, "safety_stock_qty": 10},
+        {"as_of_date": date(2026,1,19), "sku": "B", "location": "L", "on_hand_qty": 0, "safety_stock_qty": 0},
+    ])
+    w1 = date(2026,1,19)
+    dem = pd.DataFrame([
+        {"week_start": w1, "sku": "A", "location": "L", "forecast_qty": 20},
+        {"week_start": date(2026,1,26), "sku": "A", "location": "L", "forecast_qty": 20},
+        {"week_start": date(2026,2,2), "sku": "B", "location": "L", "forecast_qty": 5},
+    ])
+    sup = pd.DataFrame([
+        {"week_start": w1, "sku": "A", "location": "L", "supply_qty": 15},
+        {"week_start": w1, "sku": "B", "location": "L", "supply_qty": 5},
+    ])
+    scenarios = scenario_grid([0.0, 0.2], [0, 2], [2, 4])
+
+    summ, det = compute_kpis_batch(inv, dem, sup, scenarios)
+    assert summ["scenario_id"].nunique() == len(scenarios)
+
+    for _, sc in scenarios.iterrows():
+        s_ref, d_ref = compute_kpis(
+            inv, dem, sup,
+            horizon_weeks=int(sc["horizon_weeks"]),
+            demand_uplift_pct=sc["demand_uplift_pct"],
+            supply_delay_weeks=int(sc["supply_delay_weeks"])
+        )
+        s_bat = summ[summ["scenario_id"] == sc["scenario_id"]].drop(columns=["scenario_id", "demand_uplift_pct", "supply_delay_weeks", "horizon_weeks"])
+        d_bat = det[det["scenario_id"] == sc["scenario_id"]].drop(columns=["scenario_id"])
+
+        pd.testing.assert_frame_equal(s_bat.reset_index(drop=True), s_ref.reset_index(drop=True), check_dtype=False)
+        # Stacked week_start categories span every scenario's window
+        pd.testing.assert_frame_equal(d_bat.reset_index(drop=True), d_ref.reset_index(drop=True), check_dtype=False, check_categorical=False)
+
+def test_prepared_plan_reuse():
+    # One PreparedPlan serves every lever combination
+    inv = pd.DataFrame([{"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 50, "safety_stock_qty": 20}])
+    dem = pd.DataFrame([
+        {"week_start": date(2026,1,19), "sku": "A", "location": "L", "forecast_qty": 30},
+        {"week_start": date(2026,1,26), "sku": "A", "location": "L", "forecast_qty": 30},
+        {"week_start": date(2026,1,26), "sku": "Z", "location": "L", "forecast_qty": 99},  # not in Inventory
+    ])
+    sup = pd.DataFrame([{"week_start": date(2026,1,19), "sku": "A", "location": "L", "supply_qty": 40}])
+
+    plan = PreparedPlan(inv, dem, sup)
+    assert plan.n_keys == 1
+
+    # compute_kpis wraps PreparedPlan, so check hand-worked values: (levers) -> NAI, served, total unmet
+    expected = {
+        (2, 0.0, 0): ([60, 30], [30, 30], 0),
+        (4, 0.5, 1): ([5, 0, 0, 0], [45, 45, 0, 0], 0),
+        (3, 0.1, 2): ([17, -16, 24], [33, 17, 0], 16),   # 40 lands in week 3, after a 16 shortfall
+    }
+    for (horizon, uplift, delay), (nai, served, unmet) in expected.items():
+        s_plan, d_plan = plan.project(horizon, uplift, delay)
+        assert len(d_plan) == horizon
+        assert d_plan["NAI"].tolist() == pytest.approx(nai)
+        assert d_plan["served_qty"].tolist() == pytest.approx(served)
+        assert s_plan["total_unmet"].iloc[0] == pytest.approx(unmet)
+        assert s_plan["stockout_flag"].iloc[0] == int(unmet > 0)
+
+def test_categorical_outputs():
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": "B", "location": "L2", "on_hand_qty": 5, "safety_stock_qty": 0},
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": "L1", "on_hand_qty": 5, "safety_stock_qty": 0},
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": "L1", "on_hand_qty": 7, "safety_stock_qty": 0},
+    ])
+    dem = pd.DataFrame([
+        {"week_start": date(2026,1,19), "sku": "A", "location": "L1", "forecast_qty": 4},
+        {"week_start": date(2026,1,19), "sku": "A", "location": "L2", "forecast_qty": 99},  # key not in Inventory
+    ])
+    summ, det = compute_kpis(inv, dem, pd.DataFrame([]), horizon_weeks=3)
+
+    for col in ["sku", "location", "week_start"]:
+        assert isinstance(det[col].dtype, pd.CategoricalDtype)
+    assert list(summ["sku"]) == ["A", "B"]
+    assert summ.loc[summ["sku"] == "A", "on_hand_qty"].iloc[0] == 12
+    assert summ["total_demand"].sum() == 4
+    assert list(det["week_start"].cat.categories) == [date(2026,1,19), date(2026,1,26), date(2026,2,2)]
+
+def _revision_inputs():
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": s, "location": "L", "on_hand_qty": 50, "safety_stock_qty": 10}
+        for s in ["A", "B", "C"]
+    ])
+    dem = pd.DataFrame([
+        {"week_start": date(2026,1,19) + timedelta(days=7*w), "sku": s, "location": "L", "forecast_qty": 20}
+        for w in range(4) for s in ["A", "B", "C"]
+    ])
+    sup = pd.DataFrame([{"week_start": date(2026,1,26), "sku": s, "location": "L", "supply_qty": 30} for s in ["A", "B", "C"]])
+    return inv, dem, sup
+
+def test_incremental_update_same_keys():
+    inv, dem, sup = _revision_inputs()
+    old = PreparedPlan(inv, dem, sup)
+    sup2 = sup.copy()
+    sup2.loc[sup2["sku"] == "B", "supply_qty"] = 5
+    new = PreparedPlan(inv, dem, sup2)
+
+    changes = diff_plans(old, new)
+    assert changes[["sku", "change", "fields"]].values.tolist() == [["B", "modified", "supply"]]
+
+    summ, det, _ = update_kpis(old, old.project(4, 0.1, 1), new, 4, 0.1, 1)
+    s_ref, d_ref = new.project(4, 0.1, 1)
+    pd.testing.assert_frame_equal(summ, s_ref)
+    pd.testing.assert_frame_equal(det, d_ref)
+
+    # A 0-week horizon has no rows to splice
+    scenarios = scenario_grid([0.0], [0], [0, 3])
+    summ, det, _ = update_kpis_batch(old, old.project_batch(scenarios), new, scenarios)
+    s_ref, d_ref = new.project_batch(scenarios)
+    pd.testing.assert_frame_equal(summ, s_ref)
+    pd.testing.assert_frame_equal(det, d_ref)
+
+def test_incremental_update_added_removed_keys():
+    inv, dem, sup = _revision_inputs()
+    old = PreparedPlan(inv, dem, sup)
+    inv2 = pd.concat([inv[inv["sku"] != "A"], pd.DataFrame([{"as_of_date": date(2026,1,19), "sku": "D", "location": "L", "on_hand_qty": 1, "safety_stock_qty": 0}])])
+    inv2.loc[inv2["sku"] == "C", "on_hand_qty"] = 0
+    new = PreparedPlan(inv2, dem, sup)
+
+    changes = diff_plans(old, new).set_index("sku")["change"].to_dict()
+    assert changes == {"A": "removed", "C": "modified", "D": "added"}
+
+    scenarios = scenario_grid([0.0, 0.3], [0, 2], [3, 5])
+    summ, det, _ = update_kpis_batch(old, old.project_batch(scenarios), new, scenarios)
+    s_ref, d_ref = new.project_batch(scenarios)
+    pd.testing.assert_frame_equal(summ, s_ref)
+    pd.testing.assert_frame_equal(det, d_ref)
+
+def test_key_index_slices_match_boolean_filters():
+    inv, dem, sup = _revision_inputs()
+    inv = pd.concat([inv, inv.assign(location="M")])
+    scenarios = scenario_grid([0.0, 0.5], [0, 1], [3])
+    summ, det = PreparedPlan(inv, dem, sup).project_batch(scenarios)
+    index = KeyIndex(det)
+
+    assert index.sku_list() == ["A", "B", "C"]
+    assert index.locations_for("B") == ["L", "M"]
+    assert index.locations_for("Z") == []
+    assert index.rows("A", "Z") == slice(0, 0)
+
+    for sid in scenarios["scenario_id"]:
+        for sku in ["A", "B", "C"]:
+            for loc in ["L", "M"]:
+                mask = (det["scenario_id"] == sid) & (det["sku"] == sku) & (det["location"] == loc)
+                pd.testing.assert_frame_equal(det.iloc[index.rows(sku, loc, sid)], det[mask])
+
+        # Per-scenario view over the sliced frame, without a rescan
+        part = det.iloc[index.scenario_rows(sid)].reset_index(drop=True)
+        sub = index.for_scenario(sid)
+        rows = sub.rows("C", "M")
+        assert (part.iloc[rows]["sku"] == "C").all() and len(part.iloc[rows]) == 3
+
+    assert KeyIndex(summ).scenario_rows(2) == slice(12, 18)
+
+def test_time_phased_safety_stock():
+    # OH 100, demand 10/week: POH 90, 80, 70, 60
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 100, "safety_stock_qty": 50},
+        {"as_of_date": date(2026,1,19), "sku": "B", "location": "L", "on_hand_qty": 100, "safety_stock_qty": 50},
+    ])
+    weeks = [date(2026,1,19) + timedelta(days=7*w) for w in range(4)]
+    dem = pd.DataFrame([{"week_start": w, "sku": s, "location": "L", "forecast_qty": 10} for w in weeks for s in ["A", "B"]])
+    sup = pd.DataFrame(columns=["week_start", "sku", "location", "supply_qty"])
+    # A: target 50 until week 3, then 75 from week 3 (applies to weeks 3 and 4)
+    ss_plan = pd.DataFrame([{"week_start": weeks[2], "sku": "A", "location": "L", "safety_stock_qty": 75}])
+
+    summ, det = compute_kpis(inv, dem, sup, horizon_weeks=4, safety_stock_plan=ss_plan)
+    a = det[det["sku"] == "A"]
+    assert a["safety_stock_qty"].tolist() == [50, 50, 75, 75]
+    assert a["ss_breach"].tolist() == [False, False, True, True]
+
+    flags = summ.set_index("sku")
+    assert flags.loc["A", "safety_breach_flag"] == 1
+    assert flags.loc["A", "first_safety_breach_week"] == weeks[2]
+    # B keeps its Inventory target; a constant target reduces to min_poh < safety stock
+    assert flags.loc["B", "safety_breach_flag"] == 0
+    assert (det[det["sku"] == "B"]["safety_stock_qty"] == 50).all()
+
+    # Per-key constants live in the key table, not in every detail row
+    assert "on_hand_qty" not in det.columns
+    plan = PreparedPlan(inv, dem, sup, ss_plan)
+    assert plan.key_table()[["on_hand_qty", "safety_stock_qty"]].values.tolist() == [[100, 50], [100, 50]]
+    assert diff_plans(PreparedPlan(inv, dem, sup), plan)[["sku", "fields"]].values.tolist() == [["A", "safety_stock_plan"]]
+
+def test_holds_release_and_holding_cost():
+    # OH 100 of which 30 QA hold (released after 2 weeks) and 20 blocked (never)
+    inv = pd.DataFrame([{
+        "as_of_date": date(2026,1,19), "sku": "A", "location": "L",
+        "on_hand_qty": 100, "qa_hold_qty": 30, "blocked_qty": 20, "safety_stock_qty": 0
+    }])
+    weeks = [date(2026,1,19) + timedelta(days=7*w) for w in range(4)]
+    dem = pd.DataFrame([{"week_start": w, "sku": "A", "location": "L", "forecast_qty": 20} for w in weeks])
+    sup = pd.DataFrame(columns=["week_start", "sku", "location", "supply_qty"])
+    # 5.2 x 0.5 / 52 = 0.05 per unit-week
+    master = pd.DataFrame([{"sku": "A", "unit_cogs": 5.2, "holding_cost_rate_pa": 0.5}])
+
+    summ, det = compute_kpis(inv, dem, sup, horizon_weeks=4, master=master)
+    # Available 50: 30, 10, then +30 released in week 3 -> 20, 0
+    assert det["released_qty"].tolist() == [0, 0, 30, 0]
+    assert det["POH"].tolist() == [30, 10, 20, 0]
+    assert summ["available_qty"].iloc[0] == 50
+    assert summ["total_unmet"].iloc[0] == 0
+    # Cost on physical stock: POH + QA hold until released + blocked throughout
+    assert det["holding_cost"].tolist() == pytest.approx([0.05 * q for q in [80, 60, 40, 20]])
+    assert summ["total_holding_cost"].iloc[0] == pytest.approx(0.05 * 200)
+
+    # Repeated Master_Data keys: the first row wins, by sku or by (sku, location)
+    dup = pd.concat([master, pd.DataFrame([
+        {"sku": "Z", "unit_cogs": 1.0, "holding_cost_rate_pa": 1.0},
+        {"sku": "A", "unit_cogs": 52.0, "holding_cost_rate_pa": 0.5},
+    ])], ignore_index=True)
+    for m in [dup, dup.assign(location="L")]:
+        assert compute_kpis(inv, dem, sup, horizon_weeks=4, master=m)[0]["total_holding_cost"].iloc[0] == pytest.approx(0.05 * 200)
+
+    # Immediate release and a blocked lead time; the loop reference agrees
+    kw = dict(horizon_weeks=4, master=master, release_weeks={"qa_hold_qty": 0, "blocked_qty": 1})
+    s_vec, d_vec = compute_kpis(inv, dem, sup, **kw)
+    s_loop, d_loop = compute_kpis(inv, dem, sup, method="loop", **kw)
+    assert d_vec["POH"].tolist() == [60, 60, 40, 20]
+    pd.testing.assert_frame_equal(d_vec, d_loop)
+
+    # Changing lead times invalidates every key, so the update runs in full
+    old, new = PreparedPlan(inv, dem, sup), PreparedPlan(inv, dem, sup, release_weeks={"qa_hold_qty": 0})
+    summ_new, _, _ = update_kpis(old, old.project(horizon_weeks=4), new, horizon_weeks=4)
+    assert summ_new["available_qty"].iloc[0] == 80
+
+def test_priority_tiers_are_served_in_rank_order():
+    # OH 12; weekly demand HOSPITAL 5 + TRADE 5 + blank 2, supply 6 in week 2
+    inv = pd.DataFrame([{"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 12, "safety_stock_qty": 0}])
+    weeks = [date(2026,1,19) + timedelta(days=7*w) for w in range(2)]
+    dem = pd.DataFrame([
+        {"week_start": w, "sku": "A", "location": "L", "forecast_qty": q, "customer_priority": tier}
+        for w in weeks for tier, q in [("TRADE", 5), ("HOSPITAL", 5), (None, 2)]
+    ])
+    sup = pd.DataFrame([{"week_start": weeks[1], "sku": "A", "location": "L", "supply_qty": 6}])
+
+    plan = PreparedPlan(inv, dem, sup, priority_order=["HOSPITAL"])
+    assert plan.tiers == ["HOSPITAL", "TRADE", "UNASSIGNED"]
+
+    summ, det = plan.project(horizon_weeks=2, by_priority=True)
+    # Week 1 serves all 12; week 2 has 6 for HOSPITAL 5, then TRADE 1
+    assert det["served_qty_HOSPITAL"].tolist() == [5, 5]
+    assert det["served_qty_TRADE"].tolist() == [5, 1]
+    assert det["unmet_qty_UNASSIGNED"].tolist() == [0, 2]
+    assert summ["fill_rate_HOSPITAL"].iloc[0] == 1.0
+    assert summ["fill_rate_TRADE"].iloc[0] == pytest.approx(0.6)
+    # Tiers split the single-tier totals without changing them
+    s_flat, d_flat = plan.project(horizon_weeks=2)
+    pd.testing.assert_frame_equal(summ[s_flat.columns], s_flat)
+    assert (det[[f"served_qty_{t}" for t in plan.tiers]].sum(axis=1) == det["served_qty"]).all()
+
+def test_grid_anchors_at_snapshot_week_or_calendar():
+    # Snapshot on a Thursday: its week (Monday 19 Jan) is the first grid week
+    inv = pd.DataFrame([{"as_of_date": date(2026,1,22), "sku": "A", "location": "L", "on_hand_qty": 10, "safety_stock_qty": 0}])
+    dem = pd.DataFrame([
+        {"week_start": date(2026,1,12) + timedelta(days=7*w), "sku": "A", "location": "L", "forecast_qty": 10} for w in range(4)
+    ])
+    sup = pd.DataFrame([{"week_start": date(2026,1,12), "sku": "A", "location": "L", "supply_qty": 30}])
+
+    plan = PreparedPlan(inv, dem, sup)
+    summ, det = plan.project_batch(scenario_grid([0.0], [0, 1], [3]))
+    # Same weeks for every delay; demand before the snapshot week is dropped
+    assert det["week_start"].unique().tolist() == [date(2026,1,19), date(2026,1,26), date(2026,2,2)]
+    # Supply dated before the grid only lands on it once delayed
+    assert det.groupby("scenario_id")["supply_qty"].sum().tolist() == [0, 30]
+    assert summ["first_stockout_week"].iloc[0] == date(2026,1,26)
+    assert pd.isna(summ["first_stockout_week"].iloc[1])
+
+    # A Calendar starts the grid at its first week on or after the snapshot week
+    cal = pd.DataFrame({"week_start": [date(2026,1,12), date(2026,1,26), date(2026,2,2)]})
+    _, det = PreparedPlan(inv, dem, sup, calendar=cal).project(horizon_weeks=2)
+    assert det["week_start"].tolist() == [date(2026,1,26), date(2026,2,2)]
+
+    assert week_calendar(plan.anchor_day, 3) is week_calendar(plan.anchor_day, 3)
+    assert not week_calendar(plan.anchor_day, 3).flags.writeable
+
+def test_weeks_of_cover_excess_and_service_breach():
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": "L", "on_hand_qty": 100, "safety_stock_qty": 0},
+        {"as_of_date": date(2026,1,19), "sku": "B", "location": "L", "on_hand_qty": 40, "safety_stock_qty": 0},
+        {"as_of_date": date(2026,1,19), "sku": "C", "location": "L", "on_hand_qty": 5, "safety_stock_qty": 0},
+    ])
+    dem = pd.DataFrame([
+        {"week_start": date(2026,1,19) + timedelta(days=7*w), "sku": sku, "location": "L", "forecast_qty": qty}
+        for sku, weekly in [("A", [10] * 4), ("B", [10, 20, 30, 40])] for w, qty in enumerate(weekly)
+    ])
+    sup = pd.DataFrame(columns=["week_start", "sku", "location", "supply_qty"])
+
+    plan = PreparedPlan(inv, dem, sup, targets={"excess_weeks_threshold": 2.5})
+    summ, det = plan.project(horizon_weeks=4)
+    summ, det = summ.set_index("sku"), det.set_index(["sku", "week_start"])
+
+    # A closes at 90/80/70/60 against 10 a week, also past the grid
+    assert det.loc["A", "weeks_of_cover"].tolist() == [9, 8, 7, 6]
+    assert det.loc["A", "excess_qty"].tolist() == [65, 55, 45, 35]
+    # B closes at 30 ahead of 20, 30: one week and a third; then 10 of 30
+    assert det.loc["B", "weeks_of_cover"].tolist()[:3] == pytest.approx([4 / 3, 1 / 3, 0])
+    assert summ.loc["C", "min_weeks_of_cover"] == float("inf")
+    assert summ["excess_flag"].tolist() == [1, 0, 1]
+
+    # B has served 40 of 60 by week 3, below the 95% default target
+    assert summ["service_breach_flag"].tolist() == [0, 1, 0]
+    assert summ.loc["B", "first_service_breach_week"] == date(2026,2,2)
+    assert det.loc["B", "service_breach"].tolist() == [False, False, True, True]
@@ -0,0 +1,102 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from kpi_engine import PreparedPlan, scenario_grid, update_kpis_batch
+from network import Network
+from parallel import project_batch_parallel
+
+WEEKS = [date(2026,1,19) + timedelta(days=7*w) for w in range(4)]
+
+def _chain():
+    # PLANT -(1 week)-> DC -(same week)-> STORE
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": loc, "on_hand_qty": qty, "safety_stock_qty": 0}
+        for loc, qty in [("PLANT", 100), ("DC", 20), ("STORE", 0)]
+    ])
+    dem = pd.DataFrame(
+        [{"week_start": w, "sku": "A", "location": "STORE", "forecast_qty": 10} for w in WEEKS] +
+        [{"week_start": w, "sku": "A", "location": "DC", "forecast_qty": 5} for w in WEEKS]
+    )
+    sup = pd.DataFrame(columns=["week_start", "sku", "location", "supply_qty"])
+    lanes = pd.DataFrame([
+        {"from_location": "PLANT", "to_location": "DC", "transit_days": 7, "cost_per_unit": 1.0},
+        {"from_location": "DC", "to_location": "STORE", "transit_days": 0, "cost_per_unit": 0.5},
+        # Dearer second source for DC is ignored
+        {"from_location": "STORE", "to_location": "DC", "transit_days": 0, "cost_per_unit": 9.0},
+    ])
+    return inv, dem, sup, lanes
+
+def test_shortfalls_flow_up_and_transfers_down():
+    inv, dem, sup, lanes = _chain()
+    net = Network(lanes)
+    assert net.lane_table()[["from_location", "to_location", "level"]].values.tolist() == [["PLANT", "DC", 1], ["DC", "STORE", 2]]
+
+    plan = PreparedPlan(inv, dem, sup)
+    summ, det = plan.project(horizon_weeks=4, network=net)
+    by_loc = {loc: g for loc, g in det.groupby("location", observed=True)}
+
+    # DC carries the store's 10/week on top of its own 5/week
+    assert by_loc["DC"]["dependent_demand_qty"].tolist() == [10, 10, 10, 10]
+    # DC runs out in week 2; its shortfall ships from PLANT a week early
+    assert by_loc["PLANT"]["dependent_demand_qty"].tolist() == [10, 15, 15, 0]
+    assert by_loc["DC"]["transfer_in_qty"].tolist() == [0, 10, 15, 15]
+    assert by_loc["STORE"]["transfer_in_qty"].tolist() == [10, 10, 10, 10]
+    assert (det["unmet_qty"] == 0).all()
+
+    s = summ.set_index("location")
+    assert s.loc["DC", "total_transfer_cost"] == 40 and s.loc["STORE", "total_transfer_cost"] == 20
+
+    # Without lanes the store stocks out every week
+    alone, _ = plan.project(horizon_weeks=4)
+    assert alone.set_index("location").loc["STORE", "total_unmet"] == 40
+
+    _, det_loop = plan.project(horizon_weeks=4, network=net, method="loop")
+    pd.testing.assert_frame_equal(det, det_loop)
+
+def test_network_parallel_and_incremental_match_full_run():
+    inv, dem, sup, lanes = _chain()
+    # More SKUs on the same chain, with different stock levels
+    inv = pd.concat([inv.assign(sku=s, on_hand_qty=inv["on_hand_qty"] * (i + 1) / 3) for i, s in enumerate("ABCDEF")], ignore_index=True)
+    dem = pd.concat([dem.assign(sku=s) for s in "ABCDEF"], ignore_index=True)
+    net, scenarios = Network(lanes), scenario_grid([0.0, 0.3], [0], [3, 4])
+    plan = PreparedPlan(inv, dem, sup)
+    full = plan.project_batch(scenarios, network=net)
+
+    par = project_batch_parallel(plan, scenarios, workers=2, min_keys_per_shard=1, network=net)
+    pd.testing.assert_frame_equal(par[0], full[0])
+    pd.testing.assert_frame_equal(par[1], full[1])
+
+    # A change at the plant reaches the store rows of the same SKU
+    inv2 = inv.copy()
+    inv2.loc[(inv2["sku"] == "B") & (inv2["location"] == "PLANT"), "on_hand_qty"] = 0
+    new = PreparedPlan(inv2, dem, sup)
+    summ, det, _ = update_kpis_batch(plan, full, new, scenarios, network=net)
+    ref = new.project_batch(scenarios, network=net)
+    pd.testing.assert_frame_equal(summ, ref[0])
+    pd.testing.assert_frame_equal(det, ref[1])
+
+def test_shortfall_is_counted_once_across_echelons():
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": "A", "location": loc, "on_hand_qty": 0, "safety_stock_qty": 0}
+        for loc in ["DC", "STORE"]
+    ])
+    dem = pd.DataFrame([{"week_start": w, "sku": "A", "location": "STORE", "forecast_qty": 10} for w in WEEKS])
+    sup = pd.DataFrame(columns=["week_start", "sku", "location", "supply_qty"])
+    lanes = pd.DataFrame([{"from_location": "DC", "to_location": "STORE", "transit_days": 0}])
+    plan = PreparedPlan(inv, dem, sup)
+
+    summ, det = plan.project(horizon_weeks=4, network=Network(lanes))
+    alone, _ = plan.project(horizon_weeks=4)
+    s = summ.set_index("location")
+    # The DC's unfilled transfer request is reported apart from customer demand
+    assert summ["total_unmet"].sum() == alone["total_unmet"].sum() == 40
+    assert s.loc["DC", ["total_demand", "total_unmet", "fill_rate"]].tolist() == [0, 0, 1.0]
+    assert s.loc["DC", ["total_dependent_demand", "total_dependent_unmet"]].tolist() == [40, 40]
+    assert s.loc["STORE", "fill_rate"] == 0
+    assert det["unmet_qty"].sum() == 40 and det["dependent_unmet_qty"].sum() == 40
+
+def test_lane_cycle_is_rejected():
+    lanes = pd.DataFrame({"from_location": ["A", "B", "C"], "to_location": ["B", "C", "A"], "transit_days": [1, 1, 1]})
+    with pytest.raises(ValueError, match="cycle"):
+        Network(lanes)
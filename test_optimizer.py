@@ -0,0 +1,41 @@
+import pandas as pd
+from datetime import date, timedelta
+from kpi_engine import PreparedPlan
+from optimizer import propose
+
+WEEKS = [date(2026,1,19) + timedelta(days=7*w) for w in range(6)]
+
+def test_pull_in_takes_the_nearest_receipt():
+    inv = pd.DataFrame([{"as_of_date": WEEKS[0], "sku": "A", "location": "DC", "on_hand_qty": 0, "safety_stock_qty": 0}])
+    dem = pd.DataFrame([{"week_start": WEEKS[w], "sku": "A", "location": "DC", "forecast_qty": 10} for w in [1, 3]])
+    sup = pd.DataFrame([{"week_start": WEEKS[w], "sku": "A", "location": "DC", "supply_qty": 10} for w in [2, 3]])
+
+    actions, summary = propose(PreparedPlan(inv, dem, sup), horizon_weeks=4)
+    assert actions[["action", "qty", "from_week", "to_week", "lead_weeks"]].values.tolist() == [["PULL_IN", 10.0, WEEKS[2], WEEKS[1], 1]]
+    assert actions["cost"].tolist() == [0.5]
+    assert summary["total_unmet"].tolist() == [0]
+
+def test_transfers_keep_donor_safety_stock_then_pull_in():
+    inv = pd.DataFrame([
+        {"as_of_date": WEEKS[0], "sku": "A", "location": "DC1", "on_hand_qty": 10, "safety_stock_qty": 0},
+        {"as_of_date": WEEKS[0], "sku": "A", "location": "DC2", "on_hand_qty": 100, "safety_stock_qty": 20},
+    ])
+    dem = pd.DataFrame([
+        {"week_start": WEEKS[w], "sku": "A", "location": loc, "forecast_qty": qty} for w in range(4) for loc, qty in [("DC1", 20), ("DC2", 10)]
+    ])
+    # Lands after the horizon; pulled in by two weeks at most
+    sup = pd.DataFrame([{"week_start": WEEKS[5], "sku": "A", "location": "DC1", "supply_qty": 15}])
+    lanes = pd.DataFrame([{"from_location": "DC2", "to_location": "DC1", "transit_days": 5, "cost_per_unit": 0.02}])
+    plan = PreparedPlan(inv, dem, sup)
+    before, _ = plan.project(horizon_weeks=4)
+
+    actions, summary = propose(plan, horizon_weeks=4, lanes=lanes, params={"max_pull_in_weeks": 2})
+    # DC2 can spare 40 above its safety stock; nothing arrives in week 0
+    assert actions[["action", "from_location", "qty", "from_week", "to_week"]].values.tolist() == [
+        ["TRANSFER", "DC2", 30.0, WEEKS[0], WEEKS[1]],
+        ["TRANSFER", "DC2", 10.0, WEEKS[1], WEEKS[2]],
+        ["PULL_IN", "DC1", 15.0, WEEKS[5], WEEKS[3]],
+    ]
+    summary = summary.set_index("location")
+    assert summary.loc["DC2", "min_poh"] == 20
+    assert summary.loc["DC1", "total_unmet"] == 35 < before.set_index("location").loc["DC1", "total_unmet"]
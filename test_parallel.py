@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from kpi_engine import PreparedPlan, scenario_grid
+from parallel import compute_kpis_parallel, project_batch_parallel, shard_keys
+
+def _inputs(n_skus=40):
+    rng = np.random.default_rng(7)
+    skus = [f"S{i:03d}" for i in range(n_skus)]
+    inv = pd.DataFrame([
+        {"as_of_date": date(2026,1,19), "sku": s, "location": loc, "on_hand_qty": float(rng.integers(0, 60)), "safety_stock_qty": 10}
+        for s in skus for loc in ["DC1", "DC2"]
+    ])
+    dem = pd.DataFrame([
+        {"week_start": date(2026,1,19) + timedelta(days=7*w), "sku": s, "location": loc, "forecast_qty": float(rng.integers(0, 30))}
+        for w in range(6) for s in skus for loc in ["DC1", "DC2"]
+    ])
+    sup = pd.DataFrame([
+        {"week_start": date(2026,1,26) + timedelta(days=14*w), "sku": s, "location": "DC1", "supply_qty": float(rng.integers(0, 80))}
+        for w in range(3) for s in skus
+    ])
+    return inv, dem, sup
+
+def test_parallel_matches_in_process():
+    inv, dem, sup = _inputs()
+    ss_plan = dem.iloc[::7].rename(columns={"forecast_qty": "safety_stock_qty"})
+    inv["qa_hold_qty"] = inv["on_hand_qty"] // 3
+    master = pd.DataFrame({"sku": inv["sku"].unique(), "unit_cogs": 2.0, "holding_cost_rate_pa": 0.26})
+    dem["customer_priority"] = np.where(np.arange(len(dem)) % 3, "TRADE", "HOSPITAL")
+    plan = PreparedPlan(inv, dem, sup, ss_plan, master, {"qa_hold_qty": 1})
+    scenarios = scenario_grid([0.0, 0.2], [0, 2], [4, 6])
+
+    summ, det = project_batch_parallel(plan, scenarios, workers=3, min_keys_per_shard=1, by_priority=True)
+    s_ref, d_ref = plan.project_batch(scenarios, by_priority=True)
+    pd.testing.assert_frame_equal(summ, s_ref)
+    pd.testing.assert_frame_equal(det, d_ref)
+
+    # The frame-level entry point passes the allocation mode through
+    summ, _ = compute_kpis_parallel(inv, dem, sup, scenarios, False, 3, 1, ss_plan, master, {"qa_hold_qty": 1}, by_priority=True)
+    pd.testing.assert_frame_equal(summ, s_ref)
+
+def test_shards_partition_keys_by_label():
+    plan = PreparedPlan(*_inputs())
+    shards = shard_keys(plan, 4)
+    assert np.array_equal(np.sort(np.concatenate(shards)), np.arange(plan.n_keys))
+
+    # A key's shard depends on its labels only, not on the other keys
+    inv, dem, sup = _inputs()
+    smaller = PreparedPlan(inv[inv["sku"] != "S000"], dem, sup)
+    shard_of = lambda p, ss: {tuple(p.keys.iloc[c].astype(str)): i for i, s in enumerate(ss) for c in s}
+    big, small = shard_of(plan, shards), shard_of(smaller, shard_keys(smaller, 4))
+    assert all(big[k] == i for k, i in small.items())
@@ -0,0 +1,27 @@
+import pandas as pd
+from pipeline import recommend_actions, read_params, scenarios_from_params, RECOMMENDATIONS
+
+def _summary():
+    return pd.DataFrame({
+        "stockout_flag":      [1, 0, 0, 0, 0],
+        "safety_breach_flag": [1, 1, 0, 0, 0],
+        "min_poh":            [0, 5, 40000, 20000, 500],
+        "safety_stock_qty":   [10, 10, 10000, 10000, 10],
+    })
+
+def test_recommendations_follow_rule_order():
+    recs = recommend_actions(_summary())
+    assert recs.tolist() == ["🟥 EXPEDITE", "🟧 REPLENISH", "🟦 PROMO", "✅ OK", "✅ OK"]
+    assert list(recs.cat.categories) == RECOMMENDATIONS
+
+def test_recommendation_thresholds_from_constraints_params():
+    params = pd.DataFrame({
+        "param_name": ["promo_cover_multiple", "promo_min_poh", "horizon_weeks", "note"],
+        "param_value": [1.5, 100, 6, "n/a"],
+    })
+    dfs = {"Constraints_Params": params}
+    assert read_params(dfs) == {"promo_cover_multiple": 1.5, "promo_min_poh": 100.0, "horizon_weeks": 6.0}
+
+    recs = recommend_actions(_summary(), read_params(dfs))
+    assert recs.tolist() == ["🟥 EXPEDITE", "🟧 REPLENISH", "🟦 PROMO", "🟦 PROMO", "🟦 PROMO"]
+    assert scenarios_from_params(dfs)["horizon_weeks"].tolist() == [6]
@@ -0,0 +1,86 @@
+import os
+import pandas as pd
+import pyarrow as pa
+from datetime import datetime
+from plan_cache import PlanCache, content_hash, load_info, load_details
+
+def _dfs(n=3):
+    return {
+        "Inventory": pd.DataFrame({
+            "as_of_date": pd.to_datetime([datetime(2026,1,19)] * n),
+            "sku": [f"S{i}" for i in range(n)],
+            "location": ["L"] * n,
+            "on_hand_qty": [float(i) for i in range(n)],
+        }),
+        "Demand_Plan": pd.DataFrame({
+            "week_start": pd.to_datetime([datetime(2026,1,19)] * n),
+            "sku": [f"S{i}" for i in range(n)],
+            "location": ["L"] * n,
+            "forecast_qty": [10.0] * n,
+        }),
+    }
+
+def test_roundtrip_survives_new_instance(tmp_path):
+    key = content_hash(b"workbook-bytes")
+    assert PlanCache(str(tmp_path)).get(key) is None
+
+    dfs = _dfs()
+    assert PlanCache(str(tmp_path)).put(key, dfs)
+
+    # Fresh instance, as after a server restart
+    cached = PlanCache(str(tmp_path)).get(key)
+    assert set(cached) == set(dfs)
+    for sh in dfs:
+        pd.testing.assert_frame_equal(cached[sh], dfs[sh], check_dtype=False)
+
+def test_numeric_columns_are_not_copied(tmp_path):
+    dfs = _dfs(100_000)
+    PlanCache(str(tmp_path)).put("k", dfs)
+    before = pa.total_allocated_bytes()
+    cached = PlanCache(str(tmp_path)).get("k")
+    # Consolidating the float and date columns would copy ~1.6 MB per sheet
+    assert pa.total_allocated_bytes() - before < 100_000
+    pd.testing.assert_frame_equal(cached["Demand_Plan"], dfs["Demand_Plan"], check_dtype=False)
+
+def test_lru_eviction(tmp_path):
+    cache = PlanCache(str(tmp_path), max_bytes=10**9)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, _dfs(50))
+        os.utime(tmp_path / key, (1000 + i, 1000 + i))
+
+    # Reading "a" makes it most recently used
+    assert cache.get("a") is not None
+    entry_size = sum(f.stat().st_size for f in (tmp_path / "a").iterdir())
+
+    # Slack: manifests differ by a few bytes (timestamps)
+    cache.max_bytes = 2 * entry_size + 256
+    cache.evict()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a", "c"]
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = PlanCache(str(tmp_path))
+    cache.put("k", _dfs())
+    (tmp_path / "k" / "Inventory.arrow").write_bytes(b"garbage")
+    assert cache.get("k") is None
+
+def test_entry_from_another_schema_is_a_miss(tmp_path):
+    PlanCache(str(tmp_path), fingerprint="old").put("k", _dfs())
+    assert PlanCache(str(tmp_path), fingerprint="old").get("k") is not None
+    # After an upgrade the same workbook is parsed again and rewritten
+    cache = PlanCache(str(tmp_path))
+    assert cache.get("k") is None
+    assert cache.put("k", _dfs()) and cache.get("k") is not None
+
+def test_load_details_are_kept_with_the_entry(tmp_path):
+    cache = PlanCache(str(tmp_path))
+    assert cache.info("k") is None
+    report = [{"sheet": "Inventory", "rows": 3, "columns": 4, "seconds": 0.01}]
+    issues = pd.DataFrame([{"sheet": "Inventory", "row": 4, "column": "sku,location", "rule": "duplicate_key", "severity": "warning", "value": "A", "count": 1}])
+    assert cache.put("k", _dfs(), info=load_info(report, issues))
+
+    # A hit shows the same load stats and warnings as the parse that filled it
+    got_report, got_issues = load_details(PlanCache(str(tmp_path)).info("k"))
+    assert got_report == report
+    pd.testing.assert_frame_equal(got_issues, issues, check_dtype=False)
+    cache.put("j", _dfs())
+    assert load_details(cache.info("j"))[1].empty
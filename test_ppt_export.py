@@ -0,0 +1,68 @@
+import io
+import threading
+import pandas as pd
+import pytest
+from pptx import Presentation
+import ppt_export
+import profiling
+from ppt_export import DeckCache, generate_ppt
+
+def _summary(n=12):
+    return pd.DataFrame({
+        "sku": [f"S{i}" for i in range(n)],
+        "location": "L",
+        "revenue_at_risk": [float(i * 100) for i in range(n)],
+        "fill_rate": 0.5,
+    })
+
+def test_generate_ppt_top_risks_table():
+    deck = Presentation(generate_ppt(_summary(), 6600.0, 3, 0.5, 2))
+    table = next(sh.table for sh in deck.slides[2].shapes if sh.has_table)
+    assert len(table.rows) == 11
+    assert table.cell(1, 0).text == "S11"
+
+def test_deck_cache_builds_once_per_key(monkeypatch):
+    calls = []
+    gate = threading.Event()
+
+    def slow_build(summary, *args):
+        gate.wait(5)
+        calls.append(len(summary))
+        return io.BytesIO(b"deck")
+    monkeypatch.setattr(ppt_export, "generate_ppt", slow_build)
+
+    decks = DeckCache(max_entries=2)
+    decks.submit("a", _summary(), 0, 0, 1.0, 0)
+    decks.submit("a", _summary(), 0, 0, 1.0, 0)
+    assert decks.pending("a")
+    assert decks.result("a") is None
+
+    gate.set()
+    assert decks.result("a", timeout=5) == b"deck"
+    assert calls == [12]
+
+    # LRU: "a" was used last, so "b" goes first
+    decks.submit("b", _summary(), 0, 0, 1.0, 0).result(5)
+    decks.result("a")
+    decks.submit("c", _summary(), 0, 0, 1.0, 0).result(5)
+    assert decks.result("b") is None and decks.result("a") == b"deck"
+
+def test_deck_cache_drops_failed_builds(monkeypatch):
+    def broken(*args):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(ppt_export, "generate_ppt", broken)
+
+    decks = DeckCache()
+    decks.submit("k", _summary(), 0, 0, 1.0, 0)
+    with pytest.raises(RuntimeError):
+        decks.result("k", timeout=5)
+    assert not decks.pending("k") and decks.result("k") is None
+
+def test_deck_build_timing_reaches_the_callers_profile():
+    decks = DeckCache()
+    with profiling.collect() as prof:
+        decks.submit("k", _summary(), 0, 0, 1.0, 0)
+        assert decks.result("k", timeout=5) is not None
+        # Merged once, on the first pickup
+        decks.result("k")
+    assert prof.frame()["stage"].tolist() == ["generate_ppt"]
@@ -0,0 +1,45 @@
+import json
+import threading
+import pandas as pd
+from datetime import date
+import profiling
+from kpi_engine import compute_kpis
+from pipeline import enrich_master
+
+def _inputs():
+    inv = pd.DataFrame([{"as_of_date": date(2026,1,19), "sku": s, "location": "L", "on_hand_qty": 10, "safety_stock_qty": 5} for s in ["A", "B"]])
+    dem = pd.DataFrame([{"week_start": date(2026,1,19), "sku": s, "location": "L", "forecast_qty": 20} for s in ["A", "B"]])
+    sup = pd.DataFrame([{"week_start": date(2026,1,26), "sku": "A", "location": "L", "supply_qty": 30}])
+    return inv, dem, sup
+
+def test_disabled_is_a_no_op():
+    assert profiling.active() is None
+    assert profiling.timer("x") is profiling.timer("y")
+    compute_kpis(*_inputs(), horizon_weeks=3)
+    assert profiling.active() is None
+
+def test_collects_engine_steps_and_decorated_stages():
+    inv, dem, sup = _inputs()
+    with profiling.collect() as prof:
+        summary, _ = compute_kpis(inv, dem, sup, horizon_weeks=3)
+        enrich_master(summary, {})
+
+    stages = prof.frame().set_index("stage")
+    assert list(stages.index) == [
+        "compute_kpis.1_preprocess", "compute_kpis.2_grid", "compute_kpis.3_project",
+        "compute_kpis.4_summary", "compute_kpis.5_detail", "enrich_master",
+    ]
+    assert stages.loc["compute_kpis.5_detail", "rows_out"] == 6
+    assert stages.loc["enrich_master", "rows_in"] == 2
+    assert (stages["seconds"] >= 0).all()
+    assert len(json.loads(prof.to_json())["stages"]) == 6
+    assert profiling.active() is None
+
+def test_collection_is_per_thread():
+    seen = []
+    with profiling.collect() as prof:
+        t = threading.Thread(target=lambda: seen.append(profiling.active()))
+        t.start(); t.join()
+        compute_kpis(*_inputs(), horizon_weeks=2)
+    assert seen == [None]
+    assert len(prof.records) == 5
@@ -0,0 +1,35 @@
+import os
+import pandas as pd
+import regions
+from kpi_engine import scenario_grid
+from plan_cache import PlanCache
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), "control_tower_input_with_help.xlsx")
+
+def test_region_names_are_unique_stems():
+    assert regions.region_names(["in/north.xlsx", "south.xlsx", "north.xlsx"]) == ["north", "south", "north (2)"]
+
+def test_regions_stream_and_consolidate(tmp_path):
+    with open(TEMPLATE, "rb") as f:
+        data = f.read()
+    files = {"north": data, "broken": b"not a workbook", "south": data}
+    scenarios = scenario_grid([0.0], [0], [8])
+
+    results = {region: (summary, errors) for region, summary, errors in regions.process_regions(
+        files, scenarios, cache=PlanCache(str(tmp_path)), workers=2
+    )}
+    # A bad file is reported without holding back the others
+    assert set(results) == set(files)
+    assert results["broken"][0] is None and results["broken"][1]
+    assert not results["north"][1] and results["north"][0].equals(results["south"][0])
+
+    # Upload order, not finish order
+    summary = regions.consolidate({region: results[region][0] for region in files})
+    assert summary.columns[0] == regions.REGION_COL
+    assert summary[regions.REGION_COL].cat.categories.tolist() == ["north", "south"]
+    assert len(summary) == 2 * len(results["north"][0])
+    assert "Recommendation" in summary.columns
+
+    totals = regions.region_totals(summary).set_index(regions.REGION_COL)
+    assert totals.loc["north", "revenue_at_risk"] == results["north"][0]["revenue_at_risk"].sum()
+    assert totals["revenue_at_risk"].sum() == summary["revenue_at_risk"].sum()
@@ -0,0 +1,40 @@
+import time
+import threading
+import numpy as np
+from result_cache import ResultCache, nbytes
+
+def test_lru_eviction_within_budget():
+    cache = ResultCache(max_bytes=3 * 8000)
+    for k in "abc":
+        assert cache.put(k, np.zeros(1000))
+    assert cache.get("a") is not None  # "b" is now least recently used
+
+    cache.put("d", np.zeros(1000))
+    assert cache.get("b") is None
+    assert [cache.get(k) is not None for k in "acd"] == [True, True, True]
+
+    # Too big to keep, so nothing else is evicted for it
+    assert not cache.put("huge", np.zeros(10_000))
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["bytes"] == 3 * 8000 and stats["evictions"] == 1
+    assert nbytes((np.zeros(10), {"x": np.zeros(5)})) == 120
+
+def test_concurrent_requests_compute_once():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return np.arange(3)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(("plan", 0.1), compute))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    # Every session gets the same object, not a copy
+    assert all(r is results[0] for r in results)
@@ -1,7 +1,7 @@
 import pytest
 import pandas as pd
 from datetime import date, timedelta
-from validator import validate_data
+from validator import validate_data, validate_plan, is_valid
 
 def test_valid_data():
     dfs = {
@@ -72,3 +72,66 @@ def test_non_monday_dates():
     ok, errs = validate_data(dfs)
     assert ok is False
     assert any("week_start must be Mondays" in e for e in errs)
+
+def _plan(dem_dates, dem_qty):
+    return {
+        "Inventory": pd.DataFrame({
+            "as_of_date": [date(2026,1,19)] * 2, "sku": ["A", "A"], "location": ["L", "L"], "on_hand_qty": [100, 5]
+        }),
+        "Demand_Plan": pd.DataFrame({
+            "week_start": dem_dates,
+            "sku": ["A"] * len(dem_dates), "location": ["L"] * len(dem_dates), "forecast_qty": dem_qty
+        }),
+        "Supply_Plan": pd.DataFrame({
+            "week_start": [date(2026,1,19)], "sku": ["B"], "location": ["L"], "supply_qty": ["10"]
+        })
+    }
+
+def test_row_level_issues_and_coercion():
+    dfs = _plan([date(2026,1,19), date(2026,1,20), "garbage", date(2026,1,21)], [10, -1, 5, 5])
+    coerced, issues = validate_plan(dfs, max_issues=1)
+    assert not is_valid(issues)
+
+    not_monday = issues[issues["rule"] == "not_monday"]
+    # Capped at one row, but the count stays exact; rows are Excel row numbers
+    assert len(not_monday) == 1
+    assert not_monday["row"].iloc[0] == 3
+    assert not_monday["count"].iloc[0] == 2
+
+    neg = issues[issues["rule"] == "negative"].iloc[0]
+    assert (neg["sheet"], neg["column"], neg["row"]) == ("Demand_Plan", "forecast_qty", 3)
+    assert issues[issues["rule"] == "invalid_date"]["row"].tolist() == [4]
+
+    # Coerced once and handed back
+    assert pd.api.types.is_datetime64_any_dtype(coerced["Demand_Plan"]["week_start"])
+    assert pd.api.types.is_numeric_dtype(coerced["Supply_Plan"]["supply_qty"])
+
+def test_key_and_horizon_warnings():
+    dfs = _plan([date(2026,1,19), date(2026,1,19)], [10, 10])
+    _, issues = validate_plan(dfs, horizon_weeks=4)
+
+    # Warnings never block the run
+    assert is_valid(issues)
+    rules = set(zip(issues["sheet"], issues["rule"]))
+    assert ("Inventory", "duplicate_key") in rules
+    assert ("Demand_Plan", "duplicate_key") in rules
+    assert ("Supply_Plan", "unknown_key") in rules
+    assert ("Demand_Plan", "horizon_coverage") in rules
+    assert (issues["severity"] == "warning").all()
+
+    ok, errs = validate_data(dfs)
+    assert ok is True and errs == []
+
+def test_optional_safety_stock_plan_is_validated():
+    dfs = _plan([date(2026,1,19)], [10])
+    dfs["Safety_Stock_Plan"] = pd.DataFrame({
+        "week_start": [date(2026,1,19), date(2026,1,21)], "sku": ["A", "A"], "location": ["L", "L"], "safety_stock_qty": [5, -1]
+    })
+    coerced, issues = validate_plan(dfs)
+    rules = set(issues.loc[issues["sheet"] == "Safety_Stock_Plan", "rule"])
+    assert rules == {"not_monday", "negative"}
+    assert pd.api.types.is_datetime64_any_dtype(coerced["Safety_Stock_Plan"]["week_start"])
+
+    # Absent optional sheets are not an error
+    del dfs["Safety_Stock_Plan"]
+    assert validate_plan(dfs)[1]["sheet"].ne("Safety_Stock_Plan").all()
@@ -1,97 +1,240 @@
 import pandas as pd
-from typing import Dict, List, Tuple
-import datetime
+import numpy as np
+from typing import Dict, List, Tuple, Optional
+
+import profiling
+from dates import grid_anchor
 
 REQUIRED_SHEETS = ["Inventory", "Demand_Plan", "Supply_Plan"]
 
+# Validated with the same rules when present
+OPTIONAL_SHEETS = ["Safety_Stock_Plan", "Calendar"]
+
 REQUIRED_COLS = {
     "Inventory": ["as_of_date", "sku", "location", "on_hand_qty"],
     "Demand_Plan": ["week_start", "sku", "location", "forecast_qty"],
     "Supply_Plan": ["week_start", "sku", "location", "supply_qty"],
+    "Safety_Stock_Plan": ["week_start", "sku", "location", "safety_stock_qty"],
+    "Calendar": ["week_start"],
+}
+
+DATE_COLS = {
+    "Inventory": ["as_of_date"],
+    "Demand_Plan": ["week_start"],
+    "Supply_Plan": ["week_start"],
+    "Safety_Stock_Plan": ["week_start"],
+    "Calendar": ["week_start"],
+}
+
+QTY_COLS = {
+    "Inventory": ["on_hand_qty", "safety_stock_qty", "qa_hold_qty", "blocked_qty"],
+    "Demand_Plan": ["forecast_qty"],
+    "Supply_Plan": ["supply_qty"],
+    "Safety_Stock_Plan": ["safety_stock_qty"],
+    "Calendar": [],
 }
 
+# Sheets whose date problems only warn: the grid anchor skips bad rows
+WARN_DATE_SHEETS = ["Inventory", "Calendar"]
+
+# Row-level detail kept per (sheet, column, rule); counts are always exact
+MAX_ISSUES_PER_RULE = 100
+
+ISSUE_COLS = ["sheet", "row", "column", "rule", "severity", "value", "count"]
+
+# Index name of frames read from Excel by ingest: the sheet row of each record
+SOURCE_ROW = "source_row"
+
 def validate_data(dfs: Dict[str, pd.DataFrame]) -> Tuple[bool, List[str]]:
     """
     Validates the input DataFrames against strict schema and business rules.
-    
+
     Returns:
         (is_valid, list_of_error_messages)
     """
-    errors = []
-    
-    # 1. Check Required Sheets
-    for sh in REQUIRED_SHEETS:
+    _, issues = validate_plan(dfs)
+    return is_valid(issues), error_messages(issues)
+
+@profiling.profiled("validate_data")
+def validate_plan(
+    dfs: Dict[str, pd.DataFrame],
+    horizon_weeks: Optional[int] = None,
+    max_issues: int = MAX_ISSUES_PER_RULE
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Single-pass validation that also returns the coerced frames.
+
+    Every date/quantity column is converted exactly once and the converted
+    frames are handed back, so the KPI engine does not parse them again.
+    All rules are evaluated with vectorized masks.
+
+    Args:
+        dfs: Sheet name -> raw DataFrame
+        horizon_weeks: If given, also checks that Demand_Plan covers the horizon
+        max_issues: Row-level issues kept per (sheet, column, rule)
+
+    Returns:
+        (coerced_dfs, issues) where issues has one row per offending cell:
+        sheet, row (Excel row number, None for sheet-level issues), column,
+        rule, severity ("error" blocks the run, "warning" does not), value,
+        and count (total offending rows for that sheet/column/rule).
+    """
+    issues = _Issues(max_issues)
+    out = dict(dfs)
+    optional = [sh for sh in OPTIONAL_SHEETS if sh in dfs and not dfs[sh].empty]
+
+    # 1. Check Required Sheets & Columns
+    for sh in REQUIRED_SHEETS + optional:
         if sh not in dfs:
-            errors.append(f"Missing required sheet: {sh}")
+            issues.add_sheet(sh, None, "missing_sheet")
             continue
-            
+
         df = dfs[sh]
-        
-        # 2. Check Required Columns
         if df.empty:
-             errors.append(f"Sheet {sh} is empty.")
-             continue
+            issues.add_sheet(sh, None, "empty_sheet")
+            continue
 
         cols = set(df.columns.astype(str))
         missing_cols = [c for c in REQUIRED_COLS[sh] if c not in cols]
         if missing_cols:
-            errors.append(f"Sheet {sh} missing columns: {missing_cols}")
-    
-    if errors:
-        return False, errors
-
-    # 3. Type & Value Checks
-    
-    # Inventory
-    inv = dfs["Inventory"]
-    if not inv.empty:
-        # Check qty non-negative
-        for c in ["on_hand_qty", "safety_stock_qty"]:
-            if c in inv.columns:
-                 if pd.to_numeric(inv[c], errors='coerce').fillna(0).min() < 0:
-                     errors.append(f"Inventory sheet contains negative values in {c}")
-
-    # Demand Plan
-    dem = dfs["Demand_Plan"]
-    if not dem.empty:
-        # Check week_start is Monday
-        if "week_start" in dem.columns:
-            # Ensure datetime
-            try:
-                dates = pd.to_datetime(dem["week_start"], errors='coerce')
-                if dates.isna().any():
-                    errors.append("Demand_Plan: Invalid dates in week_start")
-                else:
-                    # Check for Monday (weekday 0)
-                    not_monday = dates[dates.dt.weekday != 0]
-                    if not not_monday.empty:
-                        errors.append(f"Demand_Plan: week_start must be Mondays. Found {len(not_monday)} invalid rows.")
-            except Exception as e:
-                 errors.append(f"Demand_Plan: Date parsing error: {str(e)}")
-        
-        # Check forecast non-negative
-        if "forecast_qty" in dem.columns:
-             if pd.to_numeric(dem["forecast_qty"], errors='coerce').fillna(0).min() < 0:
-                 errors.append("Demand_Plan: forecast_qty contains negative values")
-
-    # Supply Plan
-    sup = dfs["Supply_Plan"]
-    if not sup.empty:
-        # Check week_start is Monday
-        if "week_start" in sup.columns:
-            try:
-                dates = pd.to_datetime(sup["week_start"], errors='coerce')
-                if dates.isna().any():
-                     errors.append("Supply_Plan: Invalid dates in week_start")
-                else:
-                    not_monday = dates[dates.dt.weekday != 0]
-                    if not not_monday.empty:
-                        errors.append(f"Supply_Plan: week_start must be Mondays. Found {len(not_monday)} invalid rows.")
-            except:
-                pass
-
-        if "supply_qty" in sup.columns:
-             if pd.to_numeric(sup["supply_qty"], errors='coerce').fillna(0).min() < 0:
-                 errors.append("Supply_Plan: supply_qty contains negative values")
-
-    return (len(errors) == 0), errors
+            issues.add_sheet(sh, ",".join(missing_cols), "missing_column")
+
+    if not is_valid(issues.frame()):
+        return out, issues.frame()
+
+    # 2. Coerce once + Type & Value Checks
+    for sh in REQUIRED_SHEETS + optional:
+        df = dfs[sh]
+        coerced = {}
+
+        for c in DATE_COLS[sh]:
+            raw = df[c]
+            dates = raw if pd.api.types.is_datetime64_any_dtype(raw) else pd.to_datetime(raw, errors='coerce')
+            coerced[c] = dates
+            bad = dates.isna().to_numpy()
+            severity = "warning" if sh in WARN_DATE_SHEETS else "error"
+            issues.add(sh, c, "invalid_date", bad, raw, severity)
+            if c == "week_start":
+                issues.add(sh, c, "not_monday", ~bad & (dates.dt.weekday != 0).to_numpy(), raw, severity)
+
+        for c in QTY_COLS[sh]:
+            if c not in df.columns:
+                continue
+            raw = df[c]
+            qty = raw if pd.api.types.is_numeric_dtype(raw) else pd.to_numeric(raw, errors='coerce')
+            coerced[c] = qty
+            issues.add(sh, c, "not_numeric", (qty.isna() & raw.notna()).to_numpy(), raw, "warning")
+            issues.add(sh, c, "negative", (qty < 0).to_numpy(), raw)
+
+        out[sh] = df.assign(**coerced)
+
+    # 3. Key Integrity (warnings: the engine sums duplicates and drops unknown keys)
+    inv = out["Inventory"]
+    issues.add("Inventory", "sku,location", "duplicate_key", inv.duplicated(["sku", "location"]).to_numpy(), inv["sku"], "warning")
+
+    inv_keys = pd.MultiIndex.from_frame(inv[["sku", "location"]])
+    for sh in ["Demand_Plan", "Supply_Plan"] + [sh for sh in optional if "sku" in REQUIRED_COLS[sh]]:
+        df = out[sh]
+        subset = ["week_start", "sku", "location"] + [c for c in ["customer_priority", "supply_source"] if c in df.columns]
+        issues.add(sh, ",".join(subset), "duplicate_key", df.duplicated(subset).to_numpy(), df["sku"], "warning")
+
+        unknown = ~pd.MultiIndex.from_frame(df[["sku", "location"]]).isin(inv_keys)
+        issues.add(sh, "sku,location", "unknown_key", unknown, df["sku"], "warning")
+
+    if horizon_weeks is not None:
+        issues.extend(check_horizon(out, horizon_weeks))
+
+    return out, issues.frame()
+
+def check_horizon(dfs: Dict[str, pd.DataFrame], horizon_weeks: int) -> pd.DataFrame:
+    """
+    Warns when Demand_Plan stops before the end of the planning horizon,
+    which starts at the grid anchor (see dates.grid_anchor).
+
+    Cheap (a few reductions), so it can run on every scenario change.
+    """
+    issues = _Issues(1)
+    dem = dfs.get("Demand_Plan")
+    if dem is None or dem.empty or "week_start" not in dem.columns:
+        return issues.frame()
+
+    weeks = pd.to_datetime(dem["week_start"], errors='coerce').dropna()
+    if weeks.empty:
+        return issues.frame()
+
+    inv = dfs.get("Inventory", pd.DataFrame())
+    first_day = (weeks.min() - pd.Timestamp(0)).days
+    first = pd.Timestamp(0) + pd.Timedelta(days=grid_anchor(inv, dfs.get("Calendar"), [first_day]))
+    horizon_end = first + pd.Timedelta(weeks=horizon_weeks - 1)
+    if weeks.max() < horizon_end:
+        issues.add_sheet("Demand_Plan", "week_start", "horizon_coverage", "warning",
+                         value=f"last week {weeks.max().date()} < horizon end {horizon_end.date()}")
+    return issues.frame()
+
+def is_valid(issues: pd.DataFrame) -> bool:
+    return not (issues["severity"] == "error").any()
+
+def error_messages(issues: pd.DataFrame) -> List[str]:
+    """One human-readable line per (sheet, column, rule) error."""
+    errs = issues[issues["severity"] == "error"]
+    return [
+        _message(r.sheet, r.column, r.rule, r.count)
+        for r in errs.drop_duplicates(["sheet", "column", "rule"]).itertuples()
+    ]
+
+def _message(sheet: str, column: Optional[str], rule: str, count: int) -> str:
+    if rule == "missing_sheet":
+        return f"Missing required sheet: {sheet}"
+    if rule == "empty_sheet":
+        return f"Sheet {sheet} is empty."
+    if rule == "missing_column":
+        return f"Sheet {sheet} missing columns: {column.split(',')}"
+    if rule == "negative":
+        if sheet == "Inventory":
+            return f"Inventory sheet contains negative values in {column}"
+        return f"{sheet}: {column} contains negative values"
+    if rule == "invalid_date":
+        return f"{sheet}: Invalid dates in {column}"
+    if rule == "not_monday":
+        return f"{sheet}: {column} must be Mondays. Found {count} invalid rows."
+    return f"{sheet}: {rule} in {column} ({count} rows)"
+
+class _Issues:
+    """Collects capped row-level issues from boolean masks."""
+
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.parts = []
+
+    def add(self, sheet: str, column: str, rule: str, mask: np.ndarray, values: pd.Series, severity: str = "error"):
+        count = int(np.count_nonzero(mask))
+        if not count:
+            return
+        pos = np.flatnonzero(mask)[:self.cap]
+        # Rows as seen in Excel: carried over from ingest (which skips blank
+        # rows), else +2 for 1-based rows plus the header row
+        rows = values.index[pos].to_numpy() if values.index.name == SOURCE_ROW else pos + 2
+        self.parts.append(pd.DataFrame({
+            "sheet": sheet,
+            "row": rows,
+            "column": column,
+            "rule": rule,
+            "severity": severity,
+            "value": values.iloc[pos].astype(str).to_numpy(),
+            "count": count,
+        }))
+
+    def add_sheet(self, sheet: str, column: Optional[str], rule: str, severity: str = "error", value: Optional[str] = None):
+        self.parts.append(pd.DataFrame([{
+            "sheet": sheet, "row": None, "column": column, "rule": rule,
+            "severity": severity, "value": value, "count": 1,
+        }]))
+
+    def extend(self, issues: pd.DataFrame):
+        if not issues.empty:
+            self.parts.append(issues)
+
+    def frame(self) -> pd.DataFrame:
+        if not self.parts:
+            return pd.DataFrame(columns=ISSUE_COLS)
+        return pd.concat(self.parts, ignore_index=True)[ISSUE_COLS]